@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Monitor pipeline load benchmark
+-------------------------------
+Feeds ProcessMonitor with process creation and exit events from a
+SimulatedEventSource at fixed rates and measures, per rate:
+
+- event-to-verdict latency (process creation to its first scan verdict)
+  as p50/p95/p99, and the lateness of that verdict beyond the first
+  scheduled scan offset
+- the miss rate: short-lived processes that exited before any verdict;
+  malicious processes are counted separately as reported (MEDIUM or
+  above), scanned but not reported, or gone before their first scan
+- CPU time used by the whole pipeline, as a share of one core
+- drops from a full scan queue
+
+With --max-p99, --max-lateness-p99, --max-miss-rate, --max-cpu or
+--max-dropped the run exits with status 1 when a limit is exceeded, so it
+can gate a release.
+
+Usage:
+    python benchmarks/bench_monitor.py [--rates 10,100,1000] [--duration 10] [--output bench_monitor.json]
+"""
+import os
+import sys
+import json
+import time
+import logging
+import platform
+import argparse
+import threading
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import __version__
+from modules.logger import setup_logger
+from modules.scanner import ProcessScanner
+from modules.monitor import ProcessMonitor, THREAT_VALUES
+from modules.scheduler import parse_offsets, DEFAULT_SCAN_OFFSETS
+from modules.simulation import SimulatedSystem, SimulatedBackend, SimulatedEventSource, BENIGN
+
+
+class VerdictRecorder:
+    """Wraps scanner.scan_specific_process to record when each process gets its first verdict."""
+
+    def __init__(self, scan):
+        self.scan = scan
+        self.first_verdict = {}
+        self.max_level = {}
+        self.scans = 0
+        self.gone = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, pid, record=None, store_result=True):
+        result = self.scan(pid, record, store_result)
+        now = time.time()
+        with self._lock:
+            self.scans += 1
+            if result is None:
+                self.gone += 1
+            else:
+                self.first_verdict.setdefault(pid, now)
+                level = THREAT_VALUES.get(result.get("threat_level"), 0)
+                if level > self.max_level.get(pid, 0):
+                    self.max_level[pid] = level
+        return result
+
+
+def percentile(values, fraction):
+    """Return the nearest-rank percentile of sorted values (0.0 if empty)."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def latency_stats(values):
+    """Return p50/p95/p99/max in milliseconds."""
+    values = sorted(values)
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0
+    }
+
+
+def run_rate(rate, args):
+    """Run the monitor at one event rate and return its result dictionary."""
+    system = SimulatedSystem(args.processes, seed=args.seed, malicious_rate=args.malicious_rate)
+    scanner = ProcessScanner(admin_rights=True, results_file=os.devnull, backend=SimulatedBackend(system))
+    recorder = VerdictRecorder(scanner.scan_specific_process)
+    scanner.scan_specific_process = recorder
+
+    count = max(1, int(rate * args.duration))
+    source = SimulatedEventSource(system, rate=rate, count=count, short_lived=args.short_lived,
+                                  short_lifetime=(args.short_min, args.short_max), seed=args.seed)
+    monitor = ProcessMonitor(scanner, results_file=os.devnull, min_threat_level="MEDIUM",
+                             workers=args.workers, queue_size=args.queue_size,
+                             scan_offsets=args.scan_offsets, event_source=source)
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    monitor.start_monitoring()
+
+    # Run until every spawned process has a verdict or has exited, or the drain time is up
+    deadline = None
+    while True:
+        time.sleep(0.05)
+        if source.spawned < count:
+            continue
+        if deadline is None:
+            deadline = time.perf_counter() + args.drain
+        pending = [pid for pid in source.lifetimes
+                   if pid not in recorder.first_verdict and system.get(pid) is not None]
+        if not pending or time.perf_counter() >= deadline:
+            break
+
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    stats = monitor.get_stats()
+    monitor.stop_monitoring()
+
+    latencies, lateness = [], []
+    short_lived = short_missed = unresolved = 0
+    malicious = malicious_reported = malicious_unscanned = 0
+    first_offset = args.scan_offsets[0]
+    for pid, lifetime in source.lifetimes.items():
+        process = system.find(pid)
+        verdict = recorder.first_verdict.get(pid)
+        if verdict is not None:
+            latencies.append(verdict - process.create_time)
+            lateness.append(max(0.0, verdict - process.create_time - first_offset))
+        elif process.exit_time is None:
+            unresolved += 1
+        if lifetime <= args.short_max:
+            short_lived += 1
+            if verdict is None:
+                short_missed += 1
+        if process.profile != BENIGN:
+            malicious += 1
+            if verdict is None:
+                malicious_unscanned += 1
+            elif recorder.max_level.get(pid, 0) >= THREAT_VALUES["MEDIUM"]:
+                malicious_reported += 1
+
+    return {
+        "rate": rate,
+        "events": source.spawned,
+        "exits": source.exited,
+        "wall_s": round(wall, 3),
+        "cpu_s": round(cpu, 3),
+        "cpu_share": round(cpu / wall, 3),
+        "cpu_per_event_us": round(cpu / source.spawned * 1e6, 1),
+        "scans": recorder.scans,
+        "scans_of_exited": recorder.gone,
+        "dropped": stats["dropped"],
+        "unresolved": unresolved,
+        "latency": latency_stats(latencies),
+        "lateness": latency_stats(lateness),
+        "short_lived": short_lived,
+        "short_lived_missed": short_missed,
+        "miss_rate": round(short_missed / short_lived, 4) if short_lived else 0.0,
+        "malicious": malicious,
+        "malicious_reported": malicious_reported,
+        "malicious_unscanned": malicious_unscanned,
+        "scheduler": stats["scheduler"]
+    }
+
+
+def check_limits(result, args):
+    """Return the list of gate limits a result exceeds."""
+    failures = []
+    if args.max_p99 is not None and result["latency"]["p99_ms"] > args.max_p99 * 1000:
+        failures.append(f"p99 latency {result['latency']['p99_ms']} ms > {args.max_p99 * 1000:g} ms")
+    if args.max_lateness_p99 is not None and result["lateness"]["p99_ms"] > args.max_lateness_p99 * 1000:
+        failures.append(f"p99 lateness {result['lateness']['p99_ms']} ms > {args.max_lateness_p99 * 1000:g} ms")
+    if args.max_miss_rate is not None and result["miss_rate"] > args.max_miss_rate:
+        failures.append(f"miss rate {result['miss_rate']:.2%} > {args.max_miss_rate:.2%}")
+    if args.max_cpu is not None and result["cpu_share"] > args.max_cpu:
+        failures.append(f"CPU {result['cpu_share']:.0%} of a core > {args.max_cpu:.0%}")
+    if args.max_dropped is not None and result["dropped"] > args.max_dropped:
+        failures.append(f"{result['dropped']} scans dropped (queue full) > {args.max_dropped}")
+    return failures
+
+
+def print_result(result):
+    latency, lateness = result["latency"], result["lateness"]
+    print(f"{result['rate']:>8g} {result['events']:>8,} {latency['p50_ms']:>9.1f} {latency['p95_ms']:>9.1f} "
+          f"{latency['p99_ms']:>9.1f} {lateness['p99_ms']:>9.1f} {result['miss_rate']:>8.1%} "
+          f"{result['malicious_reported']:>4}/{result['malicious']:<4} {result['cpu_share']:>6.0%} "
+          f"{result['cpu_per_event_us']:>9.0f} {result['dropped']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the ProcessMonitor pipeline at fixed event rates')
+    parser.add_argument('--rates', type=str, default='10,100,1000',
+                        help='Comma-separated process creations per second')
+    parser.add_argument('--duration', type=float, default=10.0, help='Seconds of events per rate')
+    parser.add_argument('--drain', type=float, default=5.0,
+                        help='Seconds to wait after the last event for outstanding verdicts')
+    parser.add_argument('--processes', type=int, default=1000, help='Processes running before the first event')
+    parser.add_argument('--workers', type=int, default=2, help='Monitor scan workers')
+    parser.add_argument('--queue-size', type=int, default=1024, help='Monitor scan queue size')
+    parser.add_argument('--scan-offsets', type=parse_offsets, default=DEFAULT_SCAN_OFFSETS,
+                        help='Comma-separated scan offsets in seconds (default: 0.1,1,10)')
+    parser.add_argument('--short-lived', type=float, default=0.2,
+                        help='Fraction of processes that exit almost immediately')
+    parser.add_argument('--short-min', type=float, default=0.01, help='Shortest lifetime in seconds')
+    parser.add_argument('--short-max', type=float, default=0.5, help='Longest short lifetime in seconds')
+    parser.add_argument('--malicious-rate', type=float, default=0.01,
+                        help='Fraction of simulated processes with doppelganging indicators')
+    parser.add_argument('--seed', type=int, default=1, help='Seed of the simulated machine and events')
+    parser.add_argument('--max-p99', type=float, default=None, metavar='SECONDS',
+                        help='Fail if p99 event-to-verdict latency exceeds this')
+    parser.add_argument('--max-lateness-p99', type=float, default=None, metavar='SECONDS',
+                        help='Fail if p99 verdict lateness beyond the first scan offset exceeds this')
+    parser.add_argument('--max-miss-rate', type=float, default=None, metavar='FRACTION',
+                        help='Fail if more short-lived processes than this exit without a verdict')
+    parser.add_argument('--max-cpu', type=float, default=None, metavar='FRACTION',
+                        help='Fail if CPU use exceeds this share of one core')
+    parser.add_argument('--max-dropped', type=int, default=None, metavar='N',
+                        help='Fail if more than N scans are dropped because the queue is full')
+    parser.add_argument('--output', type=str, default='bench_monitor.json', help='JSON results file')
+    args = parser.parse_args()
+
+    # Verdicts are logged at WARNING; keep console output out of the timings
+    setup_logger(log_file=os.devnull, log_level=logging.ERROR)
+
+    rates = [float(rate) for rate in args.rates.split(',')]
+    report = {
+        "benchmark": "monitor",
+        "version": __version__,
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "workers": args.workers,
+        "scan_offsets": list(args.scan_offsets),
+        "results": [],
+        "failures": []
+    }
+
+    print(f"{'rate/s':>8} {'events':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'late p99':>9} "
+          f"{'missed':>8} {'mal rep':>9} {'CPU':>6} {'us/event':>9} {'dropped':>7}")
+    for rate in rates:
+        result = run_rate(rate, args)
+        report["results"].append(result)
+        print_result(result)
+        report["failures"] += [f"{rate:g}/s: {failure}" for failure in check_limits(result, args)]
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+    for failure in report["failures"]:
+        print(f"FAIL {failure}")
+    return 1 if report["failures"] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
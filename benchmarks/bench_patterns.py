@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pattern matching micro-benchmark
+--------------------------------
+Compares the compiled Aho-Corasick matcher against the naive
+``any(p in text for p in patterns)`` scan for growing IOC list sizes.
+The per-match cost of the automaton should stay flat as patterns grow.
+
+Usage:
+    python benchmarks/bench_patterns.py [--sizes 22,1000,10000,50000]
+"""
+import os
+import sys
+import time
+import random
+import string
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.patterns import AhoCorasick, HIGH_CONFIDENCE_ARGS, MEDIUM_CONFIDENCE_ARGS
+
+# Representative command lines, one clean and one matching
+SAMPLE_CMDLINES = [
+    "c:\\program files\\microsoft visual studio\\2022\\vc\\tools\\msvc\\bin\\cl.exe /nologo /c /o2 /md "
+    "/i c:\\src\\include c:\\src\\project\\module\\file_with_a_long_name.cpp /foc:\\build\\obj\\file.obj",
+    "powershell.exe -noprofile -windowstyle hidden -enc SQBFAFgAIAAoAE4AZQB3AC0ATwBiAGoAZQBjAHQAIABOAGUAdAAu",
+]
+
+
+def random_patterns(count, rng):
+    """Generate count distinct lowercase patterns of 6-24 characters."""
+    alphabet = string.ascii_lowercase + string.digits + " -/\\.:"
+    patterns = set(HIGH_CONFIDENCE_ARGS + MEDIUM_CONFIDENCE_ARGS)
+    while len(patterns) < count:
+        patterns.add("".join(rng.choice(alphabet) for _ in range(rng.randint(6, 24))))
+    return sorted(patterns)
+
+
+def time_per_call(func, texts, repeat):
+    """Return the mean seconds per call over repeat passes of texts."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            func(text)
+    return (time.perf_counter() - start) / (repeat * len(texts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the IOC pattern matcher')
+    parser.add_argument('--sizes', type=str, default='22,1000,10000,50000',
+                        help='Comma-separated pattern counts to test')
+    parser.add_argument('--repeat', type=int, default=200, help='Passes over the sample command lines')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for generated patterns')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    print(f"{'patterns':>10} {'build (ms)':>12} {'automaton (us)':>16} {'naive (us)':>12}")
+    for size in sizes:
+        patterns = random_patterns(size, rng)
+
+        start = time.perf_counter()
+        matcher = AhoCorasick(patterns).build()
+        build_ms = (time.perf_counter() - start) * 1000
+
+        automaton_us = time_per_call(matcher.find_all, SAMPLE_CMDLINES, args.repeat) * 1e6
+        naive_repeat = max(1, args.repeat // max(1, size // 1000))
+        naive_us = time_per_call(
+            lambda text: [p for p in patterns if p in text], SAMPLE_CMDLINES, naive_repeat
+        ) * 1e6
+
+        print(f"{len(patterns):>10} {build_ms:>12.1f} {automaton_us:>16.1f} {naive_us:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Scan throughput benchmark
+-------------------------
+Runs ProcessScanner against simulated machines of growing size (see
+modules/simulation.py) and reports, per population:
+
+- scan_all_processes throughput and time per process
+- scan_specific_process throughput (the monitor path: fresh process read,
+  warm caches)
+- cost of each check and OS call, timed by the same Profiler hooks as
+  --profile (share is relative to the summed per-process analysis time)
+- calculate_suspicion_level throughput on the collected indicators
+- peak Python heap during a full scan (tracemalloc, separate pass)
+
+Results are written as JSON so runs of different releases can be compared.
+
+Usage:
+    python benchmarks/bench_scan.py [--sizes 1000,10000,50000] [--output bench_scan.json]
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import platform
+import argparse
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import __version__
+from modules.logger import setup_logger
+from modules.scanner import ProcessScanner
+from modules.profiling import Profiler, PROCESS_CATEGORY
+from modules.utils import calculate_suspicion_level
+from modules.simulation import SimulatedSystem, SimulatedBackend
+
+
+def make_scanner(system, workers, profiler=None):
+    """Return a scanner reading the simulated system, optionally instrumented by a Profiler."""
+    scanner = ProcessScanner(admin_rights=True, results_file=os.devnull, workers=workers,
+                             backend=SimulatedBackend(system))
+    if profiler is not None:
+        profiler.instrument(scanner)
+    return scanner
+
+
+def check_report(profiler):
+    """Return {category: Profiler stats + share} with the share of per-process analysis time."""
+    categories = profiler.report()["categories"]
+    scan_total = categories.get(PROCESS_CATEGORY, {}).get("total_s", 0.0)
+    return {category: dict(stats, share=round(stats["total_s"] / scan_total, 3) if scan_total else 0.0)
+            for category, stats in categories.items()}
+
+
+def bench_scan_all(system, workers):
+    """Time one full scan and the checks inside it; returns (result, scanner)."""
+    profiler = Profiler()
+    scanner = make_scanner(system, workers, profiler)
+
+    start = time.perf_counter()
+    results = scanner.scan_all_processes()
+    elapsed = time.perf_counter() - start
+
+    processes = results["scan_stats"]["processes_scanned"]
+    return {
+        "processes": processes,
+        "workers": workers,
+        "wall_s": round(elapsed, 3),
+        "processes_per_s": round(processes / elapsed, 1),
+        "per_process_us": round(elapsed / processes * 1e6, 1),
+        "suspicious": len(results["suspicious_processes"]),
+        "checks": check_report(profiler),
+        "parent_cache": results["scan_stats"]["parent_cache"],
+        "path_cache": results["scan_stats"]["path_cache"]
+    }, scanner
+
+
+def bench_scan_specific(scanner, pids):
+    """Time scan_specific_process over pids with the caches left warm by a full scan."""
+    start = time.perf_counter()
+    for pid in pids:
+        scanner.scan_specific_process(pid, store_result=False)
+    elapsed = time.perf_counter() - start
+    return {
+        "processes": len(pids),
+        "wall_s": round(elapsed, 3),
+        "processes_per_s": round(len(pids) / elapsed, 1),
+        "per_process_us": round(elapsed / len(pids) * 1e6, 1)
+    }
+
+
+def bench_scoring(indicators, repeat):
+    """Time calculate_suspicion_level over the indicators collected by a scan."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in indicators:
+            calculate_suspicion_level(item)
+    elapsed = time.perf_counter() - start
+    calls = repeat * len(indicators)
+    return {
+        "calls": calls,
+        "wall_s": round(elapsed, 3),
+        "calls_per_s": round(calls / elapsed, 1),
+        "per_call_us": round(elapsed / calls * 1e6, 2)
+    }
+
+
+def measure_peak_memory(system, workers):
+    """Return the peak traced heap (bytes) of a fresh scanner running one full scan."""
+    tracemalloc.start()
+    try:
+        scanner = make_scanner(system, workers)
+        scanner.scan_all_processes()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_size(size, args):
+    """Run every benchmark for one simulated population and return its result dictionary."""
+    start = time.perf_counter()
+    system = SimulatedSystem(size, seed=args.seed, malicious_rate=args.malicious_rate)
+    generate = time.perf_counter() - start
+
+    scan_all, scanner = bench_scan_all(system, args.workers)
+
+    rng = random.Random(args.seed)
+    pids = sorted(system.processes)
+    sample = pids if len(pids) <= args.specific else rng.sample(pids, args.specific)
+    scan_specific = bench_scan_specific(scanner, sample)
+
+    indicators = [info["indicators"] for info in
+                  (scanner._analyze_process(pid) for pid in sample[:args.scoring_sample]) if info]
+    scoring = bench_scoring(indicators, args.scoring_repeat)
+
+    result = {
+        "size": size,
+        "generate_s": round(generate, 3),
+        "scan_all_processes": scan_all,
+        "scan_specific_process": scan_specific,
+        "calculate_suspicion_level": scoring
+    }
+    if not args.no_memory:
+        peak = measure_peak_memory(system, args.workers)
+        result["peak_memory_bytes"] = peak
+        result["peak_memory_per_process"] = round(peak / len(system))
+    return result
+
+
+def print_result(result):
+    scan_all = result["scan_all_processes"]
+    specific = result["scan_specific_process"]
+    scoring = result["calculate_suspicion_level"]
+    print(f"\n{result['size']:,} processes (generated in {result['generate_s']:.2f}s)")
+    print(f"  {'scan_all_processes':<28} {scan_all['processes_per_s']:>10,.0f} proc/s "
+          f"{scan_all['per_process_us']:>10.1f} us/proc  ({scan_all['suspicious']} suspicious)")
+    print(f"  {'scan_specific_process':<28} {specific['processes_per_s']:>10,.0f} proc/s "
+          f"{specific['per_process_us']:>10.1f} us/proc")
+    print(f"  {'calculate_suspicion_level':<28} {scoring['calls_per_s']:>10,.0f} call/s "
+          f"{scoring['per_call_us']:>10.2f} us/call")
+    if "peak_memory_bytes" in result:
+        print(f"  {'peak memory':<28} {result['peak_memory_bytes'] / 1048576:>10.1f} MiB "
+              f"{result['peak_memory_per_process']:>10,} B/proc")
+    print(f"  {'check':<28} {'calls':>10} {'mean us':>10} {'p95 us':>10} {'share':>7}")
+    for name, check in scan_all["checks"].items():
+        print(f"  {name:<28} {check['calls']:>10,} {check['mean_us']:>10.1f} {check['p95_us']:>10.1f} "
+              f"{check['share']:>7.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ProcessScanner on simulated process populations')
+    parser.add_argument('--sizes', type=str, default='1000,10000,50000',
+                        help='Comma-separated numbers of simulated processes')
+    parser.add_argument('--workers', type=int, default=1, help='Scan threads for scan_all_processes')
+    parser.add_argument('--specific', type=int, default=2000,
+                        help='Processes scanned one by one with scan_specific_process')
+    parser.add_argument('--scoring-sample', type=int, default=2000,
+                        help='Processes whose indicators are re-scored')
+    parser.add_argument('--scoring-repeat', type=int, default=50,
+                        help='Passes of calculate_suspicion_level over the sample')
+    parser.add_argument('--malicious-rate', type=float, default=0.01,
+                        help='Fraction of simulated processes with doppelganging indicators')
+    parser.add_argument('--seed', type=int, default=1, help='Seed of the simulated machines')
+    parser.add_argument('--no-memory', action='store_true', help='Skip the tracemalloc pass')
+    parser.add_argument('--output', type=str, default='bench_scan.json', help='JSON results file')
+    args = parser.parse_args()
+
+    # Detections are logged at WARNING; keep console output out of the timings
+    setup_logger(log_file=os.devnull, log_level=logging.ERROR)
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    report = {
+        "benchmark": "scan",
+        "version": __version__,
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "malicious_rate": args.malicious_rate,
+        "results": []
+    }
+    for size in sizes:
+        result = run_size(size, args)
+        report["results"].append(result)
+        print_result(result)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
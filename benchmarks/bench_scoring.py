@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Scoring benchmark
+-----------------
+Compares per-record scoring with calculate_suspicion_level against
+extracting packed feature codes once and re-scoring them with several
+weight sets through the vectorized path. The indicator record helpers
+below are shared with tests/test_scoring.py, which checks parity between
+the two paths.
+
+Usage:
+    python benchmarks/bench_scoring.py [--records 200000]
+"""
+import os
+import sys
+import time
+import random
+import itertools
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.utils import calculate_suspicion_level
+from modules.scoring import DEFAULT_ENGINE, ScoringEngine
+
+FLAGS = (
+    "unnamed_process", "has_suspicious_memory", "has_deleted_file_mapping",
+    "has_transaction_handles", "has_section_without_file", "created_with_section",
+    "ioc_path_match", "suspicious_parent", "image_mismatch",
+)
+
+# Names covering plain, whitelisted, whitelisted browser and non-whitelisted browser
+PROCESS_NAMES = ("notepad.exe", "svchost.exe", "chrome.exe", "msedge.exe")
+
+
+def make_indicators(flags, has_mappings, parent_high, is_whitelisted, process_name):
+    """Build an indicators dictionary shaped like check_process_for_doppelganging output."""
+    indicators = dict(zip(FLAGS, flags))
+    indicators["is_whitelisted"] = is_whitelisted
+    indicators["process_name"] = process_name
+    indicators["details"] = {
+        "suspicious_mappings": [{"path": "C:\\x.dll"}] if has_mappings else [],
+        "parent_info": {"name": "cmd.exe", "high_confidence": parent_high},
+    }
+    return indicators
+
+
+def all_combinations():
+    """Yield every combination of indicator flags and modifiers."""
+    for flags in itertools.product((False, True), repeat=len(FLAGS)):
+        for has_mappings, parent_high, is_whitelisted in itertools.product((False, True), repeat=3):
+            for process_name in PROCESS_NAMES:
+                yield make_indicators(flags, has_mappings, parent_high, is_whitelisted, process_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark batch scoring against calculate_suspicion_level')
+    parser.add_argument('--records', type=int, default=200000, help='Number of records to score')
+    parser.add_argument('--rescores', type=int, default=10, help='Number of weight sets to re-score with')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for generated records')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    combos = list(all_combinations())
+    records = [rng.choice(combos) for _ in range(args.records)]
+
+    start = time.perf_counter()
+    for indicators in records:
+        calculate_suspicion_level(indicators)
+    baseline = time.perf_counter() - start
+
+    start = time.perf_counter()
+    codes, _ = DEFAULT_ENGINE.to_codes(records)
+    extract = time.perf_counter() - start
+
+    # Re-scoring history with new weights only needs the packed codes
+    engines = [ScoringEngine.from_dict({"weights": {"has_transaction_handles": 30 + i}})
+               for i in range(args.rescores)]
+    start = time.perf_counter()
+    for engine in engines:
+        engine.score_matrix(ScoringEngine.codes_to_matrix(codes))
+    vectorized = (time.perf_counter() - start) / len(engines)
+
+    start = time.perf_counter()
+    DEFAULT_ENGINE.score_batch(records)
+    batch = time.perf_counter() - start
+
+    print(f"{'calculate_suspicion_level':<30} {baseline:8.3f}s")
+    print(f"{'to_codes (one-off extraction)':<30} {extract:8.3f}s")
+    print(f"{'score_matrix (per weight set)':<30} {vectorized:8.3f}s")
+    print(f"{'score_batch (convenience)':<30} {batch:8.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -76,6 +76,16 @@ def build_executable():
     except Exception as e:
         print(f"Error copying executable: {e}")
     
+    # Build the log statistics tool as a separate console executable
+    print("Building processguard-logstats...")
+    subprocess.call([
+        "pyinstaller",
+        "--onefile",
+        "--hidden-import=modules.logstats",
+        "--name=processguard-logstats",
+        "processguard_logstats.py"
+    ])
+    
     print("Build complete!")
 
 if __name__ == "__main__":
@@ -6,6 +6,7 @@ Process Doppelgänging Detector
 Detects processes that may have been created using Process Doppelgänging technique.
 """
 import sys
+import json
 import time
 import argparse
 import logging
@@ -16,12 +17,50 @@ from ctypes import wintypes
 
 from modules.scanner import ProcessScanner
 from modules.monitor import ProcessMonitor
+from modules.patterns import DetectionPatterns
+from modules.scheduler import parse_offsets, DEFAULT_SCAN_OFFSETS
+from modules.events import create_event_source
+from modules.results_store import ResultsStore
+from modules.simulation import SimulatedSystem, SimulatedBackend, SimulatedEventSource
+from modules.profiling import Profiler
+from modules.metrics import (MetricsExporter, ErrorCountHandler, track_scanner, track_monitor,
+                             DEFAULT_METRICS_INTERVAL)
 from modules.logger import setup_logger, get_logger
+from modules.log_handlers import parse_size
 from modules.utils import (is_admin, create_stealth_console, save_to_json,
                           register_startup, unregister_startup, is_registered_startup, kill_process,
                           display_banner)
 from modules.protection import install_protection, uninstall_protection
 
+def parse_time(value):
+    """Parse a --since/--until value given as epoch seconds or an ISO 8601 date/time."""
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid time '{value}' (use epoch seconds or YYYY-MM-DD[THH:MM:SS])")
+
+def run_query(args):
+    """Print stored detections matching the query filters as JSON lines."""
+    if not args.results_db:
+        print("--query needs --results-db FILE", file=sys.stderr)
+        return 1
+    if not os.path.exists(args.results_db):
+        print(f"Results database not found: {args.results_db}", file=sys.stderr)
+        return 1
+    
+    store = ResultsStore(args.results_db)
+    try:
+        for record in store.query(since=args.since, until=args.until, pid=args.pid, image=args.image,
+                                  min_threat_level=args.min_threat_level, limit=args.limit):
+            print(json.dumps(record, default=str))
+    finally:
+        store.close()
+    return 0
+
 def main():
     """Main entry point for ProcessGuard."""
     # Check for admin privileges but don't enforce them
@@ -33,20 +72,111 @@ def main():
     parser.add_argument('-s', '--service', action='store_true', help='Run as a Windows service/startup application')
     parser.add_argument('-k', '--kill', action='store_true', help='Automatically kill processes with HIGH threat level')
     parser.add_argument('-Q', '--quit', action='store_true', help='Completely terminate ProcessGuard and bypass protection mechanisms')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of concurrent scan threads for --scan (default: 1)')
+    parser.add_argument('--ioc-file', type=str, default=None,
+                        help='Load extra command-line and path IOC patterns from a file')
+    parser.add_argument('--incremental', type=str, nargs='?', const='scan_state.json', default=None,
+                        metavar='STATE_FILE',
+                        help='Skip processes unchanged since the last scan (state kept in STATE_FILE)')
+    parser.add_argument('--image-cache', type=str, nargs='?', const='image_cache.json', default=None,
+                        metavar='CACHE_FILE',
+                        help='Keep the on-disk header digests used to compare each process image with its '
+                             'executable in CACHE_FILE, so later runs do not read known files again')
+    parser.add_argument('--monitor-workers', type=int, default=2,
+                        help='Number of scan threads draining the new process queue in --monitor mode (default: 2)')
+    parser.add_argument('--queue-size', type=int, default=1024,
+                        help='Maximum number of new processes waiting to be scanned in --monitor mode (default: 1024)')
+    parser.add_argument('--scan-offsets', type=parse_offsets, default=DEFAULT_SCAN_OFFSETS,
+                        metavar='SECONDS',
+                        help='Comma-separated delays after process creation at which --monitor scans '
+                             'each new process (default: 0.1,1,10)')
+    parser.add_argument('--event-source', type=str, choices=['wmi', 'netlink', 'poll', 'replay'],
+                        default='wmi' if os.name == 'nt' else 'netlink' if sys.platform.startswith('linux') else 'poll',
+                        help='Where --monitor gets process events from '
+                             '(default: wmi on Windows, netlink on Linux, poll elsewhere)')
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        help='Seconds between process list snapshots for --event-source poll (default: 1.0)')
+    parser.add_argument('--replay-file', type=str, default=None,
+                        help='JSON lines event file for --event-source replay')
+    parser.add_argument('--simulate', type=int, default=None, metavar='N',
+                        help='Scan/monitor a deterministic simulated Windows machine with N processes '
+                             'instead of the real system (works on any platform)')
+    parser.add_argument('--simulate-seed', type=int, default=0,
+                        help='Seed of the simulated machine (default: 0)')
+    parser.add_argument('--simulate-rate', type=float, default=10.0,
+                        help='Simulated process creations per second in --monitor (default: 10)')
     parser.add_argument('--min-threat-level', type=str, choices=['LOW', 'MEDIUM', 'HIGH'], default='LOW',
                         help='Minimum threat level to log (LOW, MEDIUM, HIGH)')
     parser.add_argument('--stealth', action='store_true', help='Run in stealth mode (no console)')
     parser.add_argument('--log', type=str, default='detector.log', help='Log file path')
+    parser.add_argument('--async-log', action='store_true',
+                        help='Write log records from a background thread (always on with --monitor)')
+    parser.add_argument('--log-rate-limit', type=int, default=20, metavar='N',
+                        help='High-volume messages (new processes, scans, MEDIUM/LOW threats) logged '
+                             'individually per kind and roll-up interval; the rest are summarized '
+                             '(0 logs everything, HIGH threats are always logged; default: 20)')
+    parser.add_argument('--log-rollup-interval', type=float, default=60.0, metavar='SECONDS',
+                        help='Seconds covered by one roll-up line (default: 60)')
+    parser.add_argument('--log-max-size', type=parse_size, default=parse_size('50M'), metavar='SIZE',
+                        help='Rotate the log file once it reaches this size, e.g. 50M (0 = no size limit; default: 50M)')
+    parser.add_argument('--log-max-age', type=float, default=24.0, metavar='HOURS',
+                        help='Rotate the log file after this many hours (0 = no age limit; default: 24)')
+    parser.add_argument('--log-compress', type=str, choices=['gzip', 'zstd', 'none'], default='gzip',
+                        help='Compression of rotated log files; zstd needs the zstandard package '
+                             'and falls back to gzip without it (default: gzip)')
+    parser.add_argument('--log-keep', type=int, default=30, metavar='N',
+                        help='Number of rotated log files kept (0 = unlimited; default: 30)')
+    parser.add_argument('--log-retention-days', type=float, default=30.0, metavar='DAYS',
+                        help='Delete rotated log files older than this (0 = keep; default: 30)')
     parser.add_argument('--json', type=str, default='results.json', help='JSON results file path')
+    parser.add_argument('--results-db', type=str, default=None, metavar='FILE',
+                        help='SQLite database every detection is appended to (disabled unless given)')
+    parser.add_argument('--query', action='store_true',
+                        help='Print detections stored in --results-db as JSON lines and exit '
+                             '(filters: --since, --until, --pid, --image, --min-threat-level, --limit)')
+    parser.add_argument('--since', type=parse_time, default=None,
+                        help='--query: only detections at or after this time (epoch or ISO 8601)')
+    parser.add_argument('--until', type=parse_time, default=None,
+                        help='--query: only detections at or before this time (epoch or ISO 8601)')
+    parser.add_argument('--pid', type=int, default=None, help='--query: only detections of this PID')
+    parser.add_argument('--image', type=str, default=None,
+                        help='--query: only detections of this image name (case-insensitive)')
+    parser.add_argument('--limit', type=int, default=None, help='--query: maximum number of detections')
+    parser.add_argument('--profile', action='store_true',
+                        help='Time every check and OS call; log a per-check breakdown and the slowest PIDs '
+                             'after --scan, on SIGUSR1 (Ctrl+Break on Windows) and when --monitor stops')
+    parser.add_argument('--profile-top', type=int, default=10, metavar='N',
+                        help='Number of slowest processes listed by --profile (default: 10)')
+    parser.add_argument('--metrics-port', type=int, default=None, metavar='PORT',
+                        help='Serve Prometheus metrics on http://127.0.0.1:PORT/metrics')
+    parser.add_argument('--metrics-file', type=str, default=None, metavar='FILE',
+                        help='Write Prometheus metrics to FILE every --metrics-interval seconds')
+    parser.add_argument('--metrics-interval', type=float, default=DEFAULT_METRICS_INTERVAL, metavar='SECONDS',
+                        help=f'Seconds between --metrics-file writes (default: {DEFAULT_METRICS_INTERVAL:g})')
     parser.add_argument('--admin', action='store_true', help='Force require admin privileges')
     parser.add_argument('--debug', action='store_true', help='Enable debug logging')
     parser.add_argument('--no-watchdog', action='store_true', help='Internal use - do not start watchdog (used during restart)')
     
     args = parser.parse_args()
     
+    # Querying stored results needs no logging, protection or privileges
+    if args.query:
+        return run_query(args)
+    
     # Configure logging
     log_level = logging.DEBUG if args.debug else logging.INFO
-    setup_logger(args.log, log_level)
+    # The monitor must never wait on console or disk writes
+    rotation = {
+        "max_bytes": args.log_max_size,
+        "max_age": args.log_max_age * 3600,
+        "compression": args.log_compress,
+        "max_archives": args.log_keep,
+        "retention_days": args.log_retention_days
+    }
+    setup_logger(args.log, log_level, async_mode=args.async_log or args.monitor,
+                 rate_limit=args.log_rate_limit, rollup_interval=args.log_rollup_interval,
+                 rotation=rotation if args.log_max_size or args.log_max_age else None)
     logger = get_logger()
     
     # Log admin status with clear indication for user visibility in terminal
@@ -120,8 +250,52 @@ def main():
         if not args.quit:
             display_banner()
     
+    # Load external IOC patterns before any scan starts
+    patterns = None
+    if args.ioc_file:
+        patterns = DetectionPatterns()
+        try:
+            counts = patterns.load_ioc_file(args.ioc_file)
+            logger.info(f"Loaded IOC patterns from {args.ioc_file}: {counts}")
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load IOC file {args.ioc_file}: {e}")
+            return 1
+    
+    # Open the append-only results store
+    results_store = None
+    if args.results_db:
+        try:
+            results_store = ResultsStore(args.results_db)
+        except Exception as e:
+            logger.error(f"Failed to open results database {args.results_db}: {e}")
+    
+    # A simulated machine behaves as if running elevated and never touches real processes
+    backend = None
+    simulated_system = None
+    if args.simulate is not None:
+        simulated_system = SimulatedSystem(args.simulate, seed=args.simulate_seed)
+        backend = SimulatedBackend(simulated_system)
+        admin_status = True
+        if args.kill:
+            logger.warning("--kill is ignored with --simulate")
+            args.kill = False
+        logger.info(f"Simulating {len(simulated_system)} processes (seed {args.simulate_seed})")
+    
     # Initialize the scanner
-    scanner = ProcessScanner(admin_status, args.json)
+    scanner = ProcessScanner(admin_status, args.json, workers=args.workers, patterns=patterns,
+                             state_file=args.incremental, image_cache_file=args.image_cache,
+                             results_store=results_store, backend=backend)
+    
+    # Timing hooks are only installed with --profile; otherwise the checks run unwrapped
+    profiler = Profiler(top=args.profile_top).instrument(scanner) if args.profile else None
+    
+    # Metrics are always counted; they are only exported on request
+    metrics_exporter = None
+    if args.metrics_port is not None or args.metrics_file:
+        logger.addHandler(ErrorCountHandler())
+        track_scanner(scanner)
+        metrics_exporter = MetricsExporter(port=args.metrics_port, filepath=args.metrics_file,
+                                           interval=args.metrics_interval).start()
     
     # Default to scan mode if no mode is specified
     run_scan = args.scan or (not args.scan and not args.monitor)
@@ -153,6 +327,9 @@ def main():
             results["scan_time"] = datetime.now().isoformat()
             results["admin_rights"] = is_admin()
         
+        if profiler is not None:
+            results["profile"] = profiler.log_report()
+        
         # Display results
         suspicious_procs = results.get("suspicious_processes", [])
         if suspicious_procs and len(suspicious_procs) > 0:
@@ -167,8 +344,9 @@ def main():
         else:
             logger.info("No suspicious processes detected")
             
-        save_to_json(results, "results.json")
-        logger.info(f"Scan complete. Results saved to results.json")
+        save_to_json(results, args.json)
+        logger.info(f"Scan complete. Results saved to {args.json}"
+                    + (f" and appended to {args.results_db}" if results_store is not None else ""))
         
         # If no arguments provided (double-click scenario), wait for user input
         if not len(sys.argv) > 1:
@@ -194,8 +372,24 @@ def main():
                     logger.error("Failed to unregister service from startup")
                     print("Failed to remove from startup.")
         else:
-            # Register as a startup service
-            if register_startup(exe_path):
+            # Register as a startup service; startup applications run from an
+            # arbitrary working directory, so log and result paths are made absolute
+            log_args = ['--log', os.path.abspath(args.log),
+                        '--json', os.path.abspath(args.json),
+                        '--log-max-size', str(args.log_max_size),
+                        '--log-max-age', str(args.log_max_age),
+                        '--log-compress', args.log_compress,
+                        '--log-keep', str(args.log_keep),
+                        '--log-retention-days', str(args.log_retention_days)]
+            if args.results_db:
+                log_args += ['--results-db', os.path.abspath(args.results_db)]
+            # Hidden startup instances can only be watched through their metrics
+            if args.metrics_port is not None:
+                log_args += ['--metrics-port', str(args.metrics_port)]
+            if args.metrics_file:
+                log_args += ['--metrics-file', os.path.abspath(args.metrics_file),
+                             '--metrics-interval', str(args.metrics_interval)]
+            if register_startup(exe_path, log_args):
                 logger.info("Service successfully registered to run at startup")
                 print("ProcessGuard will now run at system startup.")
                 print("It will run in stealth mode and monitor for suspicious processes.")
@@ -207,13 +401,28 @@ def main():
     if args.monitor:
         logger.info("Starting process monitor")
         
+        try:
+            if simulated_system is not None:
+                event_source = SimulatedEventSource(simulated_system, rate=args.simulate_rate)
+            else:
+                event_source = create_event_source(args.event_source, args.poll_interval, args.replay_file)
+        except ValueError as e:
+            logger.error(f"Cannot start process monitor: {e}")
+            return 1
+        
         # Create monitor with new options
         monitor = ProcessMonitor(
             scanner=scanner, 
             results_file=args.json,
             min_threat_level=args.min_threat_level,
-            auto_kill=args.kill
+            auto_kill=args.kill,
+            workers=args.monitor_workers,
+            queue_size=args.queue_size,
+            scan_offsets=args.scan_offsets,
+            event_source=event_source
         )
+        if metrics_exporter is not None:
+            track_monitor(monitor)
         
         # Start monitoring
         monitor.start_monitoring()
@@ -224,6 +433,11 @@ def main():
             
         logger.info(f"Logging processes with threat level >= {args.min_threat_level}")
         
+        if profiler is not None:
+            signal_name = profiler.install_signal_handler()
+            if signal_name:
+                logger.info(f"Profiling enabled; send {signal_name} to PID {os.getpid()} for a report")
+        
         # Keep the monitor running until user interrupts
         try:
             # If in service mode, don't show this message
@@ -233,10 +447,17 @@ def main():
             # Main monitoring loop
             while True:
                 time.sleep(1)
+                if profiler is not None:
+                    profiler.dump_if_requested()
                 
         except KeyboardInterrupt:
             logger.info("Monitoring stopped by user")
             monitor.stop_monitoring()
+            if profiler is not None:
+                profiler.log_report()
+    
+    if metrics_exporter is not None:
+        metrics_exporter.stop()
     
     # Wait for user input is now handled in the scan section directly
     # This section was moved to the beginning of the function to exit immediately when -Q is used
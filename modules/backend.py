@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Backend module for Process Doppelgänging Detector
+-------------------------------------------------
+Platform-specific process inspection used by ProcessScanner. The Windows
+backend wraps the VirtualQueryEx / handle table helpers in utils; the
+/proc backend reports the Linux analogues of the same indicators:
+
+- an executable that was deleted from disk after the process started
+- an executable loaded from a memfd (a file that never existed on disk)
+- anonymous writable and executable (rwxp) mappings
+"""
+import os
+
+from .snapshot import snapshot_records, read_process_record
+from .handles import HandleSnapshot
+from .image_cache import file_identity, read_file_header
+from .utils import (
+    MemoryRegionTable,
+    walk_process_memory,
+    get_process_memory_info,
+    get_memory_maps,
+    check_mapped_files,
+    get_process_handles,
+    read_image_header,
+    open_process,
+    close_handle,
+    PAGE_EXECUTE_READWRITE,
+    PAGE_EXECUTE_READ,
+    PAGE_EXECUTE,
+    PAGE_READWRITE,
+    PAGE_READONLY,
+    PAGE_NOACCESS,
+    MEM_IMAGE,
+    MEM_MAPPED,
+    MEM_PRIVATE
+)
+
+# /proc/<pid>/maps "rwx" permissions -> closest Windows page protection
+_PERMISSION_PROTECT = {
+    b"rwx": PAGE_EXECUTE_READWRITE,
+    b"-wx": PAGE_EXECUTE_READWRITE,
+    b"r-x": PAGE_EXECUTE_READ,
+    b"--x": PAGE_EXECUTE,
+    b"rw-": PAGE_READWRITE,
+    b"-w-": PAGE_READWRITE,
+    b"r--": PAGE_READONLY,
+    b"---": PAGE_NOACCESS,
+}
+
+_EXECUTABLE_PROTECT = frozenset([PAGE_EXECUTE_READWRITE, PAGE_EXECUTE_READ, PAGE_EXECUTE])
+
+DELETED_SUFFIX = " (deleted)"
+MEMFD_PREFIX = "/memfd:"
+
+
+class ProcMapsTable(MemoryRegionTable):
+    """MemoryRegionTable filled from /proc/<pid>/maps, with the mapped path of each region.
+
+    File-backed executable regions are typed MEM_IMAGE, other file-backed
+    regions MEM_MAPPED and anonymous regions ([heap], [stack], ...) MEM_PRIVATE.
+    """
+    __slots__ = ("paths",)
+
+    def __init__(self):
+        super().__init__()
+        self.paths = []
+
+    def append_mapping(self, base, size, protect, region_type, path):
+        """Add one region and its mapped path (bytes, empty for anonymous memory)."""
+        self.append(base, size, protect, region_type, base)
+        self.paths.append(path)
+
+    def path(self, index):
+        """Return the decoded mapped path of a region."""
+        return os.fsdecode(self.paths[index])
+
+    def region_info(self, index):
+        info = super().region_info(index)
+        info["Path"] = self.path(index) or "[anon]"
+        return info
+
+
+def parse_proc_maps(data, table=None):
+    """Parse the raw contents of /proc/<pid>/maps into a ProcMapsTable.
+
+    Lines look like "7f1c2a000000-7f1c2a021000 rw-p 00000000 00:00 0   [heap]";
+    only the address range, permissions and path are kept.
+
+    Args:
+        data: bytes read from the maps file
+        table: ProcMapsTable to append to (a new one if omitted)
+    """
+    if table is None:
+        table = ProcMapsTable()
+    append = table.append_mapping
+    protect_for = _PERMISSION_PROTECT.get
+
+    for line in data.split(b"\n"):
+        fields = line.split(None, 5)
+        if len(fields) < 5:
+            continue
+        start, _, end = fields[0].partition(b"-")
+        base = int(start, 16)
+        permissions = fields[1]
+        protect = protect_for(permissions[:3], PAGE_NOACCESS)
+        path = fields[5] if len(fields) == 6 else b""
+
+        if path[:1] == b"/":
+            region_type = MEM_IMAGE if protect in _EXECUTABLE_PROTECT else MEM_MAPPED
+        else:
+            region_type = MEM_PRIVATE
+        append(base, int(end, 16) - base, protect, region_type, path)
+    return table
+
+
+def read_proc_maps(pid, proc_root="/proc"):
+    """Read /proc/<pid>/maps with one bulk read; returns an empty table if unavailable."""
+    try:
+        with open(f"{proc_root}/{pid}/maps", 'rb', buffering=0) as f:
+            chunks = []
+            while True:
+                chunk = f.read(1 << 20)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        return parse_proc_maps(b"".join(chunks))
+    except (OSError, ValueError):
+        return ProcMapsTable()
+
+
+class ScanBackend:
+    """Interface between ProcessScanner and the operating system."""
+
+    name = "base"
+    # Whether get_handles() reads a system handle table snapshot
+    supports_handles = False
+
+    def snapshot_processes(self):
+        """Return a ProcessRecord for every running process."""
+        return snapshot_records()
+
+    def read_process(self, pid):
+        """Return a fresh ProcessRecord for one process, or None if it no longer exists."""
+        return read_process_record(pid)
+
+    def capture_handles(self):
+        """Return a HandleSnapshot of the system handle table (used if supports_handles)."""
+        return HandleSnapshot()
+
+    def path_exists(self, path):
+        """Return whether a mapped file path exists (called through the scanner's PathStatusCache)."""
+        return os.path.exists(path)
+
+    def open_process(self, pid):
+        """Return a handle (or token) if the process can be inspected, otherwise None."""
+        raise NotImplementedError
+
+    def close_process(self, handle):
+        """Release a handle returned by open_process."""
+
+    def walk_memory(self, pid, admin=False):
+        """Return a MemoryRegionTable of the process address space."""
+        raise NotImplementedError
+
+    def memory_maps(self, pid, regions=None):
+        """Return the mapped files used by check_mapped_files (len() is used in fingerprints)."""
+        raise NotImplementedError
+
+    def suspicious_memory(self, pid, admin=False, regions=None):
+        """Return report dictionaries for suspicious memory regions."""
+        raise NotImplementedError
+
+    def check_mapped_files(self, pid, admin=False, maps=None, path_cache=None):
+        """Return report dictionaries for mappings of deleted or missing files."""
+        raise NotImplementedError
+
+    def get_handles(self, pid, admin=False, regions=None, handle_snapshot=None):
+        """Return handle description strings (TmTx / Section)."""
+        return []
+
+    def check_executable(self, pid, indicators):
+        """Add indicators about the process image itself to the indicators dictionary."""
+
+    def image_path(self, pid, record):
+        """Return a path from which the process's executable file can be read."""
+        return record.exe
+
+    def file_identity(self, path):
+        """Return the identity string (volume, file ID, size, mtime) of an executable file."""
+        return file_identity(path)
+
+    def read_file_header(self, path, size):
+        """Return the first size bytes of an executable file."""
+        return read_file_header(path, size)
+
+    def read_image_header(self, pid, size, regions=None):
+        """Return the first size bytes of the process's mapped main image, or None if unreadable."""
+        return None
+
+
+class WindowsBackend(ScanBackend):
+    """VirtualQueryEx, psutil memory maps and the system handle table."""
+
+    name = "windows"
+    supports_handles = True
+
+    def open_process(self, pid):
+        return open_process(pid)
+
+    def close_process(self, handle):
+        close_handle(handle)
+
+    def capture_handles(self):
+        return HandleSnapshot.capture()
+
+    def walk_memory(self, pid, admin=False):
+        return walk_process_memory(pid, admin)
+
+    def memory_maps(self, pid, regions=None):
+        return get_memory_maps(pid)
+
+    def suspicious_memory(self, pid, admin=False, regions=None):
+        return get_process_memory_info(pid, admin, regions)
+
+    def check_mapped_files(self, pid, admin=False, maps=None, path_cache=None):
+        return check_mapped_files(pid, admin, maps, path_cache)
+
+    def get_handles(self, pid, admin=False, regions=None, handle_snapshot=None):
+        return get_process_handles(pid, admin, regions, handle_snapshot)
+
+    def read_image_header(self, pid, size, regions=None):
+        return read_image_header(pid, size)
+
+
+class ProcFsBackend(ScanBackend):
+    """Linux /proc inspection; one bulk maps read per process feeds every memory check."""
+
+    name = "procfs"
+
+    def __init__(self, proc_root="/proc"):
+        self.proc_root = proc_root
+
+    def open_process(self, pid):
+        # Reading maps of another user's process needs ptrace access (root)
+        return True if os.access(f"{self.proc_root}/{pid}/maps", os.R_OK) else None
+
+    def walk_memory(self, pid, admin=False):
+        return read_proc_maps(pid, self.proc_root)
+
+    def memory_maps(self, pid, regions=None):
+        return regions if regions is not None else read_proc_maps(pid, self.proc_root)
+
+    def suspicious_memory(self, pid, admin=False, regions=None):
+        if regions is None:
+            regions = read_proc_maps(pid, self.proc_root)
+        memory_regions = []
+        for index in regions.rwx_indices(MEM_PRIVATE):
+            region_info = regions.region_info(index)
+            region_info["Suspicious"] = True
+            region_info["Reason"] = "Anonymous writable and executable mapping (rwxp)"
+            memory_regions.append(region_info)
+        return memory_regions
+
+    def check_mapped_files(self, pid, admin=False, maps=None, path_cache=None):
+        """Report executable mappings of deleted files, once per path.
+
+        Paths in maps are relative to the process's mount namespace, so a
+        missing path is only trusted when the kernel marks it "(deleted)";
+        path_cache is accepted for interface compatibility.
+        """
+        if maps is None:
+            maps = read_proc_maps(pid, self.proc_root)
+        suspicious_mappings = []
+        seen = set()
+        suffix = os.fsencode(DELETED_SUFFIX)
+        for index in range(len(maps)):
+            path = maps.paths[index]
+            if maps.type[index] != MEM_IMAGE or not path.endswith(suffix) or path in seen:
+                continue
+            seen.add(path)
+            suspicious_mappings.append({
+                "path": maps.path(index),
+                "size": maps.size[index],
+                "suspicious": True,
+                "reason": "Executable mapping of a deleted file"
+            })
+        return suspicious_mappings
+
+    def image_path(self, pid, record):
+        # Opens the mapped executable even if it was deleted or lives in
+        # another mount namespace
+        return f"{self.proc_root}/{pid}/exe"
+
+    def read_image_header(self, pid, size, regions=None):
+        # The main image starts at the lowest mapping of the file /proc/<pid>/exe points to
+        try:
+            exe = os.fsencode(os.readlink(f"{self.proc_root}/{pid}/exe"))
+        except OSError:
+            return None
+        if regions is None:
+            regions = read_proc_maps(pid, self.proc_root)
+        paths = regions.paths
+        bases = [regions.base[index] for index in range(len(paths)) if paths[index] == exe]
+        if not bases:
+            return None
+        try:
+            with open(f"{self.proc_root}/{pid}/mem", 'rb', buffering=0) as f:
+                f.seek(min(bases))
+                return f.read(size)
+        except (OSError, ValueError, OverflowError):
+            return None
+
+    def check_executable(self, pid, indicators):
+        try:
+            exe = os.readlink(f"{self.proc_root}/{pid}/exe")
+        except OSError:
+            return
+
+        details = indicators["details"]
+        if exe.startswith(MEMFD_PREFIX):
+            # Image from an anonymous in-memory file: the Linux counterpart of a
+            # process created from a section without a backing file
+            indicators["has_section_without_file"] = True
+            details.setdefault("section_without_file", []).append(
+                f"Process image is an anonymous memfd file: {exe}")
+        elif exe.endswith(DELETED_SUFFIX):
+            indicators["has_deleted_file_mapping"] = True
+            mappings = details.setdefault("suspicious_mappings", [])
+            if not any(mapping.get("path") == exe for mapping in mappings):
+                mappings.append({
+                    "path": exe,
+                    "suspicious": True,
+                    "reason": "Process executable was deleted from disk"
+                })
+
+
+def get_default_backend():
+    """Return the backend for the running platform."""
+    return WindowsBackend() if os.name == 'nt' else ProcFsBackend()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Cache module for Process Doppelgänging Detector
+-----------------------------------------------
+Small bounded caches shared by the scanner and the monitor.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+
+# Marker for "not in cache" so that None can be cached as a value
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache with a size bound and a per-entry time to live."""
+
+    def __init__(self, max_entries=1024, ttl=300.0):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of entries kept (least recently used are evicted)
+            ttl: Seconds an entry stays valid, or None for no expiry
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires = entry
+                if expires is None or expires > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self._removed(key)
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """Store a value, evicting the least recently used entry if full."""
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if key not in self._entries:
+                self._added(key)
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._removed(evicted)
+                self.evictions += 1
+
+    def discard(self, key):
+        """Remove a single key if present."""
+        with self._lock:
+            if self._entries.pop(key, _MISSING) is not _MISSING:
+                self._removed(key)
+
+    def discard_where(self, predicate):
+        """Remove every entry whose key matches predicate(key).
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            stale = [key for key in self._entries if predicate(key)]
+            for key in stale:
+                del self._entries[key]
+                self._removed(key)
+        return len(stale)
+
+    def clear(self):
+        """Drop all entries (counters are kept)."""
+        with self._lock:
+            for key in self._entries:
+                self._removed(key)
+            self._entries.clear()
+
+    def _added(self, key):
+        """Called with the lock held when a new key is stored (for subclass indexes)."""
+
+    def _removed(self, key):
+        """Called with the lock held when a key is dropped for any reason."""
+
+    def stats(self):
+        """Return hit/miss counters and the current size."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+
+class ParentVerdictCache(TTLCache):
+    """Caches check_parent_process verdicts keyed by (pid, create_time).
+
+    Including the creation time in the key means a reused PID never sees the
+    verdict of the process that previously owned it. A pid -> keys index
+    makes invalidating one PID independent of the cache size.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300.0):
+        super().__init__(max_entries=max_entries, ttl=ttl)
+        self._keys_by_pid = {}
+
+    def _added(self, key):
+        self._keys_by_pid.setdefault(key[0], set()).add(key)
+
+    def _removed(self, key):
+        keys = self._keys_by_pid.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_pid[key[0]]
+
+    def invalidate_pid(self, pid):
+        """Forget every verdict for a PID, e.g. when that process exits."""
+        with self._lock:
+            keys = self._keys_by_pid.pop(pid, ())
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def retain(self, live_keys):
+        """Keep only verdicts whose (pid, create_time) is still running.
+
+        Args:
+            live_keys: Set of (pid, create_time) tuples from the current snapshot
+        """
+        return self.discard_where(lambda key: key not in live_keys)
+
+
+class PathStatusCache(TTLCache):
+    """Shared os.path.exists results for mapped file paths.
+
+    Nearly every process maps the same system DLLs, so one scan cycle only
+    needs to stat each distinct path once.
+    """
+
+    def __init__(self, max_entries=16384, ttl=60.0, path_exists=os.path.exists):
+        super().__init__(max_entries=max_entries, ttl=ttl)
+        self.path_exists = path_exists
+        self.stat_calls = 0
+
+    def exists(self, path):
+        """Return whether path exists, using the cached result when fresh."""
+        status = self.get(path)
+        if status is None:
+            status = self.path_exists(path)
+            self.stat_calls += 1
+            self.put(path, status)
+        return status
+
+    def prefetch(self, paths):
+        """Stat every distinct path that is not cached yet in one batch.
+
+        Returns:
+            Dictionary {path: exists} for all given paths
+        """
+        results = {}
+        missing = []
+        for path in set(paths):
+            status = self.get(path)
+            if status is None:
+                missing.append(path)
+            else:
+                results[path] = status
+        for path in missing:
+            status = self.path_exists(path)
+            self.put(path, status)
+            results[path] = status
+        self.stat_calls += len(missing)
+        return results
+
+    def stats(self):
+        """Return cache counters including the number of stat calls made."""
+        stats = super().stats()
+        stats["stat_calls"] = self.stat_calls
+        return stats
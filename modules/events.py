@@ -0,0 +1,446 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Events module for Process Doppelgänging Detector
+------------------------------------------------
+Process creation/exit event sources for the monitor. Every source is
+polled from the monitor's receiver thread and returns ProcessEvent
+objects, so the rest of the pipeline does not care where they come from.
+"""
+import os
+import json
+import time
+import errno
+import socket
+import struct
+
+import psutil
+
+from .logger import get_logger
+
+CREATE = "create"
+EXIT = "exit"
+
+# Kernel proc connector (linux/connector.h, linux/cn_proc.h)
+NETLINK_CONNECTOR = 11
+CN_IDX_PROC = 1
+CN_VAL_PROC = 1
+NLMSG_DONE = 3
+PROC_CN_MCAST_LISTEN = 1
+PROC_CN_MCAST_IGNORE = 2
+PROC_EVENT_FORK = 0x00000001
+PROC_EVENT_EXEC = 0x00000002
+PROC_EVENT_EXIT = 0x80000000
+
+# nlmsghdr: len, type, flags, seq, pid
+_NLMSGHDR = struct.Struct("=IHHII")
+# cn_msg: idx, val, seq, ack, len, flags
+_CN_MSG = struct.Struct("=IIIIHH")
+# proc_event header: what, cpu, timestamp_ns
+_PROC_EVENT = struct.Struct("=IIQ")
+# exec/exit event data start with process_pid, process_tgid; fork event data
+# is parent_pid, parent_tgid, child_pid, child_tgid
+_PROC_IDS = struct.Struct("=II")
+_OP = struct.Struct("=I")
+
+# Receive buffer size; one datagram never exceeds a page of events
+_NETLINK_BUFFER_SIZE = 64 * 1024
+
+
+class ProcessEvent:
+    """A process creation or exit."""
+    __slots__ = ('kind', 'pid', 'name', 'create_time', 'ppid', 'timestamp')
+
+    def __init__(self, kind, pid, name=None, create_time=None, ppid=None, timestamp=None):
+        self.kind = kind
+        self.pid = pid
+        self.name = name
+        self.create_time = create_time
+        self.ppid = ppid
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    def to_dict(self):
+        """Return the event as a dictionary (the replay file format)."""
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build an event from a dictionary written by to_dict."""
+        return cls(data.get("kind", CREATE), int(data["pid"]), data.get("name"),
+                   data.get("create_time"), data.get("ppid"), data.get("timestamp"))
+
+    def __repr__(self):
+        return f"ProcessEvent({self.kind}, pid={self.pid}, name={self.name!r})"
+
+
+class ProcessEventSource:
+    """Base class for event sources.
+
+    open() and close() run on the receiver thread, so sources that need
+    per-thread setup (COM for WMI) can do it there.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.logger = get_logger()
+
+    def open(self):
+        """Prepare the source before the first poll."""
+
+    def poll(self, timeout=1.0):
+        """Wait up to timeout seconds and return a list of new ProcessEvent objects."""
+        raise NotImplementedError
+
+    def close(self):
+        """Release resources held by the source."""
+
+
+class WmiEventSource(ProcessEventSource):
+    """Win32_Process creation and deletion events from WMI (Windows only)."""
+
+    name = "wmi"
+
+    def __init__(self):
+        super().__init__()
+        self.creation_watcher = None
+        self.deletion_watcher = None
+        self._wmi = None
+        self._pythoncom = None
+
+    def open(self):
+        import wmi
+        import pythoncom  # Import pythoncom for COM initialization
+        self._wmi = wmi
+        self._pythoncom = pythoncom
+
+        # Initialize COM for this thread
+        pythoncom.CoInitialize()
+
+        wmi_interface = wmi.WMI()
+        self.creation_watcher = wmi_interface.Win32_Process.watch_for("creation")
+        self.deletion_watcher = wmi_interface.Win32_Process.watch_for("deletion")
+
+    def poll(self, timeout=1.0):
+        events = []
+        # Block on the first creation event, then drain everything already
+        # queued on both watchers so exits never lag behind a burst
+        self._drain(CREATE, self.creation_watcher, int(timeout * 1000), events)
+        self._drain(EXIT, self.deletion_watcher, 1, events)
+        return events
+
+    def _drain(self, kind, watcher, first_timeout_ms, events, limit=1000):
+        """Append events from watcher until it times out, waiting first_timeout_ms for the first one."""
+        timeout_ms = first_timeout_ms
+        for _ in range(limit):
+            try:
+                process = watcher(timeout_ms=timeout_ms)
+            except self._wmi.x_wmi_timed_out:
+                return
+            if process:
+                events.append(ProcessEvent(kind, process.ProcessId, process.Name,
+                                           ppid=process.ParentProcessId))
+            # Only pick up events that are already waiting after the first
+            timeout_ms = 1
+
+    def close(self):
+        # Clean up COM resources when the receiver thread exits
+        try:
+            if self._pythoncom is not None:
+                self._pythoncom.CoUninitialize()
+        except:
+            pass
+
+
+class PollingEventSource(ProcessEventSource):
+    """Diffs consecutive process lists, keyed by (pid, create_time).
+
+    Works anywhere psutil does. Processes that start and exit between two
+    ticks are missed, so the interval bounds the shortest lifetime seen.
+    """
+
+    name = "poll"
+
+    def __init__(self, interval=1.0):
+        super().__init__()
+        self.interval = interval
+        self.previous = None
+        self._next_tick = 0.0
+
+    def _snapshot(self):
+        """Return {(pid, create_time): (name, ppid)} for all running processes."""
+        current = {}
+        for process in psutil.process_iter(['name', 'create_time', 'ppid'], ad_value=None):
+            info = process.info
+            current[(process.pid, info['create_time'])] = (info['name'], info['ppid'])
+        return current
+
+    def open(self):
+        # Processes already running are not reported as new
+        self.previous = self._snapshot()
+        self._next_tick = time.monotonic() + self.interval
+
+    def poll(self, timeout=1.0):
+        wait = self._next_tick - time.monotonic()
+        if wait > timeout:
+            time.sleep(timeout)
+            return []
+        if wait > 0:
+            time.sleep(wait)
+        self._next_tick = max(self._next_tick + self.interval, time.monotonic())
+
+        current = self._snapshot()
+        previous = self.previous if self.previous is not None else current
+        self.previous = current
+
+        now = time.time()
+        events = [ProcessEvent(EXIT, pid, name, create_time, ppid, now)
+                  for (pid, create_time), (name, ppid) in previous.items()
+                  if (pid, create_time) not in current]
+        # Report creations oldest first so scheduled scans are in creation order
+        created = sorted((key for key in current if key not in previous),
+                         key=lambda key: key[1] or 0)
+        for pid, create_time in created:
+            name, ppid = current[(pid, create_time)]
+            events.append(ProcessEvent(CREATE, pid, name, create_time, ppid, now))
+        return events
+
+
+def parse_proc_connector(buffer, nbytes):
+    """Decode proc connector events from a received netlink datagram.
+
+    Args:
+        buffer: bytes-like receive buffer
+        nbytes: Number of valid bytes in the buffer
+
+    Yields:
+        (what, pid, tgid, timestamp_ns) for fork, exec and exit events; for
+        fork events pid and tgid are those of the child
+    """
+    view = memoryview(buffer)
+    offset = 0
+    header_size = _NLMSGHDR.size + _CN_MSG.size
+    while offset + header_size + _PROC_EVENT.size + _PROC_IDS.size <= nbytes:
+        msg_len = _NLMSGHDR.unpack_from(view, offset)[0]
+        if msg_len < header_size or offset + msg_len > nbytes:
+            return
+        idx, val = _CN_MSG.unpack_from(view, offset + _NLMSGHDR.size)[:2]
+        if idx == CN_IDX_PROC and val == CN_VAL_PROC:
+            event_offset = offset + header_size
+            what, _, timestamp_ns = _PROC_EVENT.unpack_from(view, event_offset)
+            ids_offset = event_offset + _PROC_EVENT.size
+            if what == PROC_EVENT_FORK:
+                ids_offset += _PROC_IDS.size
+            if what in (PROC_EVENT_FORK, PROC_EVENT_EXEC, PROC_EVENT_EXIT) \
+                    and ids_offset + _PROC_IDS.size <= offset + msg_len:
+                pid, tgid = _PROC_IDS.unpack_from(view, ids_offset)
+                yield what, pid, tgid, timestamp_ns
+        # Messages are padded to 4 bytes
+        offset += (msg_len + 3) & ~3
+
+
+class NetlinkEventSource(ProcessEventSource):
+    """Fork, exec and exit events from the Linux kernel proc connector.
+
+    Subscribing needs CAP_NET_ADMIN; without it the source falls back to
+    a PollingEventSource. The socket blocks between events, so an idle
+    machine costs nothing.
+
+    Forks of new processes (not threads) are reported as creations, so a
+    process that forks without exec is scanned too. The exec that usually
+    follows keeps the process's start time, so the monitor's scheduler
+    treats it as the same process and does not scan it twice. Creation
+    times are the process's real start time from /proc, the same value
+    psutil reports, so they match the (pid, create_time) cache keys.
+    """
+
+    name = "netlink"
+
+    def __init__(self, fallback_interval=1.0):
+        super().__init__()
+        self.fallback_interval = fallback_interval
+        self.fallback = None
+        self.sock = None
+        self._buffer = bytearray(_NETLINK_BUFFER_SIZE)
+
+    def open(self):
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, NETLINK_CONNECTOR)
+        except (AttributeError, OSError) as e:
+            self._use_fallback(f"netlink sockets are not available ({e})")
+            return
+        try:
+            sock.bind((os.getpid(), CN_IDX_PROC))
+            self._send_op(sock, PROC_CN_MCAST_LISTEN)
+        except OSError as e:
+            sock.close()
+            if isinstance(e, PermissionError) or e.errno in (errno.EPERM, errno.EACCES):
+                self._use_fallback("subscribing to the proc connector requires CAP_NET_ADMIN")
+                return
+            raise
+        self.sock = sock
+
+    def _use_fallback(self, reason):
+        self.logger.warning(f"Netlink process events unavailable: {reason}; falling back to polling")
+        self.name = PollingEventSource.name
+        self.fallback = PollingEventSource(self.fallback_interval)
+        self.fallback.open()
+
+    @staticmethod
+    def _send_op(sock, op):
+        payload = _OP.pack(op)
+        cn_msg = _CN_MSG.pack(CN_IDX_PROC, CN_VAL_PROC, 0, 0, len(payload), 0)
+        size = _NLMSGHDR.size + len(cn_msg) + len(payload)
+        sock.send(_NLMSGHDR.pack(size, NLMSG_DONE, 0, 0, os.getpid()) + cn_msg + payload)
+
+    def poll(self, timeout=1.0):
+        if self.fallback is not None:
+            return self.fallback.poll(timeout)
+
+        events = []
+        self.sock.settimeout(timeout)
+        while True:
+            try:
+                nbytes = self.sock.recv_into(self._buffer)
+            except (socket.timeout, BlockingIOError):
+                break
+            except OSError as e:
+                if e.errno != errno.ENOBUFS:
+                    raise
+                # The kernel dropped events because we fell behind; keep going
+                self.logger.warning("Netlink receive buffer overrun, some process events were lost")
+                continue
+
+            now = time.time()
+            for what, pid, tgid, _ in parse_proc_connector(self._buffer, nbytes):
+                # Only whole processes, not individual threads
+                if pid != tgid:
+                    continue
+                if what != PROC_EVENT_EXIT:
+                    name, create_time, ppid = self._read_process(pid)
+                    events.append(ProcessEvent(CREATE, pid, name, create_time, ppid, now))
+                else:
+                    events.append(ProcessEvent(EXIT, pid, timestamp=now))
+
+            # Drain whatever else is already queued without blocking again
+            if len(events) >= 1000:
+                break
+            self.sock.settimeout(0)
+        return events
+
+    @staticmethod
+    def _read_process(pid):
+        """Return (name, create_time, ppid) of a new process, or Nones if it already exited."""
+        try:
+            process = psutil.Process(pid)
+            with process.oneshot():
+                return process.name(), process.create_time(), process.ppid()
+        except psutil.Error:
+            return None, None, None
+
+    def close(self):
+        if self.fallback is not None:
+            self.fallback.close()
+        if self.sock is not None:
+            try:
+                self._send_op(self.sock, PROC_CN_MCAST_IGNORE)
+            except OSError:
+                pass
+            self.sock.close()
+            self.sock = None
+
+
+class ReplayEventSource(ProcessEventSource):
+    """Replays events from a JSON lines file written with ProcessEvent.to_dict.
+
+    Args:
+        filepath: Path of the JSON lines file
+        realtime: Keep the original spacing between event timestamps instead
+                  of replaying as fast as possible
+    """
+
+    name = "replay"
+
+    def __init__(self, filepath, realtime=True):
+        super().__init__()
+        self.filepath = filepath
+        self.realtime = realtime
+        self.exhausted = False
+        self._file = None
+        self._pending = None
+        self._offset = None
+
+    def open(self):
+        self._file = open(self.filepath, 'r', encoding='utf-8')
+        self.exhausted = False
+
+    def _next_event(self):
+        for line in self._file:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                return ProcessEvent.from_dict(json.loads(line))
+            except (ValueError, KeyError) as e:
+                self.logger.warning(f"Skipping invalid replay line: {e}")
+        self.exhausted = True
+        return None
+
+    def poll(self, timeout=1.0):
+        if self.exhausted:
+            time.sleep(timeout)
+            return []
+
+        events = []
+        deadline = time.monotonic() + timeout
+        while True:
+            event = self._pending or self._next_event()
+            self._pending = None
+            if event is None:
+                return events
+            if not self.realtime:
+                events.append(event)
+                if len(events) >= 1000:
+                    return events
+                continue
+
+            # Map the first event to now and keep the recorded spacing after it
+            if self._offset is None:
+                self._offset = time.monotonic() - event.timestamp
+            due = event.timestamp + self._offset
+            wait = due - time.monotonic()
+            if wait > 0:
+                if events or due > deadline:
+                    self._pending = event
+                    if not events:
+                        time.sleep(max(0.0, deadline - time.monotonic()))
+                    return events
+                time.sleep(wait)
+            events.append(event)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def create_event_source(kind, poll_interval=1.0, replay_file=None):
+    """Build the event source selected on the command line.
+
+    Args:
+        kind: "wmi", "netlink", "poll" or "replay"
+        poll_interval: Seconds between process list snapshots for "poll"
+                       (and for "netlink" when it falls back to polling)
+        replay_file: JSON lines file for "replay"
+    """
+    if kind == "wmi":
+        return WmiEventSource()
+    if kind == "netlink":
+        return NetlinkEventSource(poll_interval)
+    if kind == "poll":
+        return PollingEventSource(poll_interval)
+    if kind == "replay":
+        if not replay_file:
+            raise ValueError("A replay file is required for the replay event source")
+        return ReplayEventSource(replay_file)
+    raise ValueError(f"Unknown event source: {kind}")
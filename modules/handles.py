@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Handles module for Process Doppelgänging Detector
+-------------------------------------------------
+Captures the system-wide handle table with one
+NtQuerySystemInformation(SystemExtendedHandleInformation) call per scan
+cycle and indexes the interesting object types (TmTx, Section) by PID.
+
+The buffer parser is a pure function so it can be exercised on any
+platform with synthetic data.
+"""
+import os
+import time
+import ctypes
+import struct
+import threading
+
+# NtQuerySystemInformation class and status codes
+SYSTEM_EXTENDED_HANDLE_INFORMATION = 64
+STATUS_SUCCESS = 0
+STATUS_INFO_LENGTH_MISMATCH = 0xC0000004
+
+# Object types we index; everything else is skipped while parsing
+TRANSACTION_TYPE = "TmTx"
+SECTION_TYPE = "Section"
+
+# SYSTEM_HANDLE_INFORMATION_EX header: NumberOfHandles, Reserved (both ULONG_PTR)
+# SYSTEM_HANDLE_TABLE_ENTRY_INFO_EX: Object, UniqueProcessId, HandleValue (pointer sized),
+# GrantedAccess (ULONG), CreatorBackTraceIndex, ObjectTypeIndex (USHORT),
+# HandleAttributes, Reserved (ULONG)
+_LAYOUTS = {
+    8: (struct.Struct("<QQ"), struct.Struct("<QQQIHHII")),
+    4: (struct.Struct("<II"), struct.Struct("<IIIIHHII")),
+}
+
+# Initial query buffer size, grown on STATUS_INFO_LENGTH_MISMATCH
+_INITIAL_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Seconds before an incomplete type index lookup is tried again
+TYPE_INDEX_RETRY = 60.0
+
+
+def iter_handle_entries(buffer, pointer_size=8):
+    """Yield (pid, handle_value, type_index, granted_access) from a raw handle buffer.
+
+    Args:
+        buffer: bytes-like SYSTEM_HANDLE_INFORMATION_EX returned by the kernel
+        pointer_size: 8 for 64-bit Windows, 4 for 32-bit
+    """
+    header, entry = _LAYOUTS[pointer_size]
+    view = memoryview(buffer)
+    if len(view) < header.size:
+        return
+
+    count = header.unpack_from(view, 0)[0]
+    # Never read past the buffer even if the count claims more entries
+    count = min(count, (len(view) - header.size) // entry.size)
+    end = header.size + count * entry.size
+
+    for _, pid, handle, access, _, type_index, _, _ in entry.iter_unpack(view[header.size:end]):
+        yield pid, handle, type_index, access
+
+
+def parse_handle_buffer(buffer, type_names, pointer_size=8):
+    """Index a raw handle buffer by PID and object type name.
+
+    Args:
+        buffer: bytes-like SYSTEM_HANDLE_INFORMATION_EX
+        type_names: Mapping of ObjectTypeIndex -> type name for the types to keep
+        pointer_size: 8 for 64-bit Windows, 4 for 32-bit
+
+    Returns:
+        Dictionary {pid: {type_name: [(handle_value, granted_access), ...]}}
+    """
+    index = {}
+    for pid, handle, type_index, access in iter_handle_entries(buffer, pointer_size):
+        type_name = type_names.get(type_index)
+        if type_name is None:
+            continue
+        index.setdefault(pid, {}).setdefault(type_name, []).append((handle, access))
+    return index
+
+
+class HandleSnapshot:
+    """System handle table captured at one point in time, indexed by PID."""
+
+    def __init__(self, index=None, captured_at=None):
+        self.index = index or {}
+        self.captured_at = time.monotonic() if captured_at is None else captured_at
+
+    @property
+    def age(self):
+        """Seconds since the snapshot was captured."""
+        return time.monotonic() - self.captured_at
+
+    def handles_for(self, pid, type_name):
+        """Return [(handle_value, granted_access), ...] of one type held by a process."""
+        return self.index.get(pid, {}).get(type_name, [])
+
+    @classmethod
+    def capture(cls):
+        """Query the kernel handle table and return a new snapshot (Windows only)."""
+        type_indices = get_type_indices()
+        # Parse while holding the lock: the view points into the shared buffer
+        with _buffer_lock:
+            view = query_system_handles()
+            return cls(parse_handle_buffer(view, type_indices, ctypes.sizeof(ctypes.c_void_p)))
+
+
+_buffer = None
+_buffer_lock = threading.RLock()
+_type_indices = None
+_type_indices_retry_at = 0.0
+
+
+def query_system_handles():
+    """Return a memoryview of the raw SystemExtendedHandleInformation buffer.
+
+    The underlying bytearray is reused between calls and only grows, so the
+    view is only valid until the next query; hold _buffer_lock while using it.
+    """
+    global _buffer
+    ntdll = ctypes.windll.ntdll
+    query = ntdll.NtQuerySystemInformation
+    query.argtypes = [ctypes.c_ulong, ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(ctypes.c_ulong)]
+    query.restype = ctypes.c_long
+
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = bytearray(_INITIAL_BUFFER_SIZE)
+
+        return_length = ctypes.c_ulong(0)
+        while True:
+            c_buffer = (ctypes.c_char * len(_buffer)).from_buffer(_buffer)
+            status = query(SYSTEM_EXTENDED_HANDLE_INFORMATION, c_buffer, len(_buffer),
+                           ctypes.byref(return_length)) & 0xFFFFFFFF
+            del c_buffer
+            if status == STATUS_INFO_LENGTH_MISMATCH:
+                # Handle count changes between calls, so leave some headroom
+                _buffer = bytearray(max(len(_buffer) * 2, return_length.value + 1024 * 1024))
+                continue
+            if status != STATUS_SUCCESS:
+                raise OSError(f"NtQuerySystemInformation failed with status 0x{status:08X}")
+            return memoryview(_buffer)[:return_length.value or len(_buffer)]
+
+
+def get_type_indices():
+    """Return {ObjectTypeIndex: type name} for the TmTx and Section object types.
+
+    Type indices differ between Windows builds, so they are found by
+    creating one object of each type in this process and looking up the
+    matching handles in the system table. A complete result is kept for the
+    life of the process; an incomplete one (a transient failure) is returned
+    as is and looked up again after TYPE_INDEX_RETRY seconds.
+    """
+    global _type_indices, _type_indices_retry_at
+    if _type_indices is not None:
+        if len(_type_indices) == 2 or time.monotonic() < _type_indices_retry_at:
+            return _type_indices
+
+    kernel32 = ctypes.windll.kernel32
+    ktmw32 = ctypes.windll.ktmw32
+    kernel32.CreateFileMappingW.restype = ctypes.c_void_p
+    kernel32.CreateFileMappingW.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_ulong,
+                                            ctypes.c_ulong, ctypes.c_ulong, ctypes.c_wchar_p]
+    ktmw32.CreateTransaction.restype = ctypes.c_void_p
+    kernel32.CloseHandle.argtypes = [ctypes.c_void_p]
+
+    INVALID_HANDLE_VALUE = ctypes.c_void_p(-1).value
+    PAGE_READWRITE = 0x04
+
+    transaction = ktmw32.CreateTransaction(None, None, 0, 0, 0, 0, None)
+    section = kernel32.CreateFileMappingW(INVALID_HANDLE_VALUE, None, PAGE_READWRITE, 0, 4096, None)
+    try:
+        wanted = {}
+        if transaction and transaction != INVALID_HANDLE_VALUE:
+            wanted[transaction] = TRANSACTION_TYPE
+        if section:
+            wanted[section] = SECTION_TYPE
+
+        own_pid = os.getpid()
+        indices = {}
+        with _buffer_lock:
+            for pid, handle, type_index, _ in iter_handle_entries(query_system_handles(),
+                                                                 ctypes.sizeof(ctypes.c_void_p)):
+                if pid == own_pid and handle in wanted:
+                    indices[type_index] = wanted[handle]
+    finally:
+        for handle in (transaction, section):
+            if handle:
+                kernel32.CloseHandle(handle)
+
+    _type_indices = indices
+    if len(indices) < 2:
+        _type_indices_retry_at = time.monotonic() + TYPE_INDEX_RETRY
+    return indices
@@ -0,0 +1,223 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Image cache module for Process Doppelgänging Detector
+-----------------------------------------------------
+On-disk references for the in-memory image comparison. A doppelganged
+process runs a section created from a transacted (later rolled back) file,
+so the headers mapped at its image base do not match the executable that
+is on disk under the same name. The scanner reads the headers from the
+process's memory and compares their digest with the digest of the file's
+headers.
+
+The file side is the same for every launch of one binary, so its digest is
+kept per file identity (volume, file ID, size, mtime): a hit costs one
+stat instead of opening, reading and parsing the file. Entries are
+persisted as JSON when a cache file is given.
+
+Headers are compared on the bytes the loader maps unchanged: for PE images
+SizeOfHeaders bytes with OptionalHeader.ImageBase zeroed (it is rewritten
+when the image is relocated), for ELF images the ELF and program headers.
+"""
+import os
+import json
+import time
+import struct
+import hashlib
+import threading
+
+IMAGE_CACHE_VERSION = 2
+
+# Bytes read from the start of the file and of the mapped image
+IMAGE_HEADER_SIZE = 4096
+
+# PE OptionalHeader magic -> (offset, size) of its ImageBase field
+_PE_IMAGE_BASE = {0x20b: (24, 8), 0x10b: (28, 4)}
+# Offset of SizeOfHeaders in the OptionalHeader (same for PE32 and PE32+)
+_PE_SIZE_OF_HEADERS = 60
+
+
+def file_identity(path):
+    """Return "volume:file_id:size:mtime_ns" for a file (os.stat follows links)."""
+    st = os.stat(path)
+    return f"{st.st_dev}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def read_file_header(path, size=IMAGE_HEADER_SIZE):
+    """Return the first size bytes of a file."""
+    with open(path, 'rb') as f:
+        return f.read(size)
+
+
+def _pe_header(data):
+    """Return the comparable PE header bytes, or None if data is not a PE image."""
+    if len(data) < 0x40 or data[:2] != b"MZ":
+        return None
+    e_lfanew = struct.unpack_from("<I", data, 0x3C)[0]
+    optional = e_lfanew + 24
+    if optional + _PE_SIZE_OF_HEADERS + 4 > len(data) or data[e_lfanew:e_lfanew + 4] != b"PE\0\0":
+        return None
+    image_base = _PE_IMAGE_BASE.get(struct.unpack_from("<H", data, optional)[0])
+    if image_base is None:
+        return None
+    size_of_headers = struct.unpack_from("<I", data, optional + _PE_SIZE_OF_HEADERS)[0]
+    header = bytearray(data[:min(max(size_of_headers, optional), len(data))])
+    offset, size = image_base
+    header[optional + offset:optional + offset + size] = bytes(size)
+    return bytes(header)
+
+
+def _elf_header(data):
+    """Return the ELF and program header bytes, or None if data is not an ELF image."""
+    if len(data) < 0x34 or data[:4] != b"\x7fELF":
+        return None
+    order = {1: "<", 2: ">"}.get(data[5])
+    if order is None:
+        return None
+    # e_phoff, then e_shoff and e_flags, then e_ehsize, e_phentsize and e_phnum
+    layout = {2: ("Q12xHHH", 0x20), 1: ("I8xHHH", 0x1C)}.get(data[4])
+    if layout is None:
+        return None
+    try:
+        phoff, ehsize, phentsize, phnum = struct.unpack_from(order + layout[0], data, layout[1])
+    except struct.error:
+        return None
+    return data[:min(max(ehsize, phoff + phentsize * phnum), len(data))]
+
+
+def header_digest(data):
+    """Return (length, sha256) of the comparable part of an image header.
+
+    Returns None for data that is neither a PE nor an ELF image, so the two
+    sides are only compared when both can be parsed.
+    """
+    header = _pe_header(data)
+    if header is None:
+        header = _elf_header(data)
+    if header is None:
+        return None
+    return len(header), hashlib.sha256(header).hexdigest()
+
+
+class ImageHeaderCache:
+    """Header digests of executable files, keyed by file identity.
+
+    identity and read_header are the backend's file_identity and
+    read_file_header, so simulated and /proc backends supply their own files.
+    """
+
+    def __init__(self, filepath=None, max_entries=50000, identity=file_identity, read_header=read_file_header):
+        """Load the cache file if it exists.
+
+        Args:
+            filepath: Path of the JSON cache file (None keeps the cache in memory only)
+            max_entries: Maximum number of files kept (oldest are dropped first)
+            identity: Function returning the identity string of a file path
+            read_header: Function returning the first bytes of a file, as read_header(path, size)
+        """
+        self.filepath = filepath
+        self.max_entries = max_entries
+        self.identity = identity
+        self.read_header = read_header
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        # Identity lookups on every call, and file reads on misses
+        self.identity_time = 0.0
+        self.read_time = 0.0
+        # File reads of earlier runs as [count, seconds], so the time saved by a
+        # run that only has hits can still be estimated
+        self.read_history = [0, 0.0]
+        self._lock = threading.Lock()
+        self.load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def load(self):
+        """Read the cache file, starting empty if it is missing, unreadable or stale."""
+        if not self.filepath:
+            return
+        try:
+            with open(self.filepath, 'r') as f:
+                data = json.load(f)
+            if data.get("version") == IMAGE_CACHE_VERSION:
+                self.entries = data.get("entries", {})
+                self.read_history = list(data.get("reads", [0, 0.0]))
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        """Write the cache file atomically."""
+        if not self.filepath:
+            return True
+        temp_path = f"{self.filepath}.tmp"
+        try:
+            with self._lock:
+                reads = [self.read_history[0] + self.misses, self.read_history[1] + self.read_time]
+                data = {"version": IMAGE_CACHE_VERSION, "reads": reads, "entries": dict(self.entries)}
+            with open(temp_path, 'w') as f:
+                json.dump(data, f, separators=(',', ':'))
+            os.replace(temp_path, self.filepath)
+            return True
+        except OSError:
+            return False
+
+    def reference(self, path):
+        """Return the (length, sha256) header digest of an executable file.
+
+        Returns None if the file cannot be read or is not a PE or ELF image.
+        """
+        start = time.perf_counter()
+        try:
+            identity = self.identity(path)
+        except (OSError, ValueError):
+            with self._lock:
+                self.errors += 1
+                self.identity_time += time.perf_counter() - start
+            return None
+
+        looked_up = time.perf_counter()
+        with self._lock:
+            self.identity_time += looked_up - start
+            if identity in self.entries:
+                self.hits += 1
+                entry = self.entries[identity]
+                return tuple(entry) if entry else None
+
+        try:
+            digest = header_digest(self.read_header(path, IMAGE_HEADER_SIZE))
+        except (OSError, ValueError):
+            with self._lock:
+                self.errors += 1
+            return None
+
+        with self._lock:
+            self.read_time += time.perf_counter() - looked_up
+            self.misses += 1
+            # Files that are not images are remembered too, as an empty entry
+            self.entries[identity] = list(digest) if digest else []
+            while len(self.entries) > self.max_entries:
+                del self.entries[next(iter(self.entries))]
+        return digest
+
+    def stats(self):
+        """Return hit rates and the estimated net time saved by skipping file reads.
+
+        time_saved is the read time avoided on hits (at the average file read
+        cost, including earlier runs) minus the time spent on identity lookups.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            reads = self.read_history[0] + self.misses
+            average_read = (self.read_history[1] + self.read_time) / reads if reads else 0.0
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "lookup_time": round(self.identity_time + self.read_time, 6),
+                "time_saved": round(self.hits * average_read - self.identity_time, 6)
+            }
@@ -0,0 +1,340 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Log handlers module for Process Doppelgänging Detector
+------------------------------------------------------
+File handlers used by the logger: batched writes for the async listener,
+and rotation of the active log by size and age. Rotated
+segments are renamed with a timestamp and compressed by a background
+archiver thread (gzip, or zstd when the zstandard package is installed),
+which also enforces the archive count and age limits. The thread that
+writes log records only renames files.
+"""
+import os
+import re
+import gzip
+import time
+import queue
+import shutil
+import logging
+import threading
+
+# Rotated segment suffix: detector.log.20240131-235959[-2]
+_STAMP_FORMAT = "%Y%m%d-%H%M%S"
+_SEGMENT_PATTERN = r"\.(\d{8}-\d{6})(?:-(\d+))?"
+
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst", "none": ""}
+
+# Bytes copied per read while compressing a segment
+COPY_CHUNK_SIZE = 1 << 20
+
+_SIZE_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+
+def parse_size(value):
+    """Parse a size such as "50M", "512K", "1G" or "1048576" into bytes.
+
+    Raises:
+        ValueError: If the value is not a non-negative size
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMG]?)B?\s*", str(value).upper())
+    if not match:
+        raise ValueError(f"Invalid size: {value!r}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2)])
+
+
+def _zstd_compressor():
+    """Return a zstandard compressor, or None if the package is not installed."""
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard.ZstdCompressor(level=3)
+
+
+class BatchingFileHandler(logging.FileHandler):
+    """File handler that can write a batch of records with a single write call."""
+
+    def emit_batch(self, records):
+        """Format records and write them in one write and one flush."""
+        try:
+            lines = [self.format(record) for record in records if record.levelno >= self.level]
+            if not lines:
+                return
+            with self.lock:
+                if self.stream is None:
+                    self.stream = self._open()
+                self.stream.write(self.terminator.join(lines) + self.terminator)
+                self.stream.flush()
+        except Exception:
+            for record in records:
+                self.handleError(record)
+
+
+class LogArchiver:
+    """Background thread compressing rotated segments and pruning old archives."""
+
+    def __init__(self, base_path, compression="gzip", max_archives=0, retention_days=0):
+        """Initialize the archiver.
+
+        Args:
+            base_path: Path of the active log file; segments are base_path.<timestamp>
+            compression: "gzip", "zstd" or "none"
+            max_archives: Maximum number of rotated segments kept (0 = unlimited)
+            retention_days: Segments older than this are deleted (0 = keep)
+        """
+        self.base_path = os.path.abspath(base_path)
+        self.max_archives = max_archives
+        self.retention_days = retention_days
+        self.compressed = 0
+        self.deleted = 0
+        self.errors = 0
+
+        self._zstd = _zstd_compressor() if compression == "zstd" else None
+        if compression == "zstd" and self._zstd is None:
+            # zstandard is optional; fall back to the standard library
+            compression = "gzip"
+        self.compression = compression
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+        directory, name = os.path.split(self.base_path)
+        self._directory = directory or "."
+        self._segment_re = re.compile(re.escape(name) + _SEGMENT_PATTERN + r"(\.gz|\.zst)?$")
+
+    def segments(self):
+        """Return (path, compressed) for every rotated segment, oldest first."""
+        try:
+            names = os.listdir(self._directory)
+        except OSError:
+            return []
+        found = []
+        for name in names:
+            match = self._segment_re.match(name)
+            if match:
+                stamp, counter, suffix = match.groups()
+                found.append(((stamp, int(counter or 1)), os.path.join(self._directory, name), bool(suffix)))
+        # Timestamp and counter order segments chronologically
+        found.sort()
+        return [(path, compressed) for _, path, compressed in found]
+
+    def submit(self, path=None):
+        """Queue a segment for compression (None only applies retention)."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="log-archiver")
+                self._thread.daemon = True
+                self._thread.start()
+        self._queue.put(path)
+
+    def resume(self):
+        """Queue segments left uncompressed by a previous run, then apply retention."""
+        if self.compression != "none":
+            for path, compressed in self.segments():
+                if not compressed:
+                    self.submit(path)
+        self.submit(None)
+
+    def _run(self):
+        while True:
+            path = self._queue.get()
+            try:
+                if path is not None and self.compression != "none":
+                    self._compress(path)
+                self._apply_retention()
+            except Exception:
+                self.errors += 1
+            finally:
+                self._queue.task_done()
+
+    def _compress(self, path):
+        """Compress one segment to path + suffix and remove the original."""
+        if not os.path.exists(path):
+            return
+        target = path + COMPRESSION_SUFFIXES[self.compression]
+        temp_path = f"{target}.tmp"
+        try:
+            with open(path, 'rb') as source:
+                if self._zstd is not None:
+                    with open(temp_path, 'wb') as destination:
+                        self._zstd.copy_stream(source, destination, read_size=COPY_CHUNK_SIZE)
+                else:
+                    with gzip.open(temp_path, 'wb', compresslevel=6) as destination:
+                        shutil.copyfileobj(source, destination, COPY_CHUNK_SIZE)
+            os.replace(temp_path, target)
+            os.remove(path)
+            self.compressed += 1
+        except OSError:
+            self.errors += 1
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+
+    def _apply_retention(self):
+        """Delete segments beyond max_archives and older than retention_days."""
+        segments = [path for path, _ in self.segments()]
+        expired = []
+        if self.max_archives and len(segments) > self.max_archives:
+            expired = segments[:len(segments) - self.max_archives]
+            segments = segments[len(expired):]
+        if self.retention_days:
+            cutoff = time.time() - self.retention_days * 86400
+            for path in segments:
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        expired.append(path)
+                except OSError:
+                    pass
+        for path in expired:
+            try:
+                os.remove(path)
+                self.deleted += 1
+            except OSError:
+                self.errors += 1
+
+    def wait(self, timeout=None):
+        """Wait until queued segments are processed (or the timeout expires).
+
+        Returns:
+            True if the queue was drained
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def stats(self):
+        """Return compression, deletion and error counters."""
+        return {
+            "compression": self.compression,
+            "pending": self._queue.unfinished_tasks,
+            "compressed": self.compressed,
+            "deleted": self.deleted,
+            "errors": self.errors
+        }
+
+
+class RotatingLogFileHandler(BatchingFileHandler):
+    """Log file handler rotating by size and age with compressed, pruned archives.
+
+    The size is checked before each write (or batch), so a segment can exceed
+    max_bytes by at most one batch. Rotation renames the active file; if the
+    rename fails (e.g. another program holds the file open without delete
+    sharing on Windows), logging continues in the same file and rotation is
+    retried after ROTATE_RETRY_DELAY seconds.
+    """
+
+    ROTATE_RETRY_DELAY = 60.0
+
+    def __init__(self, filename, max_bytes=0, max_age=0, compression="gzip",
+                 max_archives=0, retention_days=0, encoding=None):
+        """Open the log file for appending.
+
+        Args:
+            filename: Active log file path
+            max_bytes: Rotate once the file reaches this size (0 = no size limit)
+            max_age: Rotate after this many seconds (0 = no age limit)
+            compression: "gzip", "zstd" or "none"
+            max_archives: Maximum number of rotated segments kept (0 = unlimited)
+            retention_days: Delete rotated segments older than this (0 = keep)
+        """
+        super().__init__(filename, mode='a', encoding=encoding)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.opened_at = self._file_started_at()
+        self.rotations = 0
+        self._retry_at = 0.0
+        self._last_stamp = None
+        self._last_counter = 0
+        self.archiver = LogArchiver(self.baseFilename, compression, max_archives, retention_days)
+        self.archiver.resume()
+
+    def _file_started_at(self):
+        """Return when the existing active file was started, or now for a new or empty file.
+
+        Restarting the detector must not reset the age of a file it keeps
+        appending to. The creation time is used where the platform records it
+        (st_birthtime, or st_ctime on Windows), otherwise the last modification.
+        """
+        try:
+            st = os.stat(self.baseFilename)
+        except OSError:
+            return time.time()
+        if st.st_size == 0:
+            return time.time()
+        started = getattr(st, "st_birthtime", None)
+        if started is None:
+            started = st.st_ctime if os.name == 'nt' else st.st_mtime
+        return min(started, time.time())
+
+    def should_rotate(self):
+        """Return True if the active file is over its size or age limit."""
+        now = time.time()
+        if now < self._retry_at:
+            return False
+        if self.max_age and now - self.opened_at >= self.max_age:
+            return True
+        if self.max_bytes and self.stream is not None:
+            # Append mode keeps the position at the end of the file
+            return self.stream.tell() >= self.max_bytes
+        return False
+
+    def rotate(self):
+        """Close the active file, rename it to a timestamped segment and reopen it."""
+        with self.lock:
+            if self.stream is not None:
+                self.stream.close()
+                self.stream = None
+            segment = self._segment_name()
+            try:
+                os.rename(self.baseFilename, segment)
+            except OSError:
+                segment = None
+                self._retry_at = time.time() + self.ROTATE_RETRY_DELAY
+            self.stream = self._open()
+            self.opened_at = time.time()
+        if segment is not None:
+            self.rotations += 1
+            self.archiver.submit(segment)
+
+    def _segment_name(self):
+        # Counters keep increasing within a second, so a name freed by
+        # retention is never reused for a newer segment
+        stamp = time.strftime(_STAMP_FORMAT)
+        counter = self._last_counter if stamp == self._last_stamp else 0
+        while True:
+            counter += 1
+            segment = f"{self.baseFilename}.{stamp}" + (f"-{counter}" if counter > 1 else "")
+            if not any(os.path.exists(segment + suffix) for suffix in ("", ".gz", ".zst")):
+                break
+        self._last_stamp, self._last_counter = stamp, counter
+        return segment
+
+    def emit(self, record):
+        try:
+            if self.should_rotate():
+                self.rotate()
+        except Exception:
+            self.handleError(record)
+        super().emit(record)
+
+    def emit_batch(self, records):
+        try:
+            if self.should_rotate():
+                self.rotate()
+        except Exception:
+            for record in records:
+                self.handleError(record)
+        super().emit_batch(records)
+
+    def close(self):
+        # Give the archiver a moment to finish the segment being compressed;
+        # anything left over is picked up by resume() on the next start
+        self.archiver.wait(timeout=5)
+        super().close()
@@ -6,9 +6,27 @@ Logger module for Process Doppelgänging Detector
 Handles logging for the detector.
 """
 import os
+import sys
+import time
+import queue
+import atexit
 import logging
+import threading
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
 from datetime import datetime
 
+from .log_handlers import BatchingFileHandler, RotatingLogFileHandler
+
+# Maximum number of records the async listener writes in one batch
+LOG_BATCH_SIZE = 256
+
+# Default window of rate_limited() messages, in seconds
+DEFAULT_ROLLUP_INTERVAL = 60.0
+
+# Number of most frequent images listed in a roll-up line
+ROLLUP_TOP_ITEMS = 5
+
 # ANSI Color codes for terminal output - Windows compatible version
 class Colors:
     # Enable Windows ANSI color support
@@ -62,9 +80,8 @@ class ColoredFormatter(logging.Formatter):
         super().__init__(fmt, datefmt, style)
     
     def format(self, record):
-        # Create a copy of the record to not modify the original
+        # Only the level name is changed, and restored afterwards
         original_levelname = record.levelname
-        original_message = record.getMessage()
         
         # Only add colors if enabled (for console, not for file)
         if self.use_colors:
@@ -88,7 +105,102 @@ class ColoredFormatter(logging.Formatter):
         return result
 
 # Custom logger with threat levels
+class _RateWindow:
+    """Messages seen for one rate-limit key in the current window."""
+    __slots__ = ("start", "level", "description", "count", "logged", "items")
+    
+    def __init__(self, start, level, description):
+        self.start = start
+        self.level = level
+        self.description = description
+        self.count = 0
+        self.logged = 0
+        self.items = Counter()
+
 class DoppelgangerLogger(logging.Logger):
+    def __init__(self, name, level=logging.NOTSET):
+        super().__init__(name, level)
+        # Messages logged individually per key and window (0 = no limit)
+        self.rate_limit = 0
+        self.rollup_interval = DEFAULT_ROLLUP_INTERVAL
+        self._windows = {}
+        self._rate_lock = threading.Lock()
+    
+    def set_rate_limit(self, limit, interval=DEFAULT_ROLLUP_INTERVAL):
+        """Limit rate_limited() messages to `limit` per key every `interval` seconds (0 disables)."""
+        self.flush_rollups(force=True)
+        self.rate_limit = max(0, int(limit))
+        self.rollup_interval = interval
+    
+    def rate_limited(self, key, level, msg, item=None, description=None, threat_level=None):
+        """Log a high-volume message, subject to the per-key rate limit.
+        
+        Every call is counted. Messages beyond the limit are not written;
+        instead, when the window ends, one roll-up line reports how many
+        there were and the most frequent images.
+        
+        Args:
+            key: Rate limit key, e.g. "process.new"
+            level: Logging level of the message
+            msg: Message text
+            item: Image name counted for the roll-up
+            description: What is counted, e.g. "new processes" (defaults to key)
+            threat_level: Log through threat() with this level; HIGH is never limited
+        """
+        if threat_level == "HIGH" or level >= logging.ERROR or not self.rate_limit:
+            self._log_limited(level, msg, threat_level)
+            return
+        if not self.isEnabledFor(level):
+            return
+        
+        with self._rate_lock:
+            rollups = self._expire_windows(time.monotonic())
+            window = self._windows.get(key)
+            if window is None:
+                window = self._windows[key] = _RateWindow(time.monotonic(), level, description or key)
+            window.count += 1
+            if item is not None:
+                window.items[item] += 1
+            emit = window.logged < self.rate_limit
+            if emit:
+                window.logged += 1
+        
+        self._log_rollups(rollups)
+        if emit:
+            self._log_limited(level, msg, threat_level)
+    
+    def flush_rollups(self, force=False):
+        """Write roll-up lines for finished windows (all windows if force)."""
+        with self._rate_lock:
+            rollups = self._expire_windows(time.monotonic(), force)
+        self._log_rollups(rollups)
+    
+    def _log_limited(self, level, msg, threat_level):
+        if threat_level:
+            self.threat(threat_level, msg)
+        else:
+            self.log(level, msg)
+    
+    def _expire_windows(self, now, force=False):
+        """Close finished windows; returns (window, elapsed) pairs that need a roll-up."""
+        rollups = []
+        for key, window in list(self._windows.items()):
+            elapsed = now - window.start
+            if force or elapsed >= self.rollup_interval:
+                del self._windows[key]
+                if window.count > window.logged:
+                    rollups.append((window, elapsed))
+        return rollups
+    
+    def _log_rollups(self, rollups):
+        for window, elapsed in rollups:
+            message = (f"{window.count:,} {window.description} in last {elapsed:.0f} s "
+                       f"({window.count - window.logged:,} not logged individually)")
+            if window.items:
+                top = ", ".join(f"{name} ({count:,})" for name, count in window.items.most_common(ROLLUP_TOP_ITEMS))
+                message += f"; top images: {top}"
+            self.log(window.level, message)
+    
     def threat(self, threat_level, msg, *args, **kwargs):
         """Log a message with threat level (LOW, MEDIUM, HIGH)"""
         if self.isEnabledFor(logging.WARNING):
@@ -103,12 +215,67 @@ class DoppelgangerLogger(logging.Logger):
 # Register our custom logger class
 logging.setLoggerClass(DoppelgangerLogger)
 
+class BatchingQueueListener(QueueListener):
+    """Queue listener that drains everything already queued before writing.
+    
+    Handlers with an emit_batch() method receive the whole batch at once;
+    other handlers get the records one by one.
+    """
+    
+    def __init__(self, log_queue, *handlers, batch_size=LOG_BATCH_SIZE):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.batch_size = batch_size
+    
+    def _monitor(self):
+        q = self.queue
+        while True:
+            record = q.get()
+            stop = record is self._sentinel
+            batch = [] if stop else [record]
+            # Pick up whatever else is waiting without blocking
+            while not stop and len(batch) < self.batch_size:
+                try:
+                    record = q.get_nowait()
+                except queue.Empty:
+                    break
+                if record is self._sentinel:
+                    stop = True
+                else:
+                    batch.append(record)
+            if batch:
+                self._handle_batch(batch)
+            if stop:
+                break
+    
+    def _handle_batch(self, batch):
+        for handler in self.handlers:
+            if hasattr(handler, "emit_batch"):
+                handler.emit_batch(batch)
+            else:
+                for record in batch:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+
 # Global logger instance
 _logger = None
+_listener = None
 
-def setup_logger(log_file=None, log_level=logging.INFO):
-    """Setup and return a logger instance with colored output"""
-    global _logger
+def setup_logger(log_file=None, log_level=logging.INFO, async_mode=False,
+                 rate_limit=0, rollup_interval=DEFAULT_ROLLUP_INTERVAL, rotation=None):
+    """Setup and return a logger instance with colored output
+    
+    Args:
+        log_file: Log file path (a timestamped file under logs/ if omitted)
+        log_level: Minimum level logged
+        async_mode: Hand records to a queue and write them from a background
+                    thread, so callers never block on console or disk I/O
+        rate_limit: High-volume messages logged individually per key and
+                    roll-up interval (0 logs every message)
+        rollup_interval: Seconds covered by one roll-up line
+        rotation: RotatingLogFileHandler options (max_bytes, max_age, compression,
+                  max_archives, retention_days); None never rotates the file
+    """
+    global _logger, _listener
     
     if _logger is not None:
         return _logger
@@ -116,6 +283,7 @@ def setup_logger(log_file=None, log_level=logging.INFO):
     # Create logger
     logger = logging.getLogger('doppelganger_detector')
     logger.setLevel(log_level)
+    logger.set_rate_limit(rate_limit, rollup_interval)
     
     # Create a formatter for console output with colors
     colored_formatter = ColoredFormatter(
@@ -131,16 +299,22 @@ def setup_logger(log_file=None, log_level=logging.INFO):
         use_colors=False
     )
     
-    # Create console handler with color formatter
-    console = logging.StreamHandler()
-    console.setLevel(log_level)
-    console.setFormatter(colored_formatter)
-    logger.addHandler(console)
+    # Create console handler with color formatter; windowless (stealth/startup)
+    # builds have no stderr, so they only log to the file
+    handlers = []
+    if sys.stderr is not None:
+        console = logging.StreamHandler()
+        console.setLevel(log_level)
+        console.setFormatter(colored_formatter)
+        handlers.append(console)
     
     # Create file handler with standard formatter if log_file is specified
     if log_file:
         # Use the specified log file
         file_path = log_file
+        log_dir = os.path.dirname(os.path.abspath(file_path))
+        if not os.path.exists(log_dir):
+            os.makedirs(log_dir)
     else:
         # Create default log file in logs directory
         log_dir = "logs"
@@ -148,14 +322,40 @@ def setup_logger(log_file=None, log_level=logging.INFO):
             os.makedirs(log_dir)
         file_path = os.path.join(log_dir, f"detector_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log")
     
-    file_handler = logging.FileHandler(file_path)
+    if rotation:
+        file_handler = RotatingLogFileHandler(file_path, **rotation)
+    elif async_mode:
+        file_handler = BatchingFileHandler(file_path)
+    else:
+        file_handler = logging.FileHandler(file_path)
     file_handler.setLevel(log_level)
     file_handler.setFormatter(file_formatter)
-    logger.addHandler(file_handler)
+    handlers.append(file_handler)
+    
+    if async_mode:
+        # The calling thread only merges the message arguments (once) and enqueues
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(QueueHandler(log_queue))
+        _listener = BatchingQueueListener(log_queue, *handlers)
+        _listener.start()
+    else:
+        for handler in handlers:
+            logger.addHandler(handler)
+    atexit.register(shutdown_logger)
     
     _logger = logger
     return logger
 
+def shutdown_logger():
+    """Write pending roll-up lines and stop the async log listener, if one is running."""
+    global _listener
+    
+    if _logger is not None:
+        _logger.flush_rollups(force=True)
+    listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
 def get_logger():
     """Get the logger instance."""
     global _logger
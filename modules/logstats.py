@@ -0,0 +1,344 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Log statistics module for Process Doppelgänging Detector
+--------------------------------------------------------
+Streaming analysis of detector logs: per-image detection counts, threat
+level distribution, event rate over time and top reasons. Files are
+mapped with mmap and processed in fixed-size chunks, so memory use does
+not depend on the log size; only lines that carry data are parsed in
+Python, everything else is counted with bytes.count.
+"""
+import os
+import re
+import csv
+import sys
+import gzip
+import json
+import mmap
+import time
+import argparse
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+# Bytes processed per chunk (rounded down to the last complete line); bounds
+# the memory used by one findall() pass
+CHUNK_SIZE = 16 << 20
+
+THREAT_LEVELS = ("LOW", "MEDIUM", "HIGH")
+
+# Lines whose contents are needed. Matching from the preceding newline gives
+# the regex engine a literal to search for, so other lines are skipped in C.
+# Groups: minute, then the fields of each line type (new and alert lines
+# start with a one-letter marker group).
+_LINE_RE = re.compile(
+    rb"\n(.{16}):.. - (?:"
+    rb"INFO - (N)ew process detected: PID=\d+, Name=([^\r\n]*)"
+    rb"|WARNING - (S)uspicious process detected: PID=\d+, Name=([^\r\n]*?), Threat=([A-Z]+)"
+    rb"|\[(HIGH|MEDIUM|LOW)\] - PID: \d+ - ([^\r\n]*?) - ([^\r\n]*)"
+    rb")"
+)
+
+# Roll-up lines written by DoppelgangerLogger.rate_limited()
+_ROLLUP_RE = re.compile(
+    rb"\n(\d{4}-\d\d-\d\d \d\d:\d\d):\d\d - [A-Z]+ - [\d,]+ ([^\r\n]*?) in last \d+ s "
+    rb"\(([\d,]+) not logged individually\)"
+)
+
+# Plain counters found with bytes.count
+_COUNTED = {
+    "scans": b"Scanning process with PID",
+    "access_errors": b"Cannot access process",
+    "errors": b" - ERROR - ",
+    "unnamed_process_warnings": b"UNNAMED PROCESS DETECTED",
+}
+
+_RATE_KEYS = {"minute": 16, "hour": 13}
+
+
+def _chunk_ranges(mapped, size, chunk_size):
+    """Split a mapped file into (start, end) ranges ending after a newline."""
+    ranges = []
+    offset = 0
+    while offset < size:
+        end = min(offset + chunk_size, size)
+        if end < size:
+            # Cut after the last newline so no line spans two chunks
+            newline = mapped.rfind(b"\n", offset, end)
+            if newline < offset:
+                # A line longer than the chunk: extend to its end
+                newline = mapped.find(b"\n", end)
+            end = newline + 1 if newline >= 0 else size
+        ranges.append((offset, end))
+        offset = end
+    return ranges
+
+
+def _read_chunk(mapped, start, end):
+    # Each chunk starts with the newline ending the previous one
+    return mapped[start - 1:end] if start else b"\n" + mapped[:end]
+
+
+def _scan_range(path, start, end, rate_bucket):
+    """Worker process: count one range of a log file."""
+    stats = LogStats(rate_bucket)
+    with open(path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            stats.add_chunk(_read_chunk(mapped, start, end))
+    return stats
+
+
+def _decode(value):
+    # Logs written on Windows use the ANSI code page rather than UTF-8
+    try:
+        return value.decode("utf-8")
+    except UnicodeDecodeError:
+        return value.decode("cp1252", errors="replace")
+
+
+class LogStats:
+    """Accumulated counters for one or many detector logs."""
+
+    def __init__(self, rate_bucket="minute"):
+        """Initialize empty counters.
+
+        Args:
+            rate_bucket: Time resolution of the event rate ("minute" or "hour")
+        """
+        self.rate_width = _RATE_KEYS[rate_bucket]
+        self.rate_bucket = rate_bucket
+        self.files = []
+        self.lines = 0
+        self.bytes = 0
+        self.counters = Counter()
+        self.new_processes = Counter()
+        self.alerts = defaultdict(Counter)
+        self.detections = defaultdict(Counter)
+        self.reasons = Counter()
+        self.rate = defaultdict(Counter)
+        self.first_seen = None
+        self.last_seen = None
+
+    def add_chunk(self, chunk):
+        """Count the lines of one chunk of complete lines.
+
+        The chunk must start with the newline that ends the previous line
+        (b"\\n" at the start of a file), so every line is preceded by one.
+        """
+        self.lines += chunk.count(b"\n") - (1 if chunk.endswith(b"\n") else 0)
+        for name, needle in _COUNTED.items():
+            self.counters[name] += chunk.count(needle)
+
+        # Identical lines (same minute, image, level, reason) are counted in C;
+        # only the distinct combinations are handled below
+        width = self.rate_width
+        stamps = []
+        for fields, count in Counter(_LINE_RE.findall(chunk)).items():
+            stamp, new, name, alert, alert_name, alert_level, level, image, reason = fields
+            bucket = self.rate[stamp[:width]]
+            stamps.append(stamp)
+            if new:
+                self.new_processes[name] += count
+                bucket["new_processes"] += count
+            elif alert:
+                self.alerts[alert_level.decode()][alert_name] += count
+                bucket["alerts"] += count
+            elif level:
+                self.detections[level.decode()][image or b"<unnamed>"] += count
+                self.reasons[reason] += count
+                bucket["detections"] += count
+
+        if b"not logged individually" in chunk:
+            for stamp, what, suppressed in _ROLLUP_RE.findall(chunk):
+                suppressed = int(suppressed.replace(b",", b""))
+                self.counters[f"rolled_up {_decode(what)}"] += suppressed
+                self.rate[stamp[:width]]["rolled_up"] += suppressed
+                stamps.append(stamp)
+
+        if stamps:
+            first, last = _decode(min(stamps)), _decode(max(stamps))
+            if self.first_seen is None or first < self.first_seen:
+                self.first_seen = first
+            if self.last_seen is None or last > self.last_seen:
+                self.last_seen = last
+
+    def merge(self, other):
+        """Add the counters of another LogStats (e.g. from a worker process)."""
+        self.lines += other.lines
+        self.counters.update(other.counters)
+        self.new_processes.update(other.new_processes)
+        self.reasons.update(other.reasons)
+        for mine, theirs in ((self.alerts, other.alerts), (self.detections, other.detections),
+                             (self.rate, other.rate)):
+            for key, counter in theirs.items():
+                mine[key].update(counter)
+        for stamp in (other.first_seen, other.last_seen):
+            if stamp is not None:
+                if self.first_seen is None or stamp < self.first_seen:
+                    self.first_seen = stamp
+                if self.last_seen is None or stamp > self.last_seen:
+                    self.last_seen = stamp
+
+    def add_file(self, path, chunk_size=CHUNK_SIZE, jobs=1):
+        """Stream one log file (plain or .gz) through add_chunk.
+
+        Args:
+            path: Log file path
+            chunk_size: Bytes per chunk
+            jobs: Worker processes sharing the chunks of an uncompressed file
+        """
+        start = time.perf_counter()
+        lines_before = self.lines
+        if path.endswith(".gz"):
+            size = self._add_stream(gzip.open(path, "rb"), chunk_size)
+        else:
+            size = self._add_mapped(path, chunk_size, jobs)
+        self.bytes += size
+        self.files.append({
+            "path": path,
+            "bytes": size,
+            "lines": self.lines - lines_before,
+            "seconds": round(time.perf_counter() - start, 3)
+        })
+
+    def _add_mapped(self, path, chunk_size, jobs=1):
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return 0
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                ranges = _chunk_ranges(mapped, size, chunk_size)
+                if jobs <= 1 or len(ranges) == 1:
+                    for start, end in ranges:
+                        self.add_chunk(_read_chunk(mapped, start, end))
+                    return size
+
+        # The regex engine holds the GIL, so chunks are spread over processes
+        with ProcessPoolExecutor(max_workers=min(jobs, len(ranges))) as executor:
+            futures = [executor.submit(_scan_range, path, start, end, self.rate_bucket)
+                       for start, end in ranges]
+            for future in futures:
+                self.merge(future.result())
+        return size
+
+    def _add_stream(self, stream, chunk_size):
+        size = 0
+        remainder = b"\n"
+        with stream:
+            while True:
+                data = stream.read(chunk_size)
+                if not data:
+                    break
+                size += len(data)
+                data = remainder + data
+                newline = data.rfind(b"\n")
+                # The last newline ends this chunk and starts the next one
+                remainder = data[newline:]
+                self.add_chunk(data[:newline + 1])
+        if len(remainder) > 1:
+            self.add_chunk(remainder)
+        return size
+
+    def summary(self, top=20):
+        """Return the statistics as a JSON-serializable dictionary.
+
+        Args:
+            top: Number of images and reasons listed (0 for all)
+        """
+        limit = top or None
+        images = defaultdict(lambda: {"new_processes": 0, "alerts": {}, "detections": {}})
+        for name, count in self.new_processes.items():
+            images[name]["new_processes"] = count
+        for kind, table in (("alerts", self.alerts), ("detections", self.detections)):
+            for level, counter in table.items():
+                for name, count in counter.items():
+                    images[name][kind][level] = count
+
+        def total(entry):
+            return sum(entry["alerts"].values()) + sum(entry["detections"].values())
+
+        ranked = sorted(images.items(), key=lambda item: (-total(item[1]), -item[1]["new_processes"], item[0]))
+        elapsed = sum(f["seconds"] for f in self.files)
+        return {
+            "files": self.files,
+            "lines": self.lines,
+            "bytes": self.bytes,
+            "throughput_mb_s": round(self.bytes / elapsed / (1 << 20), 1) if elapsed else 0.0,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "counters": dict(sorted(self.counters.items())),
+            "new_processes": sum(self.new_processes.values()),
+            "threat_levels": {
+                "alerts": {level: sum(self.alerts[level].values()) for level in THREAT_LEVELS},
+                "detections": {level: sum(self.detections[level].values()) for level in THREAT_LEVELS}
+            },
+            "images": {_decode(name): entry for name, entry in ranked[:limit]},
+            "top_reasons": [{"reason": _decode(reason), "count": count}
+                            for reason, count in self.reasons.most_common(limit)],
+            "rate_bucket": self.rate_bucket,
+            "rate": {_decode(stamp): dict(sorted(counts.items())) for stamp, counts in sorted(self.rate.items())}
+        }
+
+
+def write_csv(summary, out):
+    """Write a summary as long-format CSV rows (section, key, metric, value).
+
+    One fact per row keeps the output stable and easy to diff between releases.
+    """
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(["section", "key", "metric", "value"])
+    writer.writerow(["total", "", "lines", summary["lines"]])
+    writer.writerow(["total", "", "bytes", summary["bytes"]])
+    writer.writerow(["total", "", "new_processes", summary["new_processes"]])
+    for name, value in summary["counters"].items():
+        writer.writerow(["total", "", name, value])
+    for kind, levels in summary["threat_levels"].items():
+        for level, count in levels.items():
+            writer.writerow(["threat_level", level, kind, count])
+    for image, entry in summary["images"].items():
+        writer.writerow(["image", image, "new_processes", entry["new_processes"]])
+        for kind in ("alerts", "detections"):
+            for level, count in sorted(entry[kind].items()):
+                writer.writerow(["image", image, f"{kind}_{level}", count])
+    for item in summary["top_reasons"]:
+        writer.writerow(["reason", item["reason"], "count", item["count"]])
+    for stamp, counts in summary["rate"].items():
+        for metric, count in counts.items():
+            writer.writerow(["rate", stamp, metric, count])
+
+
+def main(argv=None):
+    """Command line entry point of processguard-logstats."""
+    parser = argparse.ArgumentParser(
+        prog="processguard-logstats",
+        description="Summarize Process Doppelgänging Detector logs (plain or .gz)")
+    parser.add_argument("logs", nargs="+", help="Detector log files")
+    parser.add_argument("--format", choices=["json", "csv"], default="json", help="Output format (default: json)")
+    parser.add_argument("-o", "--output", type=str, default=None, help="Output file (default: stdout)")
+    parser.add_argument("--top", type=int, default=20, help="Images and reasons listed (0 = all; default: 20)")
+    parser.add_argument("--rate-bucket", choices=sorted(_RATE_KEYS), default="minute",
+                        help="Resolution of the event rate (default: minute)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes for large uncompressed logs (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    stats = LogStats(args.rate_bucket)
+    for path in args.logs:
+        try:
+            stats.add_file(path, jobs=args.jobs)
+        except OSError as e:
+            print(f"Cannot read {path}: {e}", file=sys.stderr)
+            return 1
+    summary = stats.summary(args.top)
+
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    try:
+        if args.format == "csv":
+            write_csv(summary, out)
+        else:
+            json.dump(summary, out, indent=4, ensure_ascii=False)
+            out.write("\n")
+    finally:
+        if args.output:
+            out.close()
+    return 0
@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Metrics module for Process Doppelgänging Detector
+-------------------------------------------------
+In-process counters, gauges and histograms for the long-running monitor,
+exposed in the Prometheus text format on a localhost HTTP port and/or
+written to a file at a fixed interval.
+
+Counters and histograms are updated on the hot path (one lock and an
+addition per update); gauges such as queue depth and cache sizes are read
+from callbacks only when the metrics are rendered, so they cost nothing
+between scrapes.
+"""
+import os
+import time
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .logger import get_logger
+from .profiling import Histogram
+
+# Scan duration and latency bucket bounds in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_METRICS_INTERVAL = 15.0
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if value != value:
+        return "NaN"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _label_text(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """Base of all metric types: a name, help text and optional label children."""
+
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Return the child metric for one combination of label values."""
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        return type(self)(self.name, self.documentation)
+
+    def samples(self):
+        """Yield (label values, metric without labels) pairs to render."""
+        if self.labelnames:
+            for values, child in sorted(self._children.items()):
+                yield values, child
+        else:
+            yield (), self
+
+    def render(self):
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        for values, metric in self.samples():
+            lines.extend(metric._render_lines(self.name, self.labelnames, values))
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0
+
+    def inc(self, amount=1):
+        """Add amount (default 1)."""
+        with self._lock:
+            self.value += amount
+
+    def _render_lines(self, name, labelnames, values):
+        return [f"{name}{_label_text(labelnames, values)} {_format_value(self.value)}"]
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, either set directly or read from a callback when rendered."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0
+        self.function = function
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        """Read the value from function() at render time."""
+        self.function = function
+
+    def get(self):
+        if self.function is not None:
+            try:
+                return self.function()
+            except Exception:
+                return float("nan")
+        return self.value
+
+    def _render_lines(self, name, labelnames, values):
+        return [f"{name}{_label_text(labelnames, values)} {_format_value(self.get())}"]
+
+
+class HistogramMetric(_Metric):
+    """Distribution of observed values over fixed buckets (profiling.Histogram storage)."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self.histogram = Histogram(self.buckets)
+
+    def _new_child(self):
+        return type(self)(self.name, self.documentation, buckets=self.buckets)
+
+    def observe(self, value):
+        """Record one observation."""
+        with self._lock:
+            self.histogram.observe(value)
+
+    def _render_lines(self, name, labelnames, values):
+        with self._lock:
+            counts = list(self.histogram.counts)
+            total, count = self.histogram.total, self.histogram.count
+        lines = []
+        cumulative = 0
+        for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{name}_bucket{_label_text(labelnames, values, le)} {cumulative}")
+        labels = _label_text(labelnames, values)
+        lines.append(f"{name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Named collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=(), function=None):
+        return self._register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(HistogramMetric(name, documentation, labelnames, buckets))
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def write(self, filepath):
+        """Write the rendered metrics to a file atomically (for node_exporter's textfile collector)."""
+        temp_path = f"{filepath}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(self.render())
+            os.replace(temp_path, filepath)
+            return True
+        except OSError:
+            return False
+
+
+# Process-wide registry and the metrics updated by the scanner and monitor
+REGISTRY = MetricsRegistry()
+
+EVENTS = REGISTRY.counter("processguard_events_total", "Process events received by the monitor", ["kind"])
+EVENTS_CREATED = EVENTS.labels("create")
+EVENTS_EXITED = EVENTS.labels("exit")
+SCANS = REGISTRY.counter("processguard_scans_total", "Processes scanned")
+SCANS_DROPPED = REGISTRY.counter("processguard_scans_dropped_total", "Monitor scans dropped because the queue was full")
+DETECTIONS = REGISTRY.counter("processguard_detections_total", "Suspicious processes reported", ["level"])
+KILLS = REGISTRY.counter("processguard_kills_total", "Automatic terminations of HIGH threat processes", ["result"])
+ERRORS = REGISTRY.counter("processguard_errors_total", "Errors logged")
+SCAN_DURATION = REGISTRY.histogram("processguard_scan_duration_seconds", "Time to analyze one process")
+SCAN_LATENCY = REGISTRY.histogram("processguard_scan_latency_seconds",
+                                  "Delay from a monitor scan's due time to its verdict")
+START_TIME = REGISTRY.gauge("processguard_start_time_seconds", "Start time of the process since the epoch")
+START_TIME.set(time.time())
+
+
+def track_scanner(scanner, registry=REGISTRY):
+    """Expose the cache sizes of a ProcessScanner as gauges."""
+    cache_entries = registry.gauge("processguard_cache_entries", "Entries in the scanner caches", ["cache"])
+    cache_entries.labels("parent").set_function(lambda: len(scanner.parent_cache))
+    cache_entries.labels("path").set_function(lambda: len(scanner.path_cache))
+    cache_entries.labels("image").set_function(lambda: len(scanner.image_cache))
+
+
+def track_monitor(monitor, registry=REGISTRY):
+    """Expose the queue depth and pending scans of a ProcessMonitor as gauges."""
+    registry.gauge("processguard_queue_depth", "Due scans waiting for a monitor worker",
+                   function=monitor.event_queue.qsize)
+    registry.gauge("processguard_scheduled_scans", "Scans scheduled for processes seen by the monitor",
+                   function=lambda: len(monitor.scheduler))
+
+
+class ErrorCountHandler(logging.Handler):
+    """Counts log records at ERROR and above in processguard_errors_total."""
+
+    def __init__(self, counter=ERRORS):
+        super().__init__(logging.ERROR)
+        self.counter = counter
+
+    def emit(self, record):
+        self.counter.inc()
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Scrapes are not worth a log line each
+        pass
+
+
+class MetricsExporter:
+    """Serves the registry over HTTP on localhost and/or writes it to a file periodically."""
+
+    def __init__(self, registry=REGISTRY, port=None, filepath=None, interval=DEFAULT_METRICS_INTERVAL):
+        """Initialize the exporter.
+
+        Args:
+            registry: MetricsRegistry to expose
+            port: Localhost TCP port for /metrics (None = no HTTP endpoint)
+            filepath: File rewritten every interval seconds (None = no file)
+            interval: Seconds between file writes
+        """
+        self.logger = get_logger()
+        self.registry = registry
+        self.port = port
+        self.filepath = filepath
+        self.interval = interval
+        self.server = None
+        self._threads = []
+        self._stop = threading.Event()
+
+    def start(self):
+        """Start the HTTP endpoint and the file writer thread; errors are logged, not raised."""
+        if self.port is not None:
+            try:
+                handler = type("MetricsRequestHandler", (_MetricsRequestHandler,), {"registry": self.registry})
+                self.server = ThreadingHTTPServer(("127.0.0.1", self.port), handler)
+                self.server.daemon_threads = True
+                thread = threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+                self.logger.info(f"Metrics available at http://127.0.0.1:{self.server.server_port}/metrics")
+            except OSError as e:
+                self.logger.error(f"Cannot serve metrics on port {self.port}: {e}")
+                self.server = None
+
+        if self.filepath:
+            thread = threading.Thread(target=self._write_loop, name="metrics-file", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+            self.logger.info(f"Writing metrics to {self.filepath} every {self.interval:g} s")
+        return self
+
+    def _write_loop(self):
+        while True:
+            if not self.registry.write(self.filepath):
+                self.logger.debug(f"Failed to write metrics to {self.filepath}")
+            if self._stop.wait(self.interval):
+                break
+
+    def stop(self):
+        """Stop serving, and write the file one last time."""
+        self._stop.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+        if self.filepath:
+            self.registry.write(self.filepath)
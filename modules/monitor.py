@@ -7,20 +7,33 @@ Monitors for new process creation in real-time and scans them for Process Doppel
 """
 import os
 import time
+import logging
+import queue
 import threading
-import ctypes
-import wmi
-import pythoncom  # Import pythoncom for COM initialization
-from ctypes import windll
-from datetime import datetime
+from collections import deque
 
 from .logger import get_logger
-from .utils import save_to_json
+from .scheduler import ScanScheduler, DEFAULT_SCAN_OFFSETS
+from .events import WmiEventSource, CREATE, EXIT
+from .metrics import EVENTS_CREATED, EVENTS_EXITED, SCANS_DROPPED, SCAN_LATENCY, KILLS
+
+# Number of recent event-to-verdict latencies kept for percentile stats
+LATENCY_WINDOW = 1024
+
+# Numeric threat levels for comparison with min_threat_level
+THREAT_VALUES = {"LOW": 1, "MEDIUM": 2, "HIGH": 3}
 
 class ProcessMonitor:
-    """Monitors for new process creation and detects Process Doppelgänging in real-time."""
+    """Monitors for new process creation and detects Process Doppelgänging in real-time.
     
-    def __init__(self, scanner, results_file="results.json", min_threat_level="LOW", auto_kill=False):
+    A receiver thread only hands creation events to the scan scheduler, which
+    queues a scan at each offset from the process's creation time; a pool of
+    scan workers drains the queue, so bursts of new processes do not stall
+    event delivery.
+    """
+    
+    def __init__(self, scanner, results_file="results.json", min_threat_level="LOW", auto_kill=False,
+                 workers=2, queue_size=1024, scan_offsets=DEFAULT_SCAN_OFFSETS, event_source=None):
         """Initialize the process monitor.
         
         Args:
@@ -28,85 +41,61 @@ class ProcessMonitor:
             results_file: Path to save results to
             min_threat_level: Minimum threat level to log (LOW, MEDIUM, HIGH)
             auto_kill: Whether to automatically kill processes with HIGH threat level
+            workers: Number of scan worker threads draining the event queue
+            queue_size: Maximum number of due scans waiting for a worker; newer ones are dropped when full
+            scan_offsets: Seconds after process creation at which each new process is scanned
+            event_source: ProcessEventSource delivering creation/exit events (WMI if omitted)
         """
         self.logger = get_logger()
         self.scanner = scanner
         self.results_file = results_file
         self.min_threat_level = min_threat_level
         self.auto_kill = auto_kill
+        self.workers = max(1, workers)
         self.running = False
         self.monitor_thread = None
-        self.wmi_interface = None
-        self.process_watcher = None
+        self.worker_threads = []
+        self.event_source = event_source or WmiEventSource()
+        
+        # Delayed and repeated scans of each new process
+        self.scheduler = ScanScheduler(self._scan_due, scan_offsets)
+        
+        # Due (pid, name, create_time, due, is_last) scans between the scheduler and the workers
+        self.event_queue = queue.Queue(maxsize=queue_size)
+        
+        # Highest threat level seen so far per pid as (create_time, level), to report
+        # escalations only; keyed by pid so a reused PID replaces its old entry
+        self.threat_levels = {}
+        
+        # Pipeline counters, updated from the receiver and every worker
+        self.events_received = 0
+        self.events_dropped = 0
+        self.events_exited = 0
+        self.events_scanned = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self._stats_lock = threading.Lock()
         
     def _monitor_processes(self):
-        """Background thread to monitor for new process creation."""
+        """Background thread receiving process creation and exit events.
+        
+        Only schedules or cancels scans; all scanning happens in the worker threads.
+        """
         self.logger.info("Process monitoring thread started")
         
         try:
-            # Initialize COM for this thread
-            pythoncom.CoInitialize()
-            
-            # Initialize WMI interface
-            self.wmi_interface = wmi.WMI()
-            
-            # Create a process creation event watcher
-            process_watcher = self.wmi_interface.Win32_Process.watch_for(
-                "creation"
-            )
-            
-            self.logger.info("Watching for new process creation...")
+            self.event_source.open()
+            self.logger.info(f"Watching for new process creation ({self.event_source.name} events)...")
             
             # Monitor loop
             while self.running:
                 try:
-                    # Wait for a new process to be created (timeout after 1 second to check if still running)
-                    new_process = process_watcher(timeout_ms=1000)
-                    
-                    if new_process:
-                        pid = new_process.ProcessId
-                        process_name = new_process.Name
-                        
-                        self.logger.info(f"New process detected: PID={pid}, Name={process_name}")
-                        
-                        # Allow the process to initialize fully before scanning
-                        time.sleep(0.5)
-                        
-                        # Scan the new process for Process Doppelgänging indicators
-                        result = self.scanner.scan_specific_process(pid)
-                        
-                        # Check if process has a high enough threat level based on filter
-                        threat_level = result.get("threat_level", "LOW") if result else "LOW"
-                        
-                        # Convert threat levels to numeric values for comparison
-                        threat_values = {"LOW": 1, "MEDIUM": 2, "HIGH": 3}
-                        if result and threat_values.get(threat_level, 0) >= threat_values.get(self.min_threat_level, 0):
-                            # Process meets minimum threat level threshold for logging
-                            self.logger.warning(f"Suspicious process detected: PID={pid}, Name={process_name}, Threat={threat_level}")
-                            
-                            # Auto-kill if enabled and threat level is HIGH
-                            if self.auto_kill and threat_level == "HIGH":
-                                # Prevent killing our own process
-                                import os
-                                current_pid = os.getpid()
-                                
-                                if pid == current_pid:
-                                    self.logger.warning(f"Skipping auto-kill for our own process (PID={pid})")
-                                    result["auto_terminated"] = False
-                                    result["skipped_self_termination"] = True
-                                else:
-                                    from modules.utils import kill_process
-                                    kill_success = kill_process(pid)
-                                    if kill_success:
-                                        self.logger.warning(f"Automatically terminated HIGH threat process: PID={pid}, Name={process_name}")
-                                        # Add termination info to the result
-                                        result["auto_terminated"] = True
-                                    else:
-                                        self.logger.error(f"Failed to terminate HIGH threat process: PID={pid}, Name={process_name}")
-                                        result["auto_terminated"] = False
-                except wmi.x_wmi_timed_out:
-                    # This is normal - just a timeout to check if we should still be running
-                    pass
+                    # Wait for events (timeout after 1 second to check if still running)
+                    for event in self.event_source.poll(timeout=1.0):
+                        if event.kind == CREATE:
+                            self._process_created(event.pid, event.name, event.create_time)
+                        elif event.kind == EXIT:
+                            self._process_exited(event.pid)
+                    self.logger.flush_rollups()
                 except Exception as e:
                     self.logger.error(f"Error during process monitoring: {e}")
                     time.sleep(1)  # Prevent rapid error loops
@@ -114,14 +103,155 @@ class ProcessMonitor:
         except Exception as e:
             self.logger.error(f"Process monitoring thread error: {e}")
         finally:
-            # Clean up COM resources when thread exits
             try:
-                pythoncom.CoUninitialize()
-            except:
+                self.event_source.close()
+            except Exception:
                 pass
         
         self.logger.info("Process monitoring thread stopped")
     
+    def _process_created(self, pid, process_name, create_time=None):
+        """Schedule scans of a new process without blocking the receiver."""
+        with self._stats_lock:
+            self.events_received += 1
+        EVENTS_CREATED.inc()
+        self.logger.rate_limited("process.new", logging.INFO,
+                                 f"New process detected: PID={pid}, Name={process_name}",
+                                 item=process_name, description="new processes")
+        self.scheduler.schedule(pid, create_time, process_name)
+    
+    def _process_exited(self, pid):
+        """Cancel pending scans and drop cached state for an exited process."""
+        with self._stats_lock:
+            self.events_exited += 1
+        EVENTS_EXITED.inc()
+        self.scheduler.cancel(pid)
+        with self._stats_lock:
+            self.threat_levels.pop(pid, None)
+        self.scanner.process_exited(pid)
+    
+    def _scan_due(self, pid, create_time, process_name, offset_index, is_last):
+        """Scheduler callback: hand a due scan to the worker pool."""
+        due = create_time + self.scheduler.offsets[offset_index]
+        try:
+            self.event_queue.put_nowait((pid, process_name, create_time, due, is_last))
+        except queue.Full:
+            with self._stats_lock:
+                self.events_dropped += 1
+                if is_last:
+                    self._forget(pid, create_time)
+            SCANS_DROPPED.inc()
+            self.logger.rate_limited("queue.dropped", logging.WARNING,
+                                     f"Scan queue full, dropping scan of PID={pid}, Name={process_name}",
+                                     item=process_name, description="scans dropped (queue full)")
+    
+    def _scan_worker(self):
+        """Worker thread scanning queued processes until the monitor stops."""
+        while self.running:
+            try:
+                pid, process_name, create_time, due, is_last = self.event_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            
+            try:
+                # Repeated scans of one process are stored only when the threat level rises
+                result = self.scanner.scan_specific_process(pid, store_result=False)
+                if result is None:
+                    # The process is gone; its later scans would find nothing either
+                    self.scheduler.cancel(pid)
+                    is_last = True
+                else:
+                    self._handle_result(pid, process_name, create_time, result)
+            except Exception as e:
+                self.logger.error(f"Error scanning new process {pid}: {e}")
+            finally:
+                latency = max(0.0, time.time() - due)
+                with self._stats_lock:
+                    self.events_scanned += 1
+                    self.latencies.append(latency)
+                    if is_last:
+                        self._forget(pid, create_time)
+                SCAN_LATENCY.observe(latency)
+                self.event_queue.task_done()
+    
+    def _forget(self, pid, create_time):
+        """Drop the threat level of a process once no scan of it is pending (caller holds _stats_lock)."""
+        entry = self.threat_levels.get(pid)
+        if entry is not None and entry[0] == create_time:
+            del self.threat_levels[pid]
+    
+    def _handle_result(self, pid, process_name, create_time, result):
+        """Report a scan verdict if it escalates the process's threat level.
+        
+        Stores the result, logs it and terminates the process if auto-kill applies.
+        """
+        # Check if process has a high enough threat level based on filter
+        threat_level = result.get("threat_level", "LOW")
+        with self._stats_lock:
+            entry = self.threat_levels.get(pid)
+            previous = entry[1] if entry is not None and entry[0] == create_time else None
+            escalated = previous is None or THREAT_VALUES.get(threat_level, 0) > THREAT_VALUES.get(previous, 0)
+            if escalated:
+                self.threat_levels[pid] = (create_time, threat_level)
+        if not escalated:
+            return
+        
+        if THREAT_VALUES.get(threat_level, 0) >= THREAT_VALUES.get(self.min_threat_level, 0):
+            # Process meets minimum threat level threshold for logging
+            message = f"Suspicious process detected: PID={pid}, Name={process_name}, Threat={threat_level}"
+            if threat_level == "HIGH":
+                # HIGH threats are never sampled away
+                self.logger.warning(message)
+            else:
+                self.logger.rate_limited(f"suspicious.{threat_level}", logging.WARNING, message,
+                                         item=process_name, description=f"{threat_level} suspicious processes")
+            
+            # Auto-kill if enabled and threat level is HIGH
+            if self.auto_kill and threat_level == "HIGH":
+                # Prevent killing our own process
+                current_pid = os.getpid()
+                
+                if pid == current_pid:
+                    self.logger.warning(f"Skipping auto-kill for our own process (PID={pid})")
+                    result["auto_terminated"] = False
+                    result["skipped_self_termination"] = True
+                else:
+                    from modules.utils import kill_process
+                    kill_success = kill_process(pid)
+                    KILLS.labels("success" if kill_success else "failure").inc()
+                    if kill_success:
+                        self.logger.warning(f"Automatically terminated HIGH threat process: PID={pid}, Name={process_name}")
+                        # Add termination info to the result
+                        result["auto_terminated"] = True
+                    else:
+                        self.logger.error(f"Failed to terminate HIGH threat process: PID={pid}, Name={process_name}")
+                        result["auto_terminated"] = False
+        
+        # Stored after auto-kill so the record says whether the process was terminated;
+        # a long-running monitor with a results store keeps nothing in memory
+        self.scanner.add_result(result, keep=self.scanner.results_store is None)
+    
+    def get_stats(self):
+        """Return queue depth, event counters, scheduler stats and verdict latency.
+        
+        Latency is measured in seconds from the time a scan was due to its verdict.
+        """
+        with self._stats_lock:
+            latencies = sorted(self.latencies)
+            stats = {
+                "queue_depth": self.event_queue.qsize(),
+                "received": self.events_received,
+                "dropped": self.events_dropped,
+                "exited": self.events_exited,
+                "scanned": self.events_scanned,
+            }
+        stats["scheduler"] = self.scheduler.stats()
+        if latencies:
+            stats["latency_avg"] = round(sum(latencies) / len(latencies), 3)
+            stats["latency_p95"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3)
+            stats["latency_max"] = round(latencies[-1], 3)
+        return stats
+    
     def start_monitoring(self):
         """Start monitoring for new processes."""
         if self.running:
@@ -129,11 +259,19 @@ class ProcessMonitor:
             return False
         
         self.running = True
+        self.scheduler.start()
+        self.worker_threads = []
+        for i in range(self.workers):
+            worker = threading.Thread(target=self._scan_worker, name=f"monitor-scan-{i}")
+            worker.daemon = True
+            worker.start()
+            self.worker_threads.append(worker)
+        
         self.monitor_thread = threading.Thread(target=self._monitor_processes)
         self.monitor_thread.daemon = True
         self.monitor_thread.start()
         
-        self.logger.info("Process monitor started successfully")
+        self.logger.info(f"Process monitor started successfully ({self.workers} scan workers)")
         return True
     
     def stop_monitoring(self):
@@ -143,9 +281,19 @@ class ProcessMonitor:
             return False
         
         self.running = False
+        self.scheduler.stop()
         if self.monitor_thread:
             self.monitor_thread.join(timeout=5)
             self.monitor_thread = None
+        for worker in self.worker_threads:
+            worker.join(timeout=5)
+        self.worker_threads = []
         
+        self.logger.flush_rollups(force=True)
+        self.logger.info(f"Monitor pipeline: {self.get_stats()}")
+        self.logger.info(f"Parent verdict cache: {self.scanner.parent_cache.stats()}")
+        self.logger.info(f"Mapped path cache: {self.scanner.path_cache.stats()}")
+        self.logger.info(f"Image header cache: {self.scanner.image_cache.stats()}")
+        self.scanner.image_cache.save()
         self.logger.info("Process monitor stopped")
         return True
@@ -0,0 +1,245 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Patterns module for Process Doppelgänging Detector
+--------------------------------------------------
+Compiles the name lists, whitelists and command-line indicators used by the
+scanner into frozensets and Aho-Corasick automata, so matching cost depends on
+the length of the text rather than on the number of loaded patterns.
+"""
+import hashlib
+from collections import deque
+
+# Process names often abused by malware (substring match, we'll check path later)
+SUSPICIOUS_NAMES = (
+    "svchost",  # if not legitimate svchost
+    "csrss",    # if not legitimate csrss
+    "lsass",    # if not legitimate lsass
+    "rundll",   # shortened rundll32
+    "scvhost",  # typosquatting of svchost
+    "svch0st",  # character replacement
+    "explore",  # shortened explorer
+    "iexplore", # IE commonly used
+    "services", # if not the real services
+    "dllhost",  # if not legitimate dllhost
+)
+
+# Common Windows processes that often have legitimate deleted file mappings
+# or similar behavior that might trigger false positives
+WHITELIST = (
+    "msedgewebview2.exe",  # Edge WebView frequently uses temp sections
+    "svchost.exe",         # Windows service host frequently has unusual mappings
+    "explorer.exe",        # Windows explorer
+    "runtimebroker.exe",   # Windows runtime broker
+    "searchhost.exe",      # Windows search
+    "startmenuexperiencehost.exe",  # Start menu
+    "shellexperiencehost.exe",      # Shell experience
+    "applicationframehost.exe",     # Application frame
+    "microsoftedge.exe",   # Edge browser
+    "chrome.exe",          # Chrome browser
+    "firefox.exe",         # Firefox browser
+    "wmiprvse.exe",        # WMI Provider Service
+    "wininit.exe",         # Windows initialization
+    "lsass.exe",           # Windows security
+    "fontdrvhost.exe",     # Font driver host
+    "dwm.exe",             # Desktop Window Manager
+    "csrss.exe",           # Client/Server Runtime Subsystem
+)
+
+# Potentially abused processes for launching malware
+SUSPICIOUS_PARENTS = (
+    "cmd.exe", "powershell.exe", "wscript.exe", "cscript.exe",
+    "rundll32.exe", "regsvr32.exe", "mshta.exe", "schtasks.exe",
+    "wmic.exe", "msiexec.exe", "odbcconf.exe", "regasm.exe",
+    "regsvcs.exe", "installutil.exe", "cmstp.exe", "certutil.exe",
+)
+
+# Legitimate parent processes that are often system services
+LEGITIMATE_SERVICE_PARENTS = (
+    "services.exe", "svchost.exe", "smss.exe", "wininit.exe",
+    "csrss.exe", "winlogon.exe", "explorer.exe", "lsass.exe",
+    "taskhost.exe", "taskhostw.exe", "sihost.exe", "runtimebroker.exe",
+    "userinit.exe", "dwm.exe", "fontdrvhost.exe", "searchindexer.exe",
+)
+
+# High confidence indicators in command line
+HIGH_CONFIDENCE_ARGS = (
+    "-enc ", "-encodedcommand", "-w hidden", "-windowstyle hidden",
+    "-exec bypass", "-executionpolicy bypass",
+    "iex(", "invoke-expression", "downloadstring", "downloadfile",
+    "bitsadmin /transfer", "certutil -urlcache", "regsvr32 /s /u /i:",
+)
+
+# Medium confidence indicators in command line
+MEDIUM_CONFIDENCE_ARGS = (
+    "-noprofile", "-noexit", "-noninteractive", "-command",
+    "-c ", "curl ", "wget ", "net use ", "-sta",
+)
+
+# Section names accepted in an IOC file
+IOC_SECTIONS = ("cmdline_high", "cmdline_medium", "path")
+
+
+class AhoCorasick:
+    """Multi-pattern substring matcher.
+
+    Patterns are added with an associated value and compiled once with build().
+    A search walks the text a single time regardless of how many patterns
+    are loaded.
+    """
+
+    def __init__(self, patterns=()):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        self._values = []
+        self._built = False
+        for pattern in patterns:
+            self.add(pattern)
+
+    def __len__(self):
+        return len(self._values)
+
+    def values(self):
+        """Return the values of all patterns in insertion order."""
+        return list(self._values)
+
+    def add(self, pattern, value=None):
+        """Add a pattern; value defaults to the pattern itself."""
+        if not pattern:
+            return
+        node = 0
+        for char in pattern:
+            nxt = self._goto[node].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = nxt
+        self._out[node] = self._out[node] + (len(self._values),)
+        self._values.append(pattern if value is None else value)
+        self._built = False
+
+    def build(self):
+        """Compute failure links; called automatically before the first search."""
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = deque()
+        for nxt in goto[0].values():
+            fail[nxt] = 0
+            queue.append(nxt)
+        while queue:
+            node = queue.popleft()
+            for char, nxt in goto[node].items():
+                queue.append(nxt)
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                fail[nxt] = goto[state].get(char, 0)
+                if fail[nxt] == nxt:
+                    fail[nxt] = 0
+                if out[fail[nxt]]:
+                    out[nxt] = out[nxt] + out[fail[nxt]]
+        self._built = True
+        return self
+
+    def search(self, text):
+        """Return True as soon as any pattern occurs in text."""
+        for _ in self._iter_matches(text):
+            return True
+        return False
+
+    def find_all(self, text):
+        """Return the values of all patterns found in text, in insertion order."""
+        found = set()
+        for ids in self._iter_matches(text):
+            found.update(ids)
+        return [self._values[i] for i in sorted(found)]
+
+    def _iter_matches(self, text):
+        if not self._built:
+            self.build()
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if out[node]:
+                yield out[node]
+
+
+class DetectionPatterns:
+    """Compiled name lists and indicator patterns shared by all scans."""
+
+    def __init__(self):
+        self.whitelist = frozenset(WHITELIST)
+        self.suspicious_parents = frozenset(SUSPICIOUS_PARENTS)
+        self.legitimate_service_parents = frozenset(LEGITIMATE_SERVICE_PARENTS)
+        self.suspicious_names = AhoCorasick(SUSPICIOUS_NAMES).build()
+        self.path_iocs = AhoCorasick()
+
+        # High confidence arguments are inserted first so find_all() reports
+        # them ahead of the medium ones, matching the original list order
+        self.cmdline_args = AhoCorasick()
+        for arg in HIGH_CONFIDENCE_ARGS:
+            self.cmdline_args.add(arg, ("high", arg))
+        for arg in MEDIUM_CONFIDENCE_ARGS:
+            self.cmdline_args.add(arg, ("medium", arg))
+        self.cmdline_args.build()
+
+    def load_ioc_file(self, filepath):
+        """Load additional indicators from a text file.
+
+        The file is split into ``[cmdline_high]``, ``[cmdline_medium]`` and
+        ``[path]`` sections with one case-insensitive substring per line.
+        Blank lines and lines starting with ``#`` are ignored.
+
+        Returns:
+            Dictionary with the number of patterns loaded per section
+        """
+        counts = dict.fromkeys(IOC_SECTIONS, 0)
+        section = None
+        with open(filepath, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                if line.startswith("[") and line.endswith("]"):
+                    section = line[1:-1].strip().lower()
+                    if section not in counts:
+                        raise ValueError(f"Unknown IOC section '{section}' in {filepath}")
+                    continue
+                if section is None:
+                    raise ValueError(f"IOC pattern outside of a section in {filepath}: {line}")
+
+                pattern = line.lower()
+                if section == "path":
+                    self.path_iocs.add(pattern)
+                else:
+                    self.cmdline_args.add(pattern, (section.split("_")[1], pattern))
+                counts[section] += 1
+
+        self.cmdline_args.build()
+        self.path_iocs.build()
+        return counts
+
+    def digest(self):
+        """Return a hash of every name list and pattern used by the scanner.
+
+        Stored scan verdicts are only valid for the same patterns, IOCs included.
+        """
+        digest = hashlib.sha256()
+        groups = (sorted(self.whitelist), sorted(self.suspicious_parents),
+                  sorted(self.legitimate_service_parents), self.suspicious_names.values(),
+                  self.path_iocs.values(), [f"{level}:{arg}" for level, arg in self.cmdline_args.values()])
+        for group in groups:
+            for value in group:
+                digest.update(value.encode("utf-8") + b"\n")
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+
+# Shared default instance, compiled once at import time
+DEFAULT_PATTERNS = DetectionPatterns()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Profiling module for Process Doppelgänging Detector
+---------------------------------------------------
+Per-check and per-OS-call timing for --profile. Timing is added by wrapping
+the scanner's, backend's and caches' methods when profiling is
+enabled, so a scanner that is not instrumented runs exactly the original
+code. Every sample lands in a fixed-bucket histogram (preallocated counter
+arrays, no allocation per sample); the slowest processes are kept in a
+small bounded heap.
+"""
+import time
+import heapq
+import signal
+import bisect
+import threading
+from array import array
+
+from .logger import get_logger
+
+# Histogram bucket upper bounds in seconds: 1 µs to 100 s, 10 buckets per decade (R10 series)
+HISTOGRAM_BOUNDS = tuple(round(mantissa * 10.0 ** exponent, 12)
+                         for exponent in range(-6, 2)
+                         for mantissa in (1.0, 1.25, 1.6, 2.0, 2.5, 3.15, 4.0, 5.0, 6.3, 8.0)) + (100.0,)
+
+# Indicator checks: (object attribute, method name) -> category
+CHECK_HOOKS = {
+    ("backend", "suspicious_memory"): "check.memory",
+    ("backend", "check_mapped_files"): "check.mapped_files",
+    ("backend", "get_handles"): "check.handles",
+    ("backend", "check_executable"): "check.executable",
+    ("scanner", "check_parent_process"): "check.parent",
+    ("scanner", "_check_image"): "check.image",
+    ("scanner", "_check_image_header"): "check.image_header",
+}
+
+# Operating system calls by category
+OS_CALL_HOOKS = {
+    ("backend", "snapshot_processes"): "os.process_list",
+    ("backend", "read_process"): "os.process_read",
+    ("backend", "open_process"): "os.process_open",
+    ("backend", "walk_memory"): "os.memory_walk",
+    ("backend", "memory_maps"): "os.memory_maps",
+    ("backend", "capture_handles"): "os.handle_table",
+    ("path_cache", "path_exists"): "os.path_stat",
+    ("backend", "read_image_header"): "os.image_read",
+    ("image_cache", "identity"): "os.file_stat",
+    ("image_cache", "read_header"): "os.file_read",
+}
+
+# Whole-process analysis time, also used for the slowest PIDs
+PROCESS_CATEGORY = "scan.process"
+
+
+class Histogram:
+    """Latency histogram over fixed bucket bounds.
+
+    Samples from several threads are recorded without a lock; under heavy
+    contention a sample may rarely be lost, which is accepted to keep the
+    hot path free of locking.
+    """
+    __slots__ = ("bounds", "counts", "count", "total", "max", "errors")
+
+    def __init__(self, bounds=HISTOGRAM_BOUNDS):
+        self.bounds = array('d', bounds)
+        # One extra bucket for samples above the last bound
+        self.counts = array('Q', [0] * (len(bounds) + 1))
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+
+    def observe(self, seconds):
+        """Record one sample."""
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction):
+        """Return the upper bound of the bucket holding the given percentile (seconds)."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.bounds[index] if index < len(self.bounds) else self.max
+        return self.max
+
+    def stats(self):
+        """Return count, total and mean/percentile/max times in microseconds."""
+        return {
+            "calls": self.count,
+            "errors": self.errors,
+            "total_s": round(self.total, 4),
+            "mean_us": round(self.total / self.count * 1e6, 1) if self.count else 0.0,
+            "p50_us": round(self.percentile(0.50) * 1e6, 1),
+            "p95_us": round(self.percentile(0.95) * 1e6, 1),
+            "p99_us": round(self.percentile(0.99) * 1e6, 1),
+            "max_us": round(self.max * 1e6, 1)
+        }
+
+
+class Profiler:
+    """Histograms per check and OS call category plus the slowest scanned processes."""
+
+    def __init__(self, top=10):
+        """Initialize the profiler.
+
+        Args:
+            top: Number of slowest processes kept
+        """
+        self.logger = get_logger()
+        self.top = top
+        self.histograms = {}
+        self.started = time.time()
+        self._slowest = []
+        self._threshold = 0.0
+        self._lock = threading.Lock()
+        self._dump_requested = False
+
+    def histogram(self, category):
+        """Return the histogram of a category, creating it on first use."""
+        histogram = self.histograms.get(category)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(category, Histogram())
+        return histogram
+
+    def wrap(self, category, func):
+        """Return func wrapped so every call is timed into the category's histogram.
+
+        Exceptions are counted and re-raised, so callers that swallow them
+        still show up in the error column.
+        """
+        histogram = self.histogram(category)
+        perf_counter = time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                histogram.errors += 1
+                raise
+            finally:
+                histogram.observe(perf_counter() - start)
+        timed.__wrapped__ = func
+        return timed
+
+    def _wrap_process(self, func):
+        histogram = self.histogram(PROCESS_CATEGORY)
+        perf_counter = time.perf_counter
+
+        def timed(pid, *args, **kwargs):
+            start = perf_counter()
+            result = None
+            try:
+                result = func(pid, *args, **kwargs)
+                return result
+            finally:
+                elapsed = perf_counter() - start
+                histogram.observe(elapsed)
+                if elapsed > self._threshold:
+                    self._record_slow(elapsed, pid, result.get("name", "") if result else "")
+        timed.__wrapped__ = func
+        return timed
+
+    def _record_slow(self, elapsed, pid, name):
+        with self._lock:
+            entry = (elapsed, pid, name)
+            if len(self._slowest) < self.top:
+                heapq.heappush(self._slowest, entry)
+            else:
+                heapq.heappushpop(self._slowest, entry)
+            if len(self._slowest) == self.top:
+                self._threshold = self._slowest[0][0]
+
+    def instrument(self, scanner):
+        """Wrap the checks and OS calls of a ProcessScanner (and its backend and caches)."""
+        targets = {"scanner": scanner, "backend": scanner.backend, "path_cache": scanner.path_cache,
+                   "image_cache": scanner.image_cache}
+        for hooks in (CHECK_HOOKS, OS_CALL_HOOKS):
+            for (target, method), category in hooks.items():
+                obj = targets[target]
+                func = getattr(obj, method, None)
+                if func is not None and not hasattr(func, "__wrapped__"):
+                    setattr(obj, method, self.wrap(category, func))
+        if not hasattr(scanner._analyze_process, "__wrapped__"):
+            scanner._analyze_process = self._wrap_process(scanner._analyze_process)
+        return self
+
+    def slowest(self):
+        """Return [{pid, name, elapsed_ms}, ...] of the slowest processes, slowest first."""
+        with self._lock:
+            entries = sorted(self._slowest, reverse=True)
+        return [{"pid": pid, "name": name, "elapsed_ms": round(elapsed * 1000, 2)}
+                for elapsed, pid, name in entries]
+
+    def report(self):
+        """Return per-category statistics (sorted by total time) and the slowest processes."""
+        with self._lock:
+            histograms = dict(self.histograms)
+        categories = {category: histograms[category].stats()
+                      for category in sorted(histograms, key=lambda c: histograms[c].total, reverse=True)
+                      if histograms[category].count}
+        return {
+            "duration_s": round(time.time() - self.started, 1),
+            "categories": categories,
+            "slowest_processes": self.slowest()
+        }
+
+    def log_report(self):
+        """Write the per-check breakdown and the slowest processes to the log."""
+        report = self.report()
+        scan_total = report["categories"].get(PROCESS_CATEGORY, {}).get("total_s", 0.0)
+        lines = [f"Profile after {report['duration_s']} s ({scan_total:.3f} s analyzing processes, "
+                 f"the share column is relative to that):",
+                 f"  {'category':<20} {'calls':>9} {'errors':>7} {'total s':>9} {'share':>6} "
+                 f"{'mean us':>9} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9} {'max us':>10}"]
+        for category, stats in report["categories"].items():
+            share = stats["total_s"] / scan_total if scan_total else 0.0
+            lines.append(f"  {category:<20} {stats['calls']:>9,} {stats['errors']:>7,} {stats['total_s']:>9.3f} "
+                         f"{share:>6.1%} {stats['mean_us']:>9.1f} {stats['p50_us']:>9.1f} {stats['p95_us']:>9.1f} "
+                         f"{stats['p99_us']:>9.1f} {stats['max_us']:>10.1f}")
+        if report["slowest_processes"]:
+            lines.append("  Slowest processes: " + ", ".join(
+                f"{entry['name'] or '?'} (PID {entry['pid']}) {entry['elapsed_ms']} ms"
+                for entry in report["slowest_processes"]))
+        self.logger.info("\n".join(lines))
+        return report
+
+    def install_signal_handler(self):
+        """Request a report on SIGUSR1 (SIGBREAK, i.e. Ctrl+Break, on Windows).
+
+        The handler only sets a flag; the main loop calls dump_if_requested(),
+        so the log is never written from inside a signal handler.
+
+        Returns:
+            Name of the signal, or None if neither is available
+        """
+        signum = getattr(signal, "SIGUSR1", None) or getattr(signal, "SIGBREAK", None)
+        if signum is None:
+            return None
+        signal.signal(signum, self._request_dump)
+        return signal.Signals(signum).name
+
+    def _request_dump(self, signum, frame):
+        self._dump_requested = True
+
+    def dump_if_requested(self):
+        """Log the report if a signal asked for one since the last call."""
+        if self._dump_requested:
+            self._dump_requested = False
+            self.log_report()
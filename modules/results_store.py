@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Results store module for Process Doppelgänging Detector
+-------------------------------------------------------
+Appends every detection to a SQLite database in WAL mode, indexed by time,
+PID, image name and threat level, so history can grow without rewriting
+anything and be filtered without loading it all.
+"""
+import json
+import time
+import sqlite3
+import threading
+
+# Numeric threat levels stored next to the name for range queries
+THREAT_LEVELS = {"LOW": 1, "MEDIUM": 2, "HIGH": 3}
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS detections (
+        id INTEGER PRIMARY KEY,
+        detected_at REAL NOT NULL,
+        pid INTEGER,
+        image TEXT COLLATE NOCASE,
+        threat_level TEXT,
+        level INTEGER,
+        score INTEGER,
+        reason TEXT,
+        data TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_detections_time ON detections (detected_at)",
+    "CREATE INDEX IF NOT EXISTS idx_detections_pid ON detections (pid)",
+    "CREATE INDEX IF NOT EXISTS idx_detections_image ON detections (image)",
+    "CREATE INDEX IF NOT EXISTS idx_detections_level ON detections (level, detected_at)",
+)
+
+
+class ResultsStore:
+    """Append-only detection history backed by SQLite."""
+
+    def __init__(self, filepath):
+        """Open (and create if needed) the results database.
+
+        Args:
+            filepath: Path of the SQLite database file
+        """
+        self.filepath = filepath
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(filepath, check_same_thread=False)
+        # WAL lets --query read while the monitor keeps appending
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+
+    @staticmethod
+    def _row(process_info, detected_at):
+        threat_level = process_info.get("threat_level", "LOW")
+        return (
+            detected_at,
+            process_info.get("pid"),
+            process_info.get("name"),
+            threat_level,
+            THREAT_LEVELS.get(threat_level, 0),
+            process_info.get("suspicion_score", 0),
+            process_info.get("reason", ""),
+            json.dumps(process_info, default=str, separators=(',', ':'))
+        )
+
+    def add(self, process_info, detected_at=None):
+        """Append one detection."""
+        self.add_many([process_info], detected_at)
+
+    def add_many(self, process_infos, detected_at=None):
+        """Append several detections in one transaction.
+
+        Returns:
+            Number of rows written
+        """
+        detected_at = time.time() if detected_at is None else detected_at
+        rows = [self._row(info, detected_at) for info in process_infos]
+        if not rows:
+            return 0
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO detections (detected_at, pid, image, threat_level, level, score, reason, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def query(self, since=None, until=None, pid=None, image=None, min_threat_level=None, limit=None):
+        """Yield stored detections matching all given filters, oldest first.
+
+        Args:
+            since, until: Epoch seconds bounding the detection time
+            pid: Process ID
+            image: Image (process) name, case-insensitive
+            min_threat_level: LOW, MEDIUM or HIGH
+            limit: Maximum number of rows
+        """
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("detected_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("detected_at <= ?")
+            params.append(until)
+        if pid is not None:
+            clauses.append("pid = ?")
+            params.append(pid)
+        if image:
+            clauses.append("image = ?")
+            params.append(image)
+        if min_threat_level and THREAT_LEVELS.get(min_threat_level, 0) > 1:
+            clauses.append("level >= ?")
+            params.append(THREAT_LEVELS[min_threat_level])
+
+        sql = "SELECT detected_at, data FROM detections"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY detected_at, id"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        # Rows are streamed in batches so large histories are never loaded at once
+        with self._lock:
+            cursor = self._conn.execute(sql, params)
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(500)
+            if not rows:
+                break
+            for detected_at, data in rows:
+                record = json.loads(data)
+                record["detected_at"] = detected_at
+                yield record
+
+    def count(self):
+        """Return the number of stored detections."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM detections").fetchone()[0]
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
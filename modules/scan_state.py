@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Scan state module for Process Doppelgänging Detector
+----------------------------------------------------
+Persists the last verdict and a cheap fingerprint for every process between
+scans, so long-lived processes that have not changed are not rescanned.
+"""
+import os
+import json
+import threading
+
+STATE_VERSION = 2
+
+
+def state_key(pid, create_time):
+    """Return the JSON key identifying a process across scans."""
+    return f"{pid}:{create_time!r}"
+
+
+class ScanState:
+    """Fingerprints and verdicts from previous scans, keyed by (pid, create_time)."""
+
+    def __init__(self, filepath, context=""):
+        """Load the state file if it exists.
+
+        Args:
+            filepath: Path of the JSON state file
+            context: Digest of the patterns, IOCs and scoring weights; a stored
+                     state written with a different context is discarded
+        """
+        self.filepath = filepath
+        self.context = context
+        self.processes = {}
+        self.skipped = 0
+        self.rescanned = 0
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        """Read the state file, starting empty if it is missing or unreadable."""
+        try:
+            with open(self.filepath, 'r') as f:
+                data = json.load(f)
+            if data.get("version") == STATE_VERSION and data.get("context") == self.context:
+                self.processes = data.get("processes", {})
+        except (OSError, ValueError):
+            self.processes = {}
+
+    def save(self):
+        """Write the state file atomically."""
+        temp_path = f"{self.filepath}.tmp"
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump({"version": STATE_VERSION, "context": self.context, "processes": self.processes}, f,
+                          separators=(',', ':'), default=str)
+            os.replace(temp_path, self.filepath)
+            return True
+        except OSError:
+            return False
+
+    def lookup(self, pid, create_time, fingerprint):
+        """Return the stored verdict if the process is unchanged, otherwise None."""
+        with self._lock:
+            entry = self.processes.get(state_key(pid, create_time))
+            if entry is not None and entry.get("fingerprint") == list(fingerprint):
+                self.skipped += 1
+                return entry.get("verdict")
+            self.rescanned += 1
+            return None
+
+    def update(self, pid, create_time, fingerprint, verdict):
+        """Record the fingerprint and verdict of a freshly scanned process."""
+        with self._lock:
+            self.processes[state_key(pid, create_time)] = {
+                "fingerprint": list(fingerprint),
+                "verdict": verdict
+            }
+
+    def prune(self, live_keys):
+        """Drop entries for processes that are no longer running.
+
+        Args:
+            live_keys: Iterable of (pid, create_time) tuples currently running
+        """
+        live = {state_key(pid, create_time) for pid, create_time in live_keys}
+        for key in [key for key in self.processes if key not in live]:
+            del self.processes[key]
+
+    def reset_counters(self):
+        """Reset the skipped/rescanned counters before a new scan."""
+        self.skipped = 0
+        self.rescanned = 0
+
+    def stats(self):
+        """Return how many processes were skipped and rescanned in the last scan."""
+        return {"skipped": self.skipped, "rescanned": self.rescanned, "tracked": len(self.processes)}
@@ -7,35 +7,64 @@ Scans running processes for indicators of Process Doppelgänging.
 """
 import os
 import psutil
+import logging
 import json
 import ctypes
 import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from ctypes import windll, byref, sizeof, c_buffer, Structure, POINTER, WinError
+from ctypes import byref, sizeof, c_buffer, Structure, POINTER
 from ctypes.wintypes import DWORD, BOOL, HANDLE, LPVOID, WORD, BYTE
 
+try:
+    from ctypes import windll, WinError
+except ImportError:  # Not Windows: scanning goes through the /proc backend
+    windll = None
+    WinError = OSError
+
 from .utils import (
     is_admin, 
-    get_process_memory_info, 
-    check_mapped_files, 
-    get_process_handles, 
+    get_memory_region_counts,
     calculate_suspicion_level,
-    save_to_json,
-    open_process,
-    close_handle,
     PROCESS_QUERY_INFORMATION,
     PROCESS_VM_READ
 )
+from . import __version__
 from .logger import get_logger
+from .snapshot import ProcessTable
+from .cache import ParentVerdictCache, PathStatusCache
+from .patterns import DEFAULT_PATTERNS
+from .scoring import DEFAULT_ENGINE
+from .scan_state import ScanState
+from .handles import HandleSnapshot
+from .backend import get_default_backend
+from .image_cache import ImageHeaderCache, header_digest, IMAGE_HEADER_SIZE
+from .metrics import SCANS, SCAN_DURATION, DETECTIONS
+
+# Maximum age in seconds of a handle table snapshot reused between single-process scans
+HANDLE_SNAPSHOT_MAX_AGE = 1.0
 
 class ProcessScanner:
     """Scanner for detecting Process Doppelgänging in running processes."""
     
-    def __init__(self, admin_rights=False, results_file="results.json"):
+    def __init__(self, admin_rights=False, results_file="results.json", workers=1,
+                 parent_cache_size=4096, parent_cache_ttl=600.0, patterns=None, state_file=None,
+                 path_cache_size=16384, path_cache_ttl=60.0, backend=None, image_cache_file=None,
+                 results_store=None):
         """Initialize the scanner."""
         self.logger = get_logger()
+        # Platform-specific process inspection (Windows APIs or /proc)
+        self.backend = backend or get_default_backend()
         self.admin_rights = admin_rights
+        # Unused: kept for existing callers; the caller saves the scan results
+        # (main.py writes them with save_to_json)
         self.results_file = results_file
+        # Append-only detection history (ResultsStore), optional
+        self.results_store = results_store
+        self.workers = max(1, workers)
+        self.patterns = patterns or DEFAULT_PATTERNS
         self.results = {
             "scan_time": datetime.now(),
             "admin_rights": admin_rights,
@@ -45,8 +74,38 @@ class ProcessScanner:
         # Create a list to track suspicious processes
         self.suspicious_processes = []
         
+        # Process attributes for the current cycle, refreshed by each full scan
+        self.process_table = ProcessTable(source=self.backend)
+        
+        # Parent verdicts survive across cycles until the parent exits or the entry expires
+        self.parent_cache = ParentVerdictCache(max_entries=parent_cache_size, ttl=parent_cache_ttl)
+        
+        # Existence of mapped file paths, shared by every process and worker thread
+        self.path_cache = PathStatusCache(max_entries=path_cache_size, ttl=path_cache_ttl,
+                                          path_exists=self.backend.path_exists)
+        
+        # On-disk header digests per executable for the in-memory image comparison,
+        # persisted if image_cache_file is set
+        self.image_cache = ImageHeaderCache(image_cache_file, identity=self.backend.file_identity,
+                                            read_header=self.backend.read_file_header)
+        
+        # Verdicts from previous runs for incremental scans (None = scan everything);
+        # they are discarded when the release, patterns or scoring weights
+        # (DEFAULT_ENGINE, used by calculate_suspicion_level) change
+        self.scan_state = None
+        if state_file:
+            context = hashlib.sha256(f"{__version__}|{self.patterns.digest()}|{DEFAULT_ENGINE.digest()}"
+                                     .encode("utf-8")).hexdigest()
+            self.scan_state = ScanState(state_file, context=context)
+        
+        # System handle table: one capture per full scan, or a short-lived
+        # shared capture for single-process scans from the monitor
+        self.handle_snapshot = None
+        self._cycle_handle_snapshot = None
+        self._handle_lock = threading.Lock()
+        
         # Initialize native API functions if admin rights are available
-        if admin_rights:
+        if admin_rights and self.backend.name == "windows":
             self._init_native_api()
     
     def _init_native_api(self):
@@ -66,73 +125,15 @@ class ProcessScanner:
             self.logger.error(f"Failed to initialize native API functions: {e}")
             self.admin_rights = False
     
-    def scan_all_processes(self):
-        """Scan all running processes for indicators of Process Doppelgänging."""
-        self.logger.info("Starting scan of all running processes")
-        
-        # Reset results for a new scan
-        self.results = {
-            "scan_time": datetime.now(),
-            "admin_rights": self.admin_rights,
-            "suspicious_processes": []
-        }
+    def check_process_for_doppelganging(self, pid, record=None, regions=None, maps=None):
+        """Check a specific process for Process Doppelgänging indicators.
         
-        # Get all processes
-        try:
-            processes = list(psutil.process_iter(['pid', 'name', 'cmdline', 'username', 'create_time', 'ppid']))
-            self.logger.info(f"Found {len(processes)} running processes to scan")
-            
-            for proc in processes:
-                try:
-                    process_info = {
-                        "pid": proc.info['pid'],
-                        "name": proc.info['name'],
-                        "cmd": proc.info.get('cmdline', []),
-                        "username": proc.info.get('username', ''),
-                        "create_time": proc.info.get('create_time', 0),
-                        "parent_pid": proc.info.get('ppid', 0)
-                    }
-                    
-                    # Skip system processes with low PIDs if not admin
-                    if process_info["pid"] < 10 and not self.admin_rights:
-                        continue
-                    
-                    # Check for Process Doppelgänging indicators
-                    indicators = self.check_process_for_doppelganging(process_info["pid"])
-                    
-                    # Calculate suspicion score
-                    suspicion_score = calculate_suspicion_score(indicators)
-                    
-                    # Add to results if suspicious
-                    if suspicion_score > 0:
-                        process_info["indicators"] = indicators
-                        process_info["suspicion_score"] = suspicion_score
-                        self.results["suspicious_processes"].append(process_info)
-                        
-                        self.logger.warning(
-                            f"Suspicious process detected: PID={process_info['pid']}, "
-                            f"Name={process_info['name']}, Score={suspicion_score}"
-                        )
-                
-                except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
-                    continue
-                except Exception as e:
-                    self.logger.error(f"Error scanning process {proc.info['pid']}: {e}")
-            
-            # Save results to JSON
-            if save_to_json(self.results, self.results_file):
-                self.logger.info(f"Scan results saved to {self.results_file}")
-            else:
-                self.logger.error(f"Failed to save scan results to {self.results_file}")
-            
-            return self.results["suspicious_processes"]
-            
-        except Exception as e:
-            self.logger.error(f"Error during process scan: {e}")
-            return []
-    
-    def check_process_for_doppelganging(self, pid):
-        """Check a specific process for Process Doppelgänging indicators."""
+        Args:
+            pid: Process ID to check
+            record: ProcessRecord from the current snapshot (read on demand if omitted)
+            regions: MemoryRegionTable already walked for this process (walked on demand if omitted)
+            maps: Memory maps already read for this process (read on demand if omitted)
+        """
         indicators = {
             "has_suspicious_memory": False,
             "has_deleted_file_mapping": False,
@@ -146,9 +147,15 @@ class ProcessScanner:
         
         try:
             # Get process info first to check if it's a known safe process
+            if record is None:
+                record = self.process_table.refresh(pid)
+            
             try:
-                process = psutil.Process(pid)
-                process_name = process.name().lower()
+                if record is None:
+                    raise psutil.NoSuchProcess(pid)
+                if record.name is None:
+                    raise psutil.AccessDenied(pid)
+                process_name = record.name.lower()
                 
                 # Check for unnamed processes - strong indicator of Process Doppelgänging
                 if not process_name or process_name == "" or process_name.strip() == "":
@@ -158,59 +165,11 @@ class ProcessScanner:
                     # Return early with this strong indicator
                     return indicators
                 
-                # Check for unusual or suspicious process names often used for malware
-                suspicious_names = [
-                    "svchost",  # if not legitimate svchost (we'll check path later)
-                    "csrss",   # if not legitimate csrss
-                    "lsass",   # if not legitimate lsass
-                    "rundll",  # shortened rundll32
-                    "scvhost", # typosquatting of svchost
-                    "svch0st", # character replacement
-                    "explore", # shortened explorer
-                    "iexplore", # IE commonly used
-                    "services", # if not the real services
-                    "dllhost", # if not legitimate dllhost
-                ]
-                
-                # Check for process name spoofing
-                if any(sus_name == process_name or sus_name in process_name for sus_name in suspicious_names):
-                    # Verify if it's a legitimate system process by checking its path
-                    try:
-                        process_path = process.exe().lower()
-                        expected_system_path = "c:\\windows\\system32\\"
-                        expected_syswow64_path = "c:\\windows\\syswow64\\"
-                        
-                        # If using a system name but not in system directories, mark as suspicious
-                        if not (expected_system_path in process_path or expected_syswow64_path in process_path):
-                            indicators["name_spoofing"] = True
-                            indicators["details"]["name_spoofing"] = f"Process using system name '{process_name}' but not in system directory: {process_path}"
-                    except:
-                        pass
-                
-                # Whitelist of common Windows processes that often have legitimate deleted file mappings
-                # or similar behavior that might trigger false positives
-                whitelist = [
-                    "msedgewebview2.exe",  # Edge WebView frequently uses temp sections
-                    "svchost.exe",         # Windows service host frequently has unusual mappings
-                    "explorer.exe",        # Windows explorer
-                    "runtimebroker.exe",   # Windows runtime broker
-                    "searchhost.exe",      # Windows search
-                    "startmenuexperiencehost.exe",  # Start menu
-                    "shellexperiencehost.exe",      # Shell experience
-                    "applicationframehost.exe",     # Application frame
-                    "microsoftedge.exe",   # Edge browser
-                    "chrome.exe",          # Chrome browser
-                    "firefox.exe",         # Firefox browser
-                    "wmiprvse.exe",        # WMI Provider Service
-                    "wininit.exe",         # Windows initialization
-                    "lsass.exe",           # Windows security
-                    "fontdrvhost.exe",     # Font driver host
-                    "dwm.exe",             # Desktop Window Manager
-                    "csrss.exe"            # Client/Server Runtime Subsystem
-                ]
+                # Name spoofing and IOC path checks depend only on the executable
+                self._check_image(record, process_name, indicators)
                 
                 # If it's a common Windows process, do more careful analysis before flagging
-                is_whitelisted = process_name in whitelist
+                is_whitelisted = process_name in self.patterns.whitelist
                 
                 # For whitelisted processes, we'll require more indicators to flag as suspicious
                 # We'll still collect data but apply stricter scoring later
@@ -225,7 +184,7 @@ class ProcessScanner:
                 indicators["details"]["unnamed_process"] = "Cannot retrieve process name - possible Process Doppelgänging"
             
             # Open a handle to the process
-            process_handle = open_process(pid)
+            process_handle = self.backend.open_process(pid)
             if not process_handle:
                 # Cannot open process - could be protected or already terminated
                 if indicators["unnamed_process"]:
@@ -233,10 +192,13 @@ class ProcessScanner:
                     return indicators
                 return indicators
             
+            # Walk the address space once; every memory-derived check reads this table
+            if regions is None:
+                regions = self.backend.walk_memory(pid, self.admin_rights)
+            
             # Check for suspicious memory regions with error handling
             try:
-                memory_regions = get_process_memory_info(pid, self.admin_rights)
-                suspicious_regions = [r for r in memory_regions if r.get("Suspicious", False)]
+                suspicious_regions = self.backend.suspicious_memory(pid, self.admin_rights, regions)
                 
                 if suspicious_regions:
                     indicators["has_suspicious_memory"] = True
@@ -246,7 +208,10 @@ class ProcessScanner:
             
             # Check for mapped files from non-existent or deleted files with error handling
             try:
-                suspicious_mappings = check_mapped_files(pid, self.admin_rights)
+                if maps is None:
+                    maps = self.backend.memory_maps(pid, regions)
+                suspicious_mappings = self.backend.check_mapped_files(pid, self.admin_rights, maps,
+                                                                      self.path_cache)
                 
                 # Filter out common benign deleted mappings (for Edge WebView2 and other browsers)
                 if is_whitelisted and suspicious_mappings:
@@ -271,10 +236,23 @@ class ProcessScanner:
             except Exception as e:
                 self.logger.debug(f"Error checking mapped files for PID {pid}: {e}")
             
+            # Check the process image itself (deleted or in-memory executables)
+            try:
+                self.backend.check_executable(pid, indicators)
+            except Exception as e:
+                self.logger.debug(f"Error checking executable for PID {pid}: {e}")
+            
+            # Compare the image mapped in memory with the executable on disk
+            try:
+                self._check_image_header(pid, record, regions, indicators)
+            except Exception as e:
+                self.logger.debug(f"Error comparing the image of PID {pid} with its file: {e}")
+            
             # Check for transaction handles (TmTx) or suspicious section handles with error handling
             if self.admin_rights:
                 try:
-                    handles = get_process_handles(pid, self.admin_rights)
+                    handles = self.backend.get_handles(pid, self.admin_rights, regions,
+                                                       self._current_handle_snapshot())
                     
                     # Process handle results safely
                     transaction_handles = []
@@ -301,18 +279,13 @@ class ProcessScanner:
             # Check if process was created using NtCreateProcessEx with a section
             # This is a strong indicator when combined with other factors
             try:
-                # Get parent PID safely
-                parent_pid = 0
-                try:
-                    if hasattr(process, 'ppid') and callable(process.ppid):
-                        parent_pid = process.ppid()
-                except (psutil.AccessDenied, psutil.ZombieProcess, AttributeError) as e:
-                    self.logger.debug(f"Cannot access parent PID for process {pid}: {e}")
+                # Get parent PID from the snapshot record
+                parent_pid = record.ppid if record is not None and record.ppid else 0
                 
                 if parent_pid > 0:
                     try:
                         # Check if parent is suspicious
-                        parent_indicators = self.check_parent_process(parent_pid)
+                        parent_indicators = self.check_parent_process(parent_pid, record.create_time)
                         
                         if parent_indicators and parent_indicators.get("suspicious", False):
                             # For whitelisted processes, only consider parent suspicious if strong indicators
@@ -329,16 +302,63 @@ class ProcessScanner:
             indicators["process_name"] = process_name
             
             # Close the handle
-            close_handle(process_handle)
+            self.backend.close_process(process_handle)
             
         except Exception as e:
             self.logger.error(f"Error checking process {pid} for doppelgänging: {e}")
         
         return indicators
     
-    def check_parent_process(self, pid):
+    def _check_image(self, record, process_name, indicators):
+        """Run the checks that depend only on the executable file and process name."""
+        # Check for process name spoofing using names often abused by malware
+        if self.patterns.suspicious_names.search(process_name):
+            # Verify if it's a legitimate system process by checking its path
+            try:
+                process_path = record.exe.lower()
+                expected_system_path = "c:\\windows\\system32\\"
+                expected_syswow64_path = "c:\\windows\\syswow64\\"
+                
+                # If using a system name but not in system directories, mark as suspicious
+                if not (expected_system_path in process_path or expected_syswow64_path in process_path):
+                    indicators["name_spoofing"] = True
+                    indicators["details"]["name_spoofing"] = f"Process using system name '{process_name}' but not in system directory: {process_path}"
+            except:
+                pass
+        
+        # Check the executable path against loaded IOC path patterns
+        if record.exe and len(self.patterns.path_iocs):
+            path_matches = self.patterns.path_iocs.find_all(record.exe.lower())
+            if path_matches:
+                indicators["ioc_path_match"] = True
+                indicators["details"]["ioc_path_match"] = path_matches
+    
+    def _check_image_header(self, pid, record, regions, indicators):
+        """Flag a process whose mapped image headers differ from its executable file.
+        
+        The file's header digest comes from image_cache, so only the first
+        launch of each binary reads it from disk.
+        """
+        if record is None or not record.exe:
+            return
+        reference = self.image_cache.reference(self.backend.image_path(pid, record))
+        if reference is None:
+            return
+        mapped = self.backend.read_image_header(pid, IMAGE_HEADER_SIZE, regions)
+        if not mapped:
+            return
+        if header_digest(mapped) != reference:
+            indicators["image_mismatch"] = True
+            indicators["details"]["image_mismatch"] = (
+                f"Image headers in memory differ from the executable on disk: {record.exe}")
+    
+    def check_parent_process(self, pid, child_create_time=None):
         """Check if parent process is suspicious (e.g., cmd.exe, powershell.exe)
         Returns information including a high_confidence flag for more reliable detection
+        
+        Args:
+            pid: Parent process ID
+            child_create_time: Creation time of the child, used to reject reused PIDs
         """
         result = {
             "pid": pid,
@@ -352,44 +372,34 @@ class ProcessScanner:
             return result
             
         try:
-            # Get process with proper error handling
-            try:
-                process = psutil.Process(pid)
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess) as e:
-                self.logger.debug(f"Cannot access parent process {pid}: {e}")
+            # Get process from the snapshot table
+            process = self.process_table.lookup(pid, not_after=child_create_time)
+            if process is None:
+                self.logger.debug(f"Cannot access parent process {pid}: process no longer exists")
                 return result
+            
+            # Repeat parents (explorer.exe, services.exe, ...) reuse their earlier verdict
+            cache_key = process.key
+            cached = self.parent_cache.get(cache_key)
+            if cached is not None:
+                return dict(cached, reason=list(cached["reason"]))
                 
-            # Get process name with error handling
-            try:
-                process_name = process.name().lower()
+            # Get process name from the snapshot record
+            if process.name is not None:
+                process_name = process.name.lower()
                 result["name"] = process_name
-            except (psutil.AccessDenied, psutil.ZombieProcess) as e:
-                self.logger.debug(f"Cannot get name for parent process {pid}: {e}")
+            else:
+                self.logger.debug(f"Cannot get name for parent process {pid}")
+                process_name = "<unknown>"
                 result["name"] = "<unknown>"
             
-            # List of potentially abused processes for launching malware
-            suspicious_parents = [
-                "cmd.exe", "powershell.exe", "wscript.exe", "cscript.exe",
-                "rundll32.exe", "regsvr32.exe", "mshta.exe", "schtasks.exe",
-                "wmic.exe", "msiexec.exe", "odbcconf.exe", "regasm.exe",
-                "regsvcs.exe", "installutil.exe", "cmstp.exe", "certutil.exe"
-            ]
-            
-            # Legitimate parent processes that are often system services
-            legitimate_service_parents = [
-                "services.exe", "svchost.exe", "smss.exe", "wininit.exe", 
-                "csrss.exe", "winlogon.exe", "explorer.exe", "lsass.exe",
-                "taskhost.exe", "taskhostw.exe", "sihost.exe", "runtimebroker.exe",
-                "userinit.exe", "dwm.exe", "fontdrvhost.exe", "searchindexer.exe"
-            ]
-            
             # Only flag parent as suspicious if it's in our list AND not a system process
             # with normal children
-            if process_name in suspicious_parents:
+            if process_name in self.patterns.suspicious_parents:
                 # Check if this is a legitimate instance (e.g., system spawned cmd)
                 try:
-                    parent_parent = psutil.Process(process.ppid())
-                    if parent_parent.name().lower() in legitimate_service_parents:
+                    parent_parent = self.process_table.lookup(process.ppid, not_after=process.create_time)
+                    if parent_parent.name.lower() in self.patterns.legitimate_service_parents:
                         # It's less suspicious if this cmd/powershell was launched by a system service
                         # but still worth noting
                         result["suspicious"] = True
@@ -406,90 +416,99 @@ class ProcessScanner:
                 
             # Check command line for suspicious args (e.g., -enc, -w hidden, etc.)
             try:
-                cmdline = process.cmdline()
+                cmdline = process.cmdline
                 cmdline_str = " ".join(cmdline).lower()
                 
-                # High confidence indicators in command line
-                high_confidence_args = [
-                    "-enc ", "-encodedcommand", "-w hidden", "-windowstyle hidden",
-                    "-exec bypass", "-executionpolicy bypass",
-                    "iex(", "invoke-expression", "downloadstring", "downloadfile",
-                    "bitsadmin /transfer", "certutil -urlcache", "regsvr32 /s /u /i:"
-                ]
+                # One pass over the command line finds every high and medium confidence argument
+                matched_args = self.patterns.cmdline_args.find_all(cmdline_str)
                 
-                # Medium confidence indicators
-                medium_confidence_args = [
-                    "-noprofile", "-noexit", "-noninteractive", "-command", 
-                    "-c ", "curl ", "wget ", "net use ", "-sta"
-                ]
-                
-                for arg in high_confidence_args:
-                    if arg in cmdline_str:
+                for confidence, arg in matched_args:
+                    if confidence == "high":
                         result["suspicious"] = True
                         result["high_confidence"] = True
                         result["reason"].append(f"Highly suspicious command line argument: {arg}")
                 
-                for arg in medium_confidence_args:
-                    if arg in cmdline_str and not result["high_confidence"]:
-                        result["suspicious"] = True
-                        result["reason"].append(f"Suspicious command line argument: {arg}")
+                if not result["high_confidence"]:
+                    for confidence, arg in matched_args:
+                        if confidence == "medium":
+                            result["suspicious"] = True
+                            result["reason"].append(f"Suspicious command line argument: {arg}")
             except:
                 pass
+            
+            self.parent_cache.put(cache_key, dict(result, reason=list(result["reason"])))
                 
         except Exception as e:
             self.logger.error(f"Error checking parent process {pid}: {e}")
             
         return result
     
-    def scan_specific_process(self, pid):
-        """Scan a specific process for Process Doppelgänging indicators."""
+    def scan_specific_process(self, pid, record=None, store_result=True):
+        """Scan a specific process for Process Doppelgänging indicators.
+        
+        Args:
+            pid: Process ID
+            record: ProcessRecord from the current snapshot (read fresh if omitted)
+            store_result: Whether to add a suspicious result to the result lists;
+                          repeated scans of one process pass False and call add_result themselves
+        """
+        start = time.perf_counter()
+        process_info = self._analyze_process(pid, record)
+        SCANS.inc()
+        SCAN_DURATION.observe(time.perf_counter() - start)
+        if process_info and store_result:
+            self.add_result(process_info)
+        return process_info
+    
+    def add_result(self, process_info, persist=True, keep=True):
+        """Add a scanned process to the result lists if it is suspicious.
+        
+        Args:
+            process_info: Result of a process scan
+            persist: Whether to append it to the results store right away
+            keep: Whether to also keep it in the in-memory result lists
+        """
+        if process_info.get("threat_level", "LOW") != "LOW":
+            DETECTIONS.labels(process_info["threat_level"]).inc()
+            if keep:
+                # Add to both tracking structures
+                self.suspicious_processes.append(process_info)
+                self.results["suspicious_processes"].append(process_info)
+            if persist and self.results_store is not None:
+                try:
+                    self.results_store.add(process_info)
+                except Exception as e:
+                    self.logger.error(f"Failed to store result for PID {process_info.get('pid')}: {e}")
+    
+    def _analyze_process(self, pid, record=None, regions=None, maps=None):
+        """Collect process information and indicators without recording the result.
+        
+        Safe to call from several worker threads at once.
+        """
         try:
-            self.logger.info(f"Scanning process with PID {pid}")
+            self.logger.rate_limited("scan.process", logging.INFO, f"Scanning process with PID {pid}",
+                                     description="process scans")
             
-            # Check if the process still exists and is accessible
-            try:
-                process = psutil.Process(pid)
-                
-                # Get basic process information with error handling for each attribute
-                process_info = {"pid": pid}
-                
-                try:
-                    process_info["name"] = process.name()
-                except (psutil.AccessDenied, psutil.ZombieProcess) as e:
-                    process_info["name"] = "<access-denied>"
-                    self.logger.debug(f"Cannot access name for process {pid}: {e}")
-                
-                try:
-                    process_info["cmd"] = process.cmdline()
-                except (psutil.AccessDenied, psutil.ZombieProcess) as e:
-                    process_info["cmd"] = []
-                    self.logger.debug(f"Cannot access cmdline for process {pid}: {e}")
-                
-                try:
-                    process_info["username"] = process.username()
-                except (psutil.AccessDenied, psutil.ZombieProcess) as e:
-                    process_info["username"] = "<unknown>"
-                    self.logger.debug(f"Cannot access username for process {pid}: {e}")
-                
-                try:
-                    process_info["create_time"] = process.create_time()
-                except (psutil.AccessDenied, psutil.ZombieProcess) as e:
-                    process_info["create_time"] = 0
-                    self.logger.debug(f"Cannot access creation time for process {pid}: {e}")
-                
-                try:
-                    process_info["parent_pid"] = process.ppid()
-                except (psutil.AccessDenied, psutil.ZombieProcess) as e:
-                    process_info["parent_pid"] = 0
-                    self.logger.debug(f"Cannot access parent PID for process {pid}: {e}")
-                
-            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess) as e:
-                self.logger.warning(f"Cannot access process {pid}: {e}")
+            # Use the snapshot record when scanning as part of a full scan,
+            # otherwise read this one process with a single oneshot() pass
+            if record is None:
+                record = self.process_table.refresh(pid)
+            if record is None:
+                self.logger.warning(f"Cannot access process {pid}: process no longer exists")
                 return None
             
+            process_info = {
+                "pid": pid,
+                "name": record.name if record.name is not None else "<access-denied>",
+                "cmd": record.cmdline or [],
+                "username": record.username if record.username is not None else "<unknown>",
+                "create_time": record.create_time or 0,
+                "parent_pid": record.ppid or 0
+            }
+            
             # Check for indicators with proper error handling
             try:
-                indicators = self.check_process_for_doppelganging(pid)
+                indicators = self.check_process_for_doppelganging(pid, record, regions, maps)
                 
                 # Calculate suspicion level
                 threat_level, suspicion_score, reason = calculate_suspicion_level(indicators)
@@ -503,13 +522,13 @@ class ProcessScanner:
                 # Log results based on threat level
                 if threat_level != "LOW":
                     # Use custom threat level logging
-                    self.logger.threat(
-                        threat_level, 
-                        f"PID: {pid} - {process_info['name']} - {reason}"
+                    # HIGH threats always get their own line
+                    self.logger.rate_limited(
+                        f"threat.{threat_level}", logging.WARNING,
+                        f"PID: {pid} - {process_info['name']} - {reason}",
+                        item=process_info['name'], description=f"{threat_level} threat detections",
+                        threat_level=threat_level
                     )
-                    # Add to both tracking structures
-                    self.suspicious_processes.append(process_info)
-                    self.results["suspicious_processes"].append(process_info)
                 
                 return process_info
             except Exception as e:
@@ -520,15 +539,188 @@ class ProcessScanner:
             self.logger.error(f"Unexpected error scanning process {pid}: {e}")
             return None
             
-    def scan_all_processes(self):
-        """Scan all running processes for Process Doppelgänging indicators."""
+    def scan_all_processes(self, workers=None):
+        """Scan all running processes for Process Doppelgänging indicators.
+        
+        Args:
+            workers: Number of concurrent scan threads (defaults to the value
+                     given to the constructor, 1 = sequential scan)
+        
+        Returns:
+            The results dictionary, including a "scan_stats" entry
+        """
+        workers = max(1, workers or self.workers)
+        
+        # Reset results for a new scan
+        self.results = {
+            "scan_time": datetime.now(),
+            "admin_rights": self.admin_rights,
+            "suspicious_processes": []
+        }
+        
         try:
-            self.logger.info("Scanning all running processes")
+            self.logger.info(f"Scanning all running processes ({workers} worker{'s' if workers > 1 else ''})")
             
-            # Iterate over all running processes
-            for proc in psutil.process_iter(['pid', 'name']):
-                pid = proc.info['pid']
-                self.scan_specific_process(pid)
-                
+            # One bulk enumeration feeds every check in this cycle
+            self.process_table = ProcessTable.take_snapshot(self.backend)
+            
+            # Drop verdicts for parents that have exited since the last cycle
+            self.parent_cache.retain(self.process_table.keys())
+            
+            if self.scan_state is not None:
+                self.scan_state.reset_counters()
+            
+            # One handle table query for the whole cycle
+            self._cycle_handle_snapshot = self._current_handle_snapshot(max_age=0)
+            
+            # Sort PIDs so results come out in the same order regardless of worker scheduling
+            pids = self.process_table.pids()
         except Exception as e:
             self.logger.error(f"Error scanning all processes: {e}")
+            return self.results
+        
+        wall_start = time.perf_counter()
+        
+        if workers == 1:
+            timed_results = [self._timed_analyze(pid) for pid in pids]
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan") as executor:
+                futures = [executor.submit(self._timed_analyze, pid) for pid in pids]
+                timed_results = []
+                for pid, future in zip(pids, futures):
+                    # Isolate worker failures so one bad PID does not abort the scan
+                    try:
+                        timed_results.append(future.result())
+                    except Exception as e:
+                        self.logger.error(f"Worker failed while scanning process {pid}: {e}")
+                        timed_results.append((None, 0.0))
+        
+        wall_time = time.perf_counter() - wall_start
+        self._cycle_handle_snapshot = None
+        process_time = 0.0
+        for process_info, elapsed in timed_results:
+            process_time += elapsed
+            if process_info:
+                self.add_result(process_info, persist=False)
+        
+        # One transaction for all detections of this cycle
+        if self.results_store is not None:
+            try:
+                self.results_store.add_many(self.results["suspicious_processes"])
+            except Exception as e:
+                self.logger.error(f"Failed to store scan results in {self.results_store.filepath}: {e}")
+        
+        self.results["scan_stats"] = {
+            "processes_scanned": len(pids),
+            "workers": workers,
+            "wall_time": round(wall_time, 3),
+            "process_time": round(process_time, 3),
+            "speedup": round(process_time / wall_time, 2) if wall_time > 0 else 0.0,
+            "parent_cache": self.parent_cache.stats(),
+            "path_cache": self.path_cache.stats()
+        }
+        self.logger.info(
+            f"Scanned {len(pids)} processes in {wall_time:.2f}s wall time "
+            f"({process_time:.2f}s summed per-process time, "
+            f"{self.results['scan_stats']['speedup']}x speedup with {workers} workers)"
+        )
+        parent_stats = self.results["scan_stats"]["parent_cache"]
+        path_stats = self.results["scan_stats"]["path_cache"]
+        self.logger.info(
+            f"Parent verdict cache: {parent_stats['hit_rate']:.1%} hit rate "
+            f"({parent_stats['hits']} hits, {parent_stats['misses']} misses); "
+            f"path cache: {path_stats['hit_rate']:.1%} hit rate "
+            f"({path_stats['hits']} hits, {path_stats['misses']} misses, {path_stats['stat_calls']} stat calls)"
+        )
+        self.logger.flush_rollups(force=True)
+        
+        image_stats = self.image_cache.stats()
+        self.results["scan_stats"]["image_cache"] = image_stats
+        self.logger.info(
+            f"Image header cache: {image_stats['hit_rate']:.1%} hit rate "
+            f"({image_stats['hits']} hits, {image_stats['misses']} file reads, {image_stats['errors']} unreadable), "
+            f"net time saved {image_stats['time_saved']:+.3f}s"
+        )
+        if not self.image_cache.save():
+            self.logger.error(f"Failed to save image cache to {self.image_cache.filepath}")
+        
+        # Persist fingerprints so the next scan can skip unchanged processes
+        if self.scan_state is not None:
+            self.scan_state.prune(self.process_table.keys())
+            if not self.scan_state.save():
+                self.logger.error(f"Failed to save scan state to {self.scan_state.filepath}")
+            incremental = self.scan_state.stats()
+            self.results["scan_stats"]["incremental"] = incremental
+            self.logger.info(
+                f"Incremental scan: {incremental['skipped']} unchanged processes skipped, "
+                f"{incremental['rescanned']} rescanned"
+            )
+        
+        return self.results
+    
+    def _current_handle_snapshot(self, max_age=HANDLE_SNAPSHOT_MAX_AGE):
+        """Return the handle table snapshot, capturing a new one if it is too old.
+        
+        Returns None without admin rights or if the backend has no handle table.
+        """
+        if not self.admin_rights or not self.backend.supports_handles:
+            return None
+        if self._cycle_handle_snapshot is not None:
+            return self._cycle_handle_snapshot
+        
+        with self._handle_lock:
+            if self.handle_snapshot is None or self.handle_snapshot.age > max_age:
+                try:
+                    self.handle_snapshot = self.backend.capture_handles()
+                except Exception as e:
+                    self.logger.debug(f"Failed to capture system handle table: {e}")
+                    # Keep an empty snapshot so failures are not retried on every process
+                    self.handle_snapshot = HandleSnapshot()
+            return self.handle_snapshot
+    
+    def process_exited(self, pid):
+        """Forget cached state for a process that has exited."""
+        self.process_table.discard(pid)
+        self.parent_cache.invalidate_pid(pid)
+    
+    def fingerprint_process(self, pid, record, regions, maps):
+        """Return a cheap fingerprint that changes when a process is worth rescanning.
+        
+        Consists of the executable path, committed region count, RWX region
+        count and mapped file count.
+        """
+        region_count, rwx_count = get_memory_region_counts(pid, self.admin_rights, regions)
+        return (record.exe or "", region_count, rwx_count, len(maps))
+    
+    def _analyze_incremental(self, pid, record):
+        """Reuse the stored verdict for an unchanged process, otherwise rescan it."""
+        # The region table and memory maps read for the fingerprint are reused by the deep scan
+        regions = self.backend.walk_memory(pid, self.admin_rights)
+        maps = self.backend.memory_maps(pid, regions)
+        fingerprint = self.fingerprint_process(pid, record, regions, maps)
+        cached = self.scan_state.lookup(pid, record.create_time, fingerprint)
+        if cached is not None:
+            self.logger.debug(f"Process {pid} unchanged since last scan, reusing verdict")
+            return cached
+        
+        process_info = self._analyze_process(pid, record, regions, maps)
+        if process_info is not None:
+            self.scan_state.update(pid, record.create_time, fingerprint, process_info)
+        return process_info
+    
+    def _timed_analyze(self, pid):
+        """Analyze a process and return (process_info, elapsed seconds)."""
+        start = time.perf_counter()
+        try:
+            record = self.process_table.get(pid)
+            if self.scan_state is not None and record is not None:
+                process_info = self._analyze_incremental(pid, record)
+            else:
+                process_info = self._analyze_process(pid, record)
+        except Exception as e:
+            self.logger.error(f"Unexpected error scanning process {pid}: {e}")
+            process_info = None
+        elapsed = time.perf_counter() - start
+        SCANS.inc()
+        SCAN_DURATION.observe(elapsed)
+        return process_info, elapsed
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Scheduler module for Process Doppelgänging Detector
+---------------------------------------------------
+Timer heap that fires delayed scans at fixed offsets from a process's
+creation time. A single thread serves every pending timer, so tens of
+thousands of processes can be waiting without a sleeping thread each.
+"""
+import time
+import heapq
+import threading
+
+from .logger import get_logger
+
+# Default scan offsets in seconds after process creation
+DEFAULT_SCAN_OFFSETS = (0.1, 1.0, 10.0)
+
+
+def parse_offsets(value):
+    """Parse a comma-separated list of offsets in seconds, e.g. "0.1,1,10".
+
+    Returns:
+        Sorted tuple of non-negative floats
+
+    Raises:
+        ValueError: If the list is empty or contains a negative or non-numeric value
+    """
+    offsets = sorted(float(part) for part in value.split(",") if part.strip())
+    if not offsets or offsets[0] < 0:
+        raise ValueError(f"Invalid scan offsets: {value!r}")
+    return tuple(offsets)
+
+
+class ScanScheduler:
+    """Heap of pending (due time, pid) scans served by one dispatcher thread.
+
+    Cancelled timers stay in the heap and are skipped when they come due;
+    the heap is rebuilt once stale entries outnumber the live ones.
+    """
+
+    def __init__(self, callback, offsets=DEFAULT_SCAN_OFFSETS, clock=time.time):
+        """Initialize the scheduler.
+
+        Args:
+            callback: Called as callback(pid, create_time, name, offset_index, is_last)
+                      from the dispatcher thread for every timer that fires
+            offsets: Seconds after create_time at which each process is scanned
+            clock: Function returning the current epoch time (replaceable in tests)
+        """
+        self.logger = get_logger()
+        self.callback = callback
+        self.offsets = tuple(sorted(offsets))
+        self.clock = clock
+        self.running = False
+        self.thread = None
+        self.fired = 0
+        self.cancelled = 0
+        self.max_lag = 0.0
+
+        # Heap entries: (due, sequence, pid, create_time, name, offset_index)
+        self._heap = []
+        self._sequence = 0
+        self._stale = 0
+        # Live processes: pid -> [create_time, timers left]; timers for any
+        # other create_time are stale
+        self._active = {}
+        self._condition = threading.Condition()
+
+    def __len__(self):
+        return len(self._heap) - self._stale
+
+    def schedule(self, pid, create_time=None, name=None):
+        """Queue scans of a process at every configured offset from create_time.
+
+        Args:
+            pid: Process ID
+            create_time: Process creation time (epoch seconds); defaults to now
+            name: Process name, passed through to the callback
+        """
+        if create_time is None:
+            create_time = self.clock()
+        with self._condition:
+            if self._is_live(pid, create_time):
+                # Duplicate event for a process that is already scheduled
+                return
+            if pid in self._active:
+                # PID reused before the old process's exit was seen
+                self._cancel_locked(pid)
+            self._active[pid] = [create_time, len(self.offsets)]
+            for index, offset in enumerate(self.offsets):
+                self._sequence += 1
+                heapq.heappush(self._heap, (create_time + offset, self._sequence, pid,
+                                            create_time, name, index))
+            self._condition.notify()
+
+    def cancel(self, pid):
+        """Drop every pending scan of a process, e.g. because it exited.
+
+        Returns:
+            True if the process had pending scans
+        """
+        with self._condition:
+            return self._cancel_locked(pid)
+
+    def _cancel_locked(self, pid):
+        entry = self._active.pop(pid, None)
+        if entry is None:
+            return False
+        self._stale += entry[1]
+        self.cancelled += 1
+        if self._stale > len(self._heap) // 2:
+            self._compact()
+        return True
+
+    def _compact(self):
+        """Rebuild the heap without the timers of cancelled processes."""
+        self._heap = [entry for entry in self._heap if self._is_live(entry[2], entry[3])]
+        heapq.heapify(self._heap)
+        self._stale = 0
+
+    def _is_live(self, pid, create_time):
+        entry = self._active.get(pid)
+        return entry is not None and entry[0] == create_time
+
+    def _pop_due_locked(self, now):
+        """Pop the earliest live timer due at now (skipping cancelled ones), or return None."""
+        while self._heap and self._heap[0][0] <= now:
+            due, _, pid, create_time, name, index = heapq.heappop(self._heap)
+            if not self._is_live(pid, create_time):
+                self._stale = max(0, self._stale - 1)
+                continue
+            entry = self._active[pid]
+            entry[1] -= 1
+            is_last = entry[1] == 0
+            if is_last:
+                del self._active[pid]
+            self.fired += 1
+            self.max_lag = max(self.max_lag, now - due)
+            return pid, create_time, name, index, is_last
+        return None
+
+    def _fire(self, timer):
+        try:
+            self.callback(*timer)
+        except Exception as e:
+            self.logger.error(f"Scheduled scan callback failed for PID {timer[0]}: {e}")
+
+    def run_pending(self):
+        """Fire every timer that is due now from the calling thread.
+
+        Returns:
+            Number of timers fired
+        """
+        fired = 0
+        while True:
+            with self._condition:
+                timer = self._pop_due_locked(self.clock())
+            if timer is None:
+                return fired
+            self._fire(timer)
+            fired += 1
+
+    def _run(self):
+        """Dispatcher thread: wait for the earliest timer and fire it."""
+        while True:
+            with self._condition:
+                while self.running:
+                    if self._heap:
+                        wait = self._heap[0][0] - self.clock()
+                        if wait <= 0:
+                            break
+                        self._condition.wait(wait)
+                    else:
+                        self._condition.wait()
+                if not self.running:
+                    return
+                timer = self._pop_due_locked(self.clock())
+
+            if timer is not None:
+                self._fire(timer)
+
+    def start(self):
+        """Start the dispatcher thread."""
+        with self._condition:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(target=self._run, name="scan-scheduler")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """Stop the dispatcher thread and drop all pending timers."""
+        with self._condition:
+            self.running = False
+            self._heap = []
+            self._active.clear()
+            self._stale = 0
+            self._condition.notify_all()
+        if self.thread:
+            self.thread.join(timeout=5)
+            self.thread = None
+
+    def stats(self):
+        """Return pending timer count, fired and cancelled counters and the worst dispatch lag."""
+        with self._condition:
+            return {
+                "pending": len(self),
+                "processes": len(self._active),
+                "fired": self.fired,
+                "cancelled": self.cancelled,
+                "max_lag": round(self.max_lag, 3)
+            }
@@ -0,0 +1,342 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Scoring module for Process Doppelgänging Detector
+-------------------------------------------------
+Table-driven suspicion scoring, used by utils.calculate_suspicion_level
+through DEFAULT_ENGINE. Weights, whitelist handling and thresholds are plain
+data, and whole batches of indicator records can be scored in one vectorized
+NumPy pass.
+
+The vectorized path is score_matrix() on feature codes extracted once with
+to_codes() (e.g. re-scoring stored history with new weights). Extracting
+codes from indicator dictionaries runs in Python per record and costs about
+as much as calculate_suspicion_level itself, so score_batch() on
+dictionaries is a convenience, not a speedup.
+"""
+import hashlib
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, only needed for batch scoring
+    np = None
+
+# Feature columns of an indicator matrix, in order
+FEATURE_COLUMNS = (
+    "unnamed_process",
+    "has_suspicious_memory",
+    "has_deleted_file_mapping",
+    "has_mapping_entries",       # has_deleted_file_mapping with at least one mapping listed
+    "has_transaction_handles",
+    "has_section_without_file",
+    "created_with_section",
+    "ioc_path_match",
+    "suspicious_parent",
+    "parent_high_confidence",
+    "is_whitelisted",
+    "is_whitelisted_browser",    # whitelisted and one of BROWSER_NAMES
+    "image_mismatch",            # mapped image headers differ from the executable on disk
+)
+
+# Browsers that commonly have deleted mappings
+BROWSER_NAMES = frozenset(["msedgewebview2.exe", "chrome.exe", "firefox.exe", "msedge.exe"])
+
+
+class ScoreRule:
+    """Weight for one indicator column.
+
+    When alt_column is also set for the record, alt_weight/alt_reason are used
+    instead of weight/reason. A reason of None adds to the score silently.
+    """
+    __slots__ = ('column', 'weight', 'reason', 'alt_column', 'alt_weight', 'alt_reason')
+
+    def __init__(self, column, weight, reason, alt_column=None, alt_weight=None, alt_reason=None):
+        self.column = column
+        self.weight = weight
+        self.reason = reason
+        self.alt_column = alt_column
+        self.alt_weight = weight if alt_weight is None else alt_weight
+        self.alt_reason = alt_reason
+
+
+# Default weights, used by utils.calculate_suspicion_level
+DEFAULT_RULES = (
+    ScoreRule("has_suspicious_memory", 10, "Suspicious memory regions",
+              alt_column="is_whitelisted", alt_weight=5),
+    ScoreRule("has_mapping_entries", 40, "Deleted file mappings detected",
+              alt_column="is_whitelisted_browser", alt_weight=20),
+    ScoreRule("has_transaction_handles", 30,
+              "Transaction handles detected - strong Process Doppelgänging indicator"),
+    ScoreRule("has_section_without_file", 30, "Section handles without backing files detected",
+              alt_column="is_whitelisted", alt_weight=20),
+    ScoreRule("created_with_section", 20, "Process created with section object"),
+    ScoreRule("ioc_path_match", 40, "Executable path matches IOC list"),
+    # 50 is not reduced for whitelisted names, which a doppelganged process usually borrows
+    ScoreRule("image_mismatch", 50, "Mapped image differs from the executable on disk"),
+    ScoreRule("suspicious_parent", 10, "Suspicious parent process: {parent}",
+              alt_column="parent_high_confidence", alt_weight=15,
+              alt_reason="Highly suspicious parent process: {parent}"),
+)
+
+# Indicators counted towards the "multiple indicators" bonus
+DEFAULT_COMBO_COLUMNS = (
+    "has_suspicious_memory", "has_deleted_file_mapping", "has_transaction_handles",
+    "has_section_without_file", "created_with_section", "suspicious_parent",
+)
+
+LEVELS = ("LOW", "MEDIUM", "HIGH")
+
+
+class ScoringEngine:
+    """Scores indicator dictionaries, or matrices of them, from a rule table."""
+
+    def __init__(self, rules=DEFAULT_RULES, combo_columns=DEFAULT_COMBO_COLUMNS, combo_min=3,
+                 combo_bonus=20, whitelist_cutoff=50, whitelist_factor=0.5, max_score=100,
+                 high_threshold=60, medium_threshold=30):
+        self.rules = tuple(rules)
+        self.combo_columns = tuple(combo_columns)
+        self.combo_min = combo_min
+        self.combo_bonus = combo_bonus
+        self.whitelist_cutoff = whitelist_cutoff
+        self.whitelist_factor = whitelist_factor
+        self.max_score = max_score
+        self.high_threshold = high_threshold
+        self.medium_threshold = medium_threshold
+        self._index = {name: i for i, name in enumerate(FEATURE_COLUMNS)}
+
+    @classmethod
+    def from_dict(cls, config):
+        """Build an engine with weights overridden from a dictionary.
+
+        Example: {"weights": {"has_transaction_handles": 40}, "high_threshold": 70}
+        Weights may be a number or a [weight, alt_weight] pair.
+        """
+        config = dict(config)
+        overrides = config.pop("weights", {})
+        rules = []
+        for rule in DEFAULT_RULES:
+            value = overrides.get(rule.column)
+            if value is None:
+                rules.append(rule)
+                continue
+            weight, alt_weight = (value, value) if isinstance(value, (int, float)) else value
+            if rule.alt_column is None:
+                alt_weight = None
+            rules.append(ScoreRule(rule.column, weight, rule.reason,
+                                   rule.alt_column, alt_weight, rule.alt_reason))
+        return cls(rules=rules, **config)
+
+    def digest(self):
+        """Return a hash of the rule weights and thresholds."""
+        config = [(rule.column, rule.weight, rule.alt_column, rule.alt_weight) for rule in self.rules]
+        config += [self.combo_columns, self.combo_min, self.combo_bonus, self.whitelist_cutoff,
+                   self.whitelist_factor, self.max_score, self.high_threshold, self.medium_threshold]
+        return hashlib.sha256(repr(config).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def features(indicators):
+        """Return the FEATURE_COLUMNS booleans and the parent name for one record."""
+        details = indicators.get("details", {})
+        parent_info = details.get("parent_info", {})
+        is_whitelisted = bool(indicators.get("is_whitelisted", False))
+        has_deleted = bool(indicators.get("has_deleted_file_mapping", False))
+        row = (
+            bool(indicators.get("unnamed_process", False)),
+            bool(indicators.get("has_suspicious_memory", False)),
+            has_deleted,
+            has_deleted and len(details.get("suspicious_mappings", [])) > 0,
+            bool(indicators.get("has_transaction_handles", False)),
+            bool(indicators.get("has_section_without_file", False)),
+            bool(indicators.get("created_with_section", False)),
+            bool(indicators.get("ioc_path_match", False)),
+            bool(indicators.get("suspicious_parent", False)),
+            bool(parent_info.get("high_confidence", False)),
+            is_whitelisted,
+            is_whitelisted and indicators.get("process_name", "unknown") in BROWSER_NAMES,
+            bool(indicators.get("image_mismatch", False)),
+        )
+        return row, parent_info.get("name", "unknown")
+
+    @staticmethod
+    def feature_code(indicators):
+        """Return features() packed into an integer bit mask, plus the parent name."""
+        get = indicators.get
+        details = get("details") or {}
+        parent_info = details.get("parent_info") or {}
+        code = 0
+        if get("unnamed_process"):
+            code |= 1
+        if get("has_suspicious_memory"):
+            code |= 2
+        if get("has_deleted_file_mapping"):
+            code |= 4
+            if len(details.get("suspicious_mappings", [])) > 0:
+                code |= 8
+        if get("has_transaction_handles"):
+            code |= 16
+        if get("has_section_without_file"):
+            code |= 32
+        if get("created_with_section"):
+            code |= 64
+        if get("ioc_path_match"):
+            code |= 128
+        if get("suspicious_parent"):
+            code |= 256
+        if parent_info.get("high_confidence"):
+            code |= 512
+        if get("is_whitelisted"):
+            code |= 1024
+            if get("process_name", "unknown") in BROWSER_NAMES:
+                code |= 2048
+        if get("image_mismatch"):
+            code |= 4096
+        return code, parent_info.get("name", "unknown")
+
+    def to_codes(self, indicator_list):
+        """Pack each record's features into an integer (bit i = FEATURE_COLUMNS[i]).
+
+        Returns:
+            (codes, parent_names) where codes is an int64 array
+        """
+        self._require_numpy()
+        codes, parents = [], []
+        for indicators in indicator_list:
+            code, parent = self.feature_code(indicators)
+            codes.append(code)
+            parents.append(parent)
+        return np.fromiter(codes, dtype=np.int64, count=len(codes)), parents
+
+    def to_matrix(self, indicator_list):
+        """Convert indicator dictionaries to a boolean matrix and a list of parent names."""
+        codes, parents = self.to_codes(indicator_list)
+        return self.codes_to_matrix(codes), parents
+
+    @staticmethod
+    def codes_to_matrix(codes):
+        """Unpack integer feature codes into a boolean matrix."""
+        shifts = np.arange(len(FEATURE_COLUMNS), dtype=np.int64)
+        return ((np.asarray(codes, dtype=np.int64)[:, None] >> shifts) & 1).astype(bool)
+
+    def score(self, indicators):
+        """Score one indicator dictionary into a (level, score, reason) tuple."""
+        row, parent = self.features(indicators)
+        score = self._score_row(row)
+        return self.level_for(score), score, self._reason_template(row).format(parent=parent)
+
+    def _score_row(self, row):
+        index = self._index
+        if row[index["unnamed_process"]]:
+            return 100
+
+        score = 0
+        for rule in self.rules:
+            if row[index[rule.column]]:
+                alt = rule.alt_column is not None and row[index[rule.alt_column]]
+                score += rule.alt_weight if alt else rule.weight
+
+        if sum(1 for column in self.combo_columns if row[index[column]]) >= self.combo_min:
+            score += self.combo_bonus
+
+        if row[index["is_whitelisted"]] and score < self.whitelist_cutoff:
+            score = int(score * self.whitelist_factor)
+        return min(score, self.max_score)
+
+    def _reason_template(self, row):
+        index = self._index
+        if row[index["unnamed_process"]]:
+            return "Unnamed process - Strong Process Doppelgänging indicator"
+
+        reasons = []
+        for rule in self.rules:
+            if row[index[rule.column]]:
+                alt = rule.alt_column is not None and row[index[rule.alt_column]]
+                # Alternatives without a reason (whitelist reductions) add weight silently
+                reason = rule.alt_reason if alt else rule.reason
+                if reason:
+                    reasons.append(reason)
+
+        if sum(1 for column in self.combo_columns if row[index[column]]) >= self.combo_min:
+            reasons.append("Multiple suspicious indicators detected")
+        return "; ".join(reasons) if reasons else "Low confidence indicators detected"
+
+    def level_for(self, score):
+        """Convert a numeric score to LOW / MEDIUM / HIGH."""
+        if score >= self.high_threshold:
+            return "HIGH"
+        if score >= self.medium_threshold:
+            return "MEDIUM"
+        return "LOW"
+
+    def score_matrix(self, matrix):
+        """Score a boolean indicator matrix (rows x FEATURE_COLUMNS) in one pass.
+
+        Returns:
+            (scores, level_codes) integer arrays; level_codes index into LEVELS
+        """
+        self._require_numpy()
+        matrix = np.asarray(matrix, dtype=bool)
+        column = lambda name: matrix[:, self._index[name]]
+
+        scores = np.zeros(matrix.shape[0], dtype=np.int64)
+        for rule in self.rules:
+            weights = rule.weight
+            if rule.alt_column is not None:
+                weights = np.where(column(rule.alt_column), rule.alt_weight, rule.weight)
+            scores += column(rule.column) * weights
+
+        combo = matrix[:, [self._index[name] for name in self.combo_columns]].sum(axis=1)
+        scores += np.where(combo >= self.combo_min, self.combo_bonus, 0)
+
+        reduce = column("is_whitelisted") & (scores < self.whitelist_cutoff)
+        scores = np.where(reduce, np.floor(scores * self.whitelist_factor).astype(np.int64), scores)
+        scores = np.minimum(scores, self.max_score)
+        scores = np.where(column("unnamed_process"), 100, scores)
+
+        level_codes = np.where(scores >= self.high_threshold, 2,
+                               np.where(scores >= self.medium_threshold, 1, 0))
+        return scores, level_codes
+
+    def score_batch(self, indicator_list):
+        """Score many indicator dictionaries.
+
+        Convenience wrapper around to_codes() and score_matrix(). It is not
+        faster than calling calculate_suspicion_level per record, because
+        feature extraction dominates; keep the codes and use score_matrix()
+        to score the same records repeatedly.
+
+        Returns:
+            List of (level, score, reason) tuples, identical to calling
+            calculate_suspicion_level on each record
+        """
+        indicator_list = list(indicator_list)
+        if np is None:
+            return [self.score(indicators) for indicators in indicator_list]
+        if not indicator_list:
+            return []
+
+        codes, parents = self.to_codes(indicator_list)
+
+        # Records share a small number of feature patterns: score each distinct
+        # pattern once in a vectorized pass and fan the results back out
+        unique_codes, inverse = np.unique(codes, return_inverse=True)
+        patterns = self.codes_to_matrix(unique_codes)
+        scores, level_codes = self.score_matrix(patterns)
+        results = [
+            (LEVELS[level], score, self._reason_template(tuple(row)))
+            for level, score, row in zip(level_codes.tolist(), scores.tolist(), patterns.tolist())
+        ]
+
+        batch = []
+        for pattern, parent in zip(inverse.reshape(-1).tolist(), parents):
+            level, score, template = results[pattern]
+            batch.append((level, score, template.format(parent=parent) if "{parent}" in template else template))
+        return batch
+
+    @staticmethod
+    def _require_numpy():
+        if np is None:
+            raise RuntimeError("NumPy is required for matrix scoring (pip install numpy)")
+
+
+# Shared engine with the default weights
+DEFAULT_ENGINE = ScoringEngine()
@@ -0,0 +1,558 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Simulation module for Process Doppelgänging Detector
+----------------------------------------------------
+A deterministic synthetic Windows machine for running the scanner and the
+monitor on any platform. A seed fixes the process table, memory regions,
+mapped files, handles and creation events, so two runs with the same seed
+see exactly the same machine.
+
+Memory layouts and DLL lists are generated once per image as a few
+templates and copied per process (typed array copies), and every process
+is derived from (seed, pid) alone, so tens of thousands of processes can
+be generated in seconds in any order.
+
+The detection logic itself is not simulated: SimulatedBackend feeds the
+synthetic data to the same utils functions the Windows backend uses.
+"""
+import time
+import heapq
+import struct
+import random
+import hashlib
+import threading
+from array import array
+from collections import namedtuple
+
+from .backend import ScanBackend
+from .handles import HandleSnapshot, TRANSACTION_TYPE
+from .snapshot import ProcessRecord
+from .events import ProcessEventSource, ProcessEvent, CREATE, EXIT
+from .utils import (
+    MemoryRegionTable,
+    get_process_memory_info,
+    check_mapped_files,
+    get_process_handles,
+    PAGE_EXECUTE_READWRITE,
+    PAGE_EXECUTE_READ,
+    PAGE_READWRITE,
+    PAGE_READONLY,
+    MEM_IMAGE,
+    MEM_MAPPED,
+    MEM_PRIVATE
+)
+
+# Entry of psutil.Process.memory_maps() as read by check_mapped_files
+SimulatedMapping = namedtuple("SimulatedMapping", ["path", "rss"])
+
+SYSTEM32 = "C:\\Windows\\System32"
+USER_HOME = "C:\\Users\\user"
+
+# (image name, directory, relative frequency), roughly the mix of a desktop
+# as seen in the test_falsepositive monitor logs
+SIMULATED_IMAGES = (
+    ("svchost.exe", SYSTEM32, 30),
+    ("msedge.exe", "C:\\Program Files (x86)\\Microsoft\\Edge\\Application", 15),
+    ("conhost.exe", SYSTEM32, 12),
+    ("chrome.exe", "C:\\Program Files\\Google\\Chrome\\Application", 10),
+    ("msedgewebview2.exe", "C:\\Program Files (x86)\\Microsoft\\EdgeWebView\\Application", 8),
+    ("RuntimeBroker.exe", SYSTEM32, 6),
+    ("dllhost.exe", SYSTEM32, 6),
+    ("backgroundTaskHost.exe", SYSTEM32, 4),
+    ("SearchProtocolHost.exe", SYSTEM32, 3),
+    ("Code.exe", USER_HOME + "\\AppData\\Local\\Programs\\Microsoft VS Code", 5),
+    ("Discord.exe", USER_HOME + "\\AppData\\Local\\Discord\\app-1.0.9", 3),
+    ("cmd.exe", SYSTEM32, 4),
+    ("powershell.exe", SYSTEM32 + "\\WindowsPowerShell\\v1.0", 3),
+    ("python.exe", "C:\\Python310", 2),
+    ("notepad.exe", SYSTEM32, 1),
+    ("wmiprvse.exe", SYSTEM32 + "\\wbem", 2),
+)
+
+# Long-lived processes every simulated machine starts with: (pid, name, directory, ppid)
+SYSTEM_PROCESSES = (
+    (4, "System", "", 0),
+    (8, "services.exe", SYSTEM32, 4),
+    (12, "explorer.exe", "C:\\Windows", 4),
+)
+SERVICES_PID = 8
+EXPLORER_PID = 12
+
+_DLL_NAMES = (
+    "ntdll", "kernel32", "KernelBase", "user32", "gdi32", "gdi32full", "msvcrt", "ucrtbase",
+    "advapi32", "sechost", "rpcrt4", "combase", "ole32", "oleaut32", "shell32", "shlwapi",
+    "ws2_32", "crypt32", "bcrypt", "bcryptprimitives", "ncrypt", "wintrust", "imm32", "uxtheme",
+    "dwmapi", "version", "winmm", "dbghelp", "iphlpapi", "dnsapi", "nsi", "mswsock", "secur32",
+    "sspicli", "cfgmgr32", "setupapi", "powrprof", "profapi", "windows.storage", "wldp",
+    "msctf", "clbcatq", "propsys", "coremessaging", "d3d11", "dxgi", "d2d1", "dwrite",
+    "mfplat", "winhttp", "wininet", "urlmon", "netapi32", "userenv", "wtsapi32", "cryptbase",
+)
+# Shared DLLs mapped by most processes: real names plus API set style fillers
+COMMON_DLLS = tuple(f"{SYSTEM32}\\{name}.dll" for name in _DLL_NAMES) + tuple(
+    f"{SYSTEM32}\\api-ms-win-core-{index:03d}-l1-1-0.dll" for index in range(240))
+
+# Process profiles and the indicators they produce
+BENIGN = "benign"
+RWX_IMAGE = "rwx_image"              # writable and executable image section
+DELETED_MAPPING = "deleted_mapping"  # maps a file that no longer exists
+TRANSACTED = "transacted"            # TmTx handle, RWX image section, missing mapped file and
+                                     # an image in memory that differs from the file on disk
+UNNAMED = "unnamed"                  # process without a name
+MALICIOUS_PROFILES = (RWX_IMAGE, DELETED_MAPPING, TRANSACTED, UNNAMED)
+
+# Memory layout variants generated per image
+TEMPLATE_VARIANTS = 4
+
+# Command lines that exercise the parent command line matcher
+_SUSPICIOUS_ARGS = (["-enc", "SQBFAFgA"], ["-w", "hidden", "-nop"], ["-ExecutionPolicy", "Bypass"])
+
+# Fixed epoch of the initial process table, so creation times are reproducible
+DEFAULT_BOOT_TIME = 1700000000.0
+
+# Synthetic PE32+ headers: e_lfanew, OptionalHeader offset, preferred ImageBase, SizeOfHeaders
+_PE_OFFSET = 0x80
+_PE_OPTIONAL = _PE_OFFSET + 24
+_PE_IMAGE_BASE = 0x140000000
+_PE_SIZE_OF_HEADERS = 0x400
+
+
+def _pe_headers(key, image_base=_PE_IMAGE_BASE):
+    """Return SizeOfHeaders bytes of synthetic PE32+ headers derived from key."""
+    header = bytearray(hashlib.sha256(key.encode("utf-8")).digest() * (_PE_SIZE_OF_HEADERS // 32))
+    header[0:2] = b"MZ"
+    struct.pack_into("<I", header, 0x3C, _PE_OFFSET)
+    header[_PE_OFFSET:_PE_OFFSET + 4] = b"PE\0\0"
+    struct.pack_into("<H", header, _PE_OPTIONAL, 0x20b)
+    struct.pack_into("<Q", header, _PE_OPTIONAL + 24, image_base)
+    struct.pack_into("<I", header, _PE_OPTIONAL + 60, _PE_SIZE_OF_HEADERS)
+    return bytes(header)
+
+
+class SimulatedProcess:
+    """One synthetic process; memory and mappings are generated on demand."""
+    __slots__ = ("pid", "name", "exe", "cmdline", "username", "create_time", "ppid",
+                 "profile", "image", "variant", "exit_time")
+
+    def __init__(self, pid, name, exe, cmdline, username, create_time, ppid, profile, image, variant):
+        self.pid = pid
+        self.name = name
+        self.exe = exe
+        self.cmdline = cmdline
+        self.username = username
+        self.create_time = create_time
+        self.ppid = ppid
+        self.profile = profile
+        self.image = image
+        self.variant = variant
+        self.exit_time = None
+
+    def record(self):
+        """Return the process as a ProcessRecord."""
+        return ProcessRecord(self.pid, self.name, self.exe, list(self.cmdline), self.username,
+                             self.create_time, self.ppid)
+
+
+class SimulatedSystem:
+    """Deterministic synthetic process table with memory, mappings and handles."""
+
+    def __init__(self, processes=1000, seed=0, malicious_rate=0.01, regions=(200, 1200),
+                 mappings=(40, 160), boot_time=DEFAULT_BOOT_TIME):
+        """Generate the initial process table.
+
+        Args:
+            processes: Number of processes besides the fixed system processes
+            seed: Seed every generated value derives from
+            malicious_rate: Fraction of processes given one of MALICIOUS_PROFILES
+            regions: (min, max) committed memory regions per process
+            mappings: (min, max) mapped files per process
+            boot_time: Creation time of the oldest process
+        """
+        self.seed = seed
+        self.malicious_rate = malicious_rate
+        self.region_range = regions
+        self.mapping_range = mappings
+        self.boot_time = boot_time
+        self.processes = {}
+        # Exited processes stay available to find(); PIDs are never reused
+        self.exited = {}
+        self.files = set(COMMON_DLLS)
+        self._templates = {}
+        self._lock = threading.Lock()
+
+        self._weights = []
+        total = 0
+        for name, directory, weight in SIMULATED_IMAGES:
+            total += weight
+            self._weights.append(total)
+            self.files.add(f"{directory}\\{name}")
+
+        for pid, name, directory, ppid in SYSTEM_PROCESSES:
+            exe = f"{directory}\\{name}" if directory else ""
+            self.processes[pid] = SimulatedProcess(pid, name, exe, [exe] if exe else [], "NT AUTHORITY\\SYSTEM",
+                                                   boot_time, ppid, BENIGN, None, 0)
+        self._next_pid = SYSTEM_PROCESSES[-1][0] + 4
+
+        # Initial processes start one second apart, oldest first, so parents
+        # are always older than their children
+        for index in range(processes):
+            self._create(self._next_pid, boot_time + 1.0 + index)
+            self._next_pid += 4
+
+        # Build every memory layout up front so scans only measure copying them
+        for image in [None] + list(range(len(SIMULATED_IMAGES))):
+            for variant in range(TEMPLATE_VARIANTS):
+                self._template(image, variant)
+
+    def _rng(self, *parts):
+        # Derived from the seed and stable identifiers only, never from generation order
+        value = self.seed
+        for part in parts:
+            value = (value * 1000003 + part) & 0xFFFFFFFFFFFF
+        return random.Random(value)
+
+    def _create(self, pid, create_time, name=None):
+        rng = self._rng(1, pid)
+        if name is not None:
+            image = next((i for i, entry in enumerate(SIMULATED_IMAGES) if entry[0] == name), None)
+        else:
+            image = self._pick_image(rng.random())
+        if image is not None:
+            name, directory, _ = SIMULATED_IMAGES[image]
+            exe = f"{directory}\\{name}"
+        else:
+            directory = f"{USER_HOME}\\AppData\\Local\\Temp"
+            exe = f"{directory}\\{name}"
+
+        profile = BENIGN
+        if rng.random() < self.malicious_rate:
+            profile = MALICIOUS_PROFILES[rng.randrange(len(MALICIOUS_PROFILES))]
+
+        cmdline = [exe]
+        if name == "powershell.exe" and rng.random() < 0.3:
+            cmdline += _SUSPICIOUS_ARGS[rng.randrange(len(_SUSPICIOUS_ARGS))]
+
+        # Services hang off services.exe, everything else off explorer.exe or an older process
+        if directory == SYSTEM32 and name in ("svchost.exe", "dllhost.exe", "wmiprvse.exe"):
+            ppid = SERVICES_PID
+        elif rng.random() < 0.7 or pid <= EXPLORER_PID + 4:
+            ppid = EXPLORER_PID
+        else:
+            ppid = 4 * rng.randrange(4, pid // 4)
+            if ppid not in self.processes:
+                ppid = EXPLORER_PID
+
+        username = "NT AUTHORITY\\SYSTEM" if ppid == SERVICES_PID else "DESKTOP\\user"
+        process = SimulatedProcess(pid, "" if profile == UNNAMED else name, exe, cmdline, username,
+                                   create_time, ppid, profile, image, rng.randrange(TEMPLATE_VARIANTS))
+        self.processes[pid] = process
+        return process
+
+    def _pick_image(self, value):
+        target = value * self._weights[-1]
+        for index, bound in enumerate(self._weights):
+            if target < bound:
+                return index
+        return len(self._weights) - 1
+
+    def __len__(self):
+        return len(self.processes)
+
+    def get(self, pid):
+        """Return the live SimulatedProcess for a PID, or None."""
+        return self.processes.get(pid)
+
+    def find(self, pid):
+        """Return the SimulatedProcess for a PID whether it is running or has exited."""
+        return self.processes.get(pid) or self.exited.get(pid)
+
+    def spawn(self, name=None, create_time=None):
+        """Start a new process (next PID) and return it.
+
+        Args:
+            name: Image name from SIMULATED_IMAGES, or None for a random one
+            create_time: Creation time; defaults to now
+        """
+        with self._lock:
+            pid = self._next_pid
+            self._next_pid += 4
+            return self._create(pid, time.time() if create_time is None else create_time, name)
+
+    def exit(self, pid):
+        """Terminate a process; returns True if it was running."""
+        with self._lock:
+            process = self.processes.pop(pid, None)
+            if process is None:
+                return False
+            process.exit_time = time.time()
+            self.exited[pid] = process
+            return True
+
+    def _template(self, image, variant):
+        """Return (regions, mappings) shared by every process of one image variant."""
+        key = (image, variant)
+        template = self._templates.get(key)
+        if template is not None:
+            return template
+
+        rng = self._rng(2, -1 if image is None else image, variant)
+        regions = MemoryRegionTable()
+        append = regions.append
+        address = 0x10000
+        for _ in range(rng.randint(*self.region_range)):
+            size = 0x1000 * rng.choice((1, 1, 2, 4, 16, 64, 256))
+            kind = rng.random()
+            if kind < 0.45:
+                region_type = MEM_IMAGE
+                protect = PAGE_EXECUTE_READ if rng.random() < 0.4 else PAGE_READONLY
+            elif kind < 0.8:
+                region_type = MEM_PRIVATE
+                protect = PAGE_READWRITE if rng.random() < 0.85 else PAGE_READONLY
+            else:
+                region_type = MEM_MAPPED
+                protect = PAGE_READONLY
+            append(address, size, protect, region_type, address)
+            address += size + 0x1000 * rng.randint(0, 16)
+
+        exe = None
+        if image is not None:
+            name, directory, _ = SIMULATED_IMAGES[image]
+            exe = f"{directory}\\{name}"
+        count = min(rng.randint(*self.mapping_range), len(COMMON_DLLS))
+        paths = ([exe] if exe else []) + rng.sample(COMMON_DLLS, count)
+        mappings = tuple(SimulatedMapping(path, 0x1000 * rng.randint(4, 2048)) for path in paths)
+
+        template = (regions, mappings)
+        with self._lock:
+            return self._templates.setdefault(key, template)
+
+    def regions(self, pid):
+        """Return a MemoryRegionTable for a process (empty if it is not running)."""
+        table = MemoryRegionTable()
+        process = self.processes.get(pid)
+        if process is None:
+            return table
+        template, _ = self._template(process.image, process.variant)
+        table.base = array('Q', template.base)
+        table.size = array('Q', template.size)
+        table.protect = array('I', template.protect)
+        table.type = array('I', template.type)
+        table.allocation_base = array('Q', template.allocation_base)
+
+        if process.profile in (RWX_IMAGE, TRANSACTED):
+            # Image section remapped writable and executable
+            base = 0x7FF000000000 + (pid << 16)
+            table.append(base, 0x20000, PAGE_EXECUTE_READWRITE, MEM_IMAGE, base)
+        return table
+
+    def mappings(self, pid):
+        """Return memory_maps()-style mapped files of a process (empty if it is not running)."""
+        process = self.processes.get(pid)
+        if process is None:
+            return []
+        _, template = self._template(process.image, process.variant)
+        mappings = list(template)
+        if process.profile in (DELETED_MAPPING, TRANSACTED):
+            # The transacted or overwritten file is gone from disk
+            mappings.append(SimulatedMapping(f"{USER_HOME}\\AppData\\Local\\Temp\\{pid:x}.tmp", 0x40000))
+        return mappings
+
+    def handle_snapshot(self):
+        """Return a HandleSnapshot with a TmTx handle for every running transacted process."""
+        index = {}
+        for pid, process in list(self.processes.items()):
+            if process.profile == TRANSACTED:
+                index[pid] = {TRANSACTION_TYPE: [(0x1A4, 0x12019F)]}
+        return HandleSnapshot(index)
+
+    def file_exists(self, path):
+        """Return whether a path exists on the simulated disk."""
+        return path in self.files
+
+    def file_header(self, path, size):
+        """Return the first size bytes of a file on the simulated disk.
+
+        Raises:
+            FileNotFoundError: If the file does not exist
+        """
+        if path not in self.files:
+            raise FileNotFoundError(path)
+        return (_pe_headers(path) + bytes(size))[:size]
+
+    def image_header(self, pid, size):
+        """Return the first size bytes of a process's mapped main image, or None.
+
+        The image is relocated to a per-process base; a transacted process
+        runs a payload whose headers differ from the file on disk.
+        """
+        process = self.processes.get(pid)
+        if process is None or not process.exe:
+            return None
+        key = f"{process.exe}|payload" if process.profile == TRANSACTED else process.exe
+        return (_pe_headers(key, 0x7FF600000000 + (pid << 16)) + bytes(size))[:size]
+
+    def profile_counts(self):
+        """Return the number of running processes per profile."""
+        counts = {}
+        for process in list(self.processes.values()):
+            counts[process.profile] = counts.get(process.profile, 0) + 1
+        return counts
+
+
+class SimulatedBackend(ScanBackend):
+    """Scan backend reading a SimulatedSystem instead of the operating system.
+
+    Memory is readable whatever the admin flag says; handle checks still
+    follow it, as on Windows.
+    """
+
+    name = "simulated"
+    supports_handles = True
+
+    def __init__(self, system):
+        self.system = system
+
+    def snapshot_processes(self):
+        return [process.record() for process in list(self.system.processes.values())]
+
+    def read_process(self, pid):
+        process = self.system.get(pid)
+        return process.record() if process is not None else None
+
+    def capture_handles(self):
+        return self.system.handle_snapshot()
+
+    def path_exists(self, path):
+        return self.system.file_exists(path)
+
+    def open_process(self, pid):
+        return pid if pid in self.system.processes else None
+
+    def walk_memory(self, pid, admin=False):
+        return self.system.regions(pid)
+
+    def memory_maps(self, pid, regions=None):
+        return self.system.mappings(pid)
+
+    def suspicious_memory(self, pid, admin=False, regions=None):
+        if regions is None:
+            regions = self.system.regions(pid)
+        return get_process_memory_info(pid, admin, regions)
+
+    def check_mapped_files(self, pid, admin=False, maps=None, path_cache=None):
+        if maps is None:
+            maps = self.system.mappings(pid)
+        if path_cache is None:
+            path_cache = _FileSet(self.system)
+        return check_mapped_files(pid, admin, maps, path_cache)
+
+    def get_handles(self, pid, admin=False, regions=None, handle_snapshot=None):
+        if regions is None:
+            regions = self.system.regions(pid)
+        return get_process_handles(pid, admin, regions, handle_snapshot)
+
+    def file_identity(self, path):
+        if not self.system.file_exists(path):
+            raise FileNotFoundError(path)
+        return f"sim:{path}"
+
+    def read_file_header(self, path, size):
+        return self.system.file_header(path, size)
+
+    def read_image_header(self, pid, size, regions=None):
+        return self.system.image_header(pid, size)
+
+
+class _FileSet:
+    """prefetch() over the simulated disk, used when no path cache is given."""
+
+    def __init__(self, system):
+        self.system = system
+
+    def prefetch(self, paths):
+        return {path: self.system.file_exists(path) for path in set(paths)}
+
+
+class SimulatedEventSource(ProcessEventSource):
+    """Creation and exit events of processes spawned at a fixed rate in a SimulatedSystem.
+
+    Arrivals are evenly spaced at `rate` per second; a `short_lived`
+    fraction of processes exits after `short_lifetime` seconds, the rest
+    after `lifetime` seconds. Lifetimes and images come from the seed, so a
+    run with the same arguments spawns the same processes.
+    """
+
+    name = "simulated"
+
+    def __init__(self, system, rate=100.0, count=None, short_lived=0.2,
+                 short_lifetime=(0.01, 0.5), lifetime=(30.0, 120.0), seed=None):
+        """Initialize the source.
+
+        Args:
+            system: SimulatedSystem the processes are started in
+            rate: Process creations per second
+            count: Stop after this many creations (None = unlimited)
+            short_lived: Fraction of processes that exit almost immediately
+            short_lifetime: (min, max) lifetime of short-lived processes in seconds
+            lifetime: (min, max) lifetime of the other processes in seconds
+            seed: Seed of lifetimes (the system's seed if omitted)
+        """
+        super().__init__()
+        self.system = system
+        self.rate = rate
+        self.count = count
+        self.short_lived = short_lived
+        self.short_lifetime = short_lifetime
+        self.lifetime = lifetime
+        self.spawned = 0
+        self.exited = 0
+        self.exhausted = False
+        self.lifetimes = {}
+        self._rng = random.Random(system.seed if seed is None else seed)
+        self._exits = []
+        self._start = None
+
+    def open(self):
+        self._start = time.monotonic()
+        self.spawned = 0
+        self.exhausted = False
+
+    def _spawn(self, now):
+        process = self.system.spawn()
+        if self._rng.random() < self.short_lived:
+            lifetime = self._rng.uniform(*self.short_lifetime)
+        else:
+            lifetime = self._rng.uniform(*self.lifetime)
+        self.lifetimes[process.pid] = lifetime
+        heapq.heappush(self._exits, (now + lifetime, process.pid))
+        self.spawned += 1
+        return ProcessEvent(CREATE, process.pid, process.name, process.create_time, process.ppid)
+
+    def poll(self, timeout=1.0):
+        events = []
+        deadline = time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            finished = self.count is not None and self.spawned >= self.count
+            next_spawn = None if finished else self._start + self.spawned / self.rate
+            if next_spawn is not None and next_spawn <= now:
+                events.append(self._spawn(now))
+            elif self._exits and self._exits[0][0] <= now:
+                _, pid = heapq.heappop(self._exits)
+                if self.system.exit(pid):
+                    self.exited += 1
+                    events.append(ProcessEvent(EXIT, pid))
+            else:
+                if finished and not self._exits:
+                    self.exhausted = True
+                if events or now >= deadline:
+                    return events
+                wake = min(t for t in (next_spawn, self._exits[0][0] if self._exits else None, deadline)
+                           if t is not None)
+                time.sleep(max(0.0, wake - now))
+                continue
+            if len(events) >= 1000:
+                return events
+
+    def close(self):
+        self._exits = []
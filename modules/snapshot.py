@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Snapshot module for Process Doppelgänging Detector
+--------------------------------------------------
+Holds a compact, per-cycle table of process attributes so the individual
+checks read from memory instead of issuing their own psutil lookups.
+"""
+import psutil
+
+# Attributes collected for every process in a single enumeration pass
+SNAPSHOT_ATTRS = ['pid', 'name', 'exe', 'cmdline', 'username', 'create_time', 'ppid']
+
+
+class ProcessRecord:
+    """Attributes of one process captured at snapshot time.
+
+    Attributes that could not be read (access denied, zombie) are None.
+    """
+    __slots__ = ('pid', 'name', 'exe', 'cmdline', 'username', 'create_time', 'ppid')
+
+    def __init__(self, pid, name=None, exe=None, cmdline=None, username=None, create_time=None, ppid=None):
+        self.pid = pid
+        self.name = name
+        self.exe = exe
+        self.cmdline = cmdline
+        self.username = username
+        self.create_time = create_time
+        self.ppid = ppid
+
+    @classmethod
+    def from_info(cls, info):
+        """Build a record from a psutil ``info``/``as_dict`` dictionary."""
+        return cls(
+            info.get('pid'),
+            info.get('name'),
+            info.get('exe'),
+            info.get('cmdline'),
+            info.get('username'),
+            info.get('create_time'),
+            info.get('ppid')
+        )
+
+    @property
+    def key(self):
+        """Identity of the process that survives PID reuse."""
+        return (self.pid, self.create_time)
+
+    def __repr__(self):
+        return f"ProcessRecord(pid={self.pid}, name={self.name!r})"
+
+
+def snapshot_records():
+    """Enumerate every process once with psutil and return ProcessRecord objects."""
+    return [
+        ProcessRecord.from_info(proc.info)
+        for proc in psutil.process_iter(attrs=SNAPSHOT_ATTRS, ad_value=None)
+    ]
+
+
+def read_process_record(pid):
+    """Read one process with a single oneshot() pass.
+
+    Returns the record, or None if the process no longer exists.
+    """
+    try:
+        process = psutil.Process(pid)
+        with process.oneshot():
+            info = process.as_dict(attrs=SNAPSHOT_ATTRS, ad_value=None)
+    except (psutil.NoSuchProcess, psutil.ZombieProcess):
+        return None
+    return ProcessRecord.from_info(info)
+
+
+class ProcessTable:
+    """PID-indexed table of ProcessRecord objects for one scan cycle.
+
+    Processes are read through source (an object with snapshot_processes()
+    and read_process(pid), such as a scan backend), or psutil if omitted.
+    """
+
+    def __init__(self, records=None, source=None):
+        self.source = source
+        self._records = {}
+        for record in records or ():
+            self._records[record.pid] = record
+
+    @classmethod
+    def take_snapshot(cls, source=None):
+        """Enumerate every process once and return the populated table."""
+        records = source.snapshot_processes() if source is not None else snapshot_records()
+        return cls(records, source)
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, pid):
+        return pid in self._records
+
+    def pids(self):
+        """Return the PIDs in the table in ascending order."""
+        return sorted(self._records)
+
+    def keys(self):
+        """Return the set of (pid, create_time) identities in the table."""
+        return {record.key for record in self._records.values()}
+
+    def get(self, pid):
+        """Return the cached record for a PID, or None."""
+        return self._records.get(pid)
+
+    def refresh(self, pid):
+        """Re-read a single process with oneshot() and update the table.
+
+        Returns the new record, or None if the process no longer exists.
+        """
+        if self.source is not None:
+            record = self.source.read_process(pid)
+        else:
+            record = read_process_record(pid)
+        if record is None:
+            self._records.pop(pid, None)
+            return None
+
+        self._records[pid] = record
+        return record
+
+    def lookup(self, pid, not_after=None):
+        """Return the record for a PID, reading it on demand if it is missing.
+
+        Args:
+            pid: Process ID to look up
+            not_after: If given, a cached record created later than this
+                       timestamp belongs to a reused PID and is re-read
+        """
+        record = self._records.get(pid)
+        if record is None or self._is_newer(record, not_after):
+            record = self.refresh(pid)
+            # Still newer after a re-read: the original process is gone
+            if record is not None and self._is_newer(record, not_after):
+                return None
+        return record
+
+    @staticmethod
+    def _is_newer(record, not_after):
+        return not_after is not None and bool(record.create_time) and record.create_time > not_after
+
+    def discard(self, pid):
+        """Forget a process, e.g. after it has exited."""
+        self._records.pop(pid, None)
@@ -11,12 +11,22 @@ import sys
 import json
 import psutil
 import struct
-import winreg
 import subprocess
 import random
-from ctypes import wintypes, windll, byref, c_void_p, c_buffer, sizeof, POINTER, WinError
+from array import array
+from ctypes import wintypes, byref, c_void_p, c_buffer, sizeof, POINTER
 from datetime import datetime
 
+from .scoring import DEFAULT_ENGINE
+
+try:
+    import winreg
+    from ctypes import windll, WinError
+except ImportError:  # Not Windows: only the /proc scanning backend is available
+    winreg = None
+    windll = None
+    WinError = OSError
+
 # Windows-specific constants and structures
 PROCESS_QUERY_INFORMATION = 0x0400
 PROCESS_VM_READ = 0x0010
@@ -25,17 +35,25 @@ PROCESS_ALL_ACCESS = 0x1F0FFF
 # Memory Protection Constants
 PAGE_EXECUTE_READWRITE = 0x40
 PAGE_EXECUTE_READ = 0x20
+PAGE_EXECUTE = 0x10
 PAGE_READONLY = 0x02
 PAGE_READWRITE = 0x04
+PAGE_NOACCESS = 0x01
 
 # Section flags
 SEC_IMAGE = 0x1000000
 
+# Memory state and type constants
+MEM_COMMIT = 0x1000
+MEM_IMAGE = 0x1000000
+MEM_MAPPED = 0x40000
+MEM_PRIVATE = 0x20000
+
 # NT API status codes
 STATUS_SUCCESS = 0
 
 # Native API functions for deeper inspection when admin rights available
-ntdll = windll.ntdll
+ntdll = windll.ntdll if windll is not None else None
 
 # Process information structures
 class PROCESS_BASIC_INFORMATION(ctypes.Structure):
@@ -62,14 +80,18 @@ class MEMORY_BASIC_INFORMATION(ctypes.Structure):
     ]
 
 def is_admin():
-    """Check if the process has administrator privileges"""
+    """Check if the process has administrator privileges (root outside Windows)"""
     try:
+        if os.name != 'nt':
+            return os.geteuid() == 0
         return ctypes.windll.shell32.IsUserAnAdmin() != 0
     except:
         return False
 
 def create_stealth_console():
     """Hide console window for stealth operation"""
+    if windll is None:
+        return
     hwnd = ctypes.windll.kernel32.GetConsoleWindow()
     if hwnd != 0:
         ctypes.windll.user32.ShowWindow(hwnd, 0)  # SW_HIDE = 0
@@ -86,104 +108,242 @@ def close_handle(handle):
     if handle:
         ctypes.windll.kernel32.CloseHandle(handle)
 
-def get_process_memory_info(pid, admin=False):
-    """Get detailed memory information for a process"""
-    memory_regions = []
+class MemoryRegionTable:
+    """Committed memory regions of one process stored in parallel typed arrays.
+    
+    Filled by a single VirtualQueryEx walk; dictionaries are only built for
+    the regions that end up in a report.
+    """
+    __slots__ = ("base", "size", "protect", "type", "allocation_base")
+    
+    def __init__(self):
+        self.base = array('Q')
+        self.size = array('Q')
+        self.protect = array('I')
+        self.type = array('I')
+        self.allocation_base = array('Q')
+    
+    def __len__(self):
+        return len(self.base)
+    
+    def append(self, base, size, protect, region_type, allocation_base):
+        """Add one region."""
+        self.base.append(base)
+        self.size.append(size)
+        self.protect.append(protect)
+        self.type.append(region_type)
+        self.allocation_base.append(allocation_base)
+    
+    def rwx_indices(self, region_type=None):
+        """Return indices of PAGE_EXECUTE_READWRITE regions, optionally of one type."""
+        protect, types = self.protect, self.type
+        return [i for i in range(len(protect))
+                if protect[i] == PAGE_EXECUTE_READWRITE and (region_type is None or types[i] == region_type)]
+    
+    def region_info(self, index):
+        """Build the report dictionary for one region."""
+        return {
+            "BaseAddress": hex(self.base[index]),
+            "AllocationBase": hex(self.allocation_base[index]),
+            "RegionSize": self.size[index],
+            "Protection": self.protect[index],
+            "Type": "Image" if self.type[index] == MEM_IMAGE else hex(self.type[index])
+        }
+
+_virtual_query_ex = None
+
+def _get_virtual_query_ex():
+    """Return VirtualQueryEx with argument types set for 64-bit addresses."""
+    global _virtual_query_ex
+    if _virtual_query_ex is None:
+        func = ctypes.windll.kernel32.VirtualQueryEx
+        func.argtypes = [wintypes.HANDLE, wintypes.LPCVOID, POINTER(MEMORY_BASIC_INFORMATION), ctypes.c_size_t]
+        func.restype = ctypes.c_size_t
+        _virtual_query_ex = func
+    return _virtual_query_ex
+
+def walk_process_memory(pid, admin=False):
+    """Walk the address space of a process once and return a MemoryRegionTable.
+    
+    Only committed regions are kept. Returns an empty table without admin rights
+    or if the process cannot be opened.
+    """
+    table = MemoryRegionTable()
     
     # Skip if we don't have admin rights for detailed analysis
     if not admin:
-        return memory_regions
+        return table
+    
+    process_handle = open_process(pid, PROCESS_QUERY_INFORMATION | PROCESS_VM_READ)
+    if not process_handle:
+        return table
     
     try:
-        # Open the process with required access
-        process_handle = open_process(pid, PROCESS_QUERY_INFORMATION | PROCESS_VM_READ)
-        if not process_handle:
-            return memory_regions
-            
-        # Prepare for memory enumeration
+        virtual_query_ex = _get_virtual_query_ex()
         mbi = MEMORY_BASIC_INFORMATION()
+        mbi_ref = byref(mbi)
+        mbi_size = sizeof(mbi)
+        append = table.append
         address = 0
         
-        # Enumerate memory regions
-        while True:
-            result = ctypes.windll.kernel32.VirtualQueryEx(
-                process_handle, 
-                address, 
-                byref(mbi), 
-                sizeof(mbi)
-            )
-            
-            if result == 0:
-                break
-                
-            # Analyze the memory region
-            if mbi.Type & 0x1000000:  # MEM_IMAGE
-                region_info = {
-                    "BaseAddress": hex(mbi.BaseAddress),
-                    "AllocationBase": hex(mbi.AllocationBase),
-                    "RegionSize": mbi.RegionSize,
-                    "Protection": mbi.Protect,
-                    "Type": "Image",
-                    "Suspicious": False
-                }
-                
-                # Check for suspicious protection flags or section types
-                if mbi.Protect == PAGE_EXECUTE_READWRITE:
-                    region_info["Suspicious"] = True
-                    region_info["Reason"] = "Executable and writable memory (PAGE_EXECUTE_READWRITE)"
-                
-                memory_regions.append(region_info)
-            
-            # Move to next region
-            address = mbi.BaseAddress + mbi.RegionSize
-        
-        # Clean up
+        while virtual_query_ex(process_handle, address, mbi_ref, mbi_size):
+            base = mbi.BaseAddress or 0
+            if mbi.State == MEM_COMMIT:
+                append(base, mbi.RegionSize, mbi.Protect, mbi.Type, mbi.AllocationBase or 0)
+            address = base + mbi.RegionSize
+    except Exception:
+        pass
+    finally:
         close_handle(process_handle)
+    
+    return table
+
+_read_process_memory = None
+
+def _get_read_process_memory():
+    """Return ReadProcessMemory and NtQueryInformationProcess with argument types set."""
+    global _read_process_memory
+    if _read_process_memory is None:
+        read = ctypes.windll.kernel32.ReadProcessMemory
+        read.argtypes = [wintypes.HANDLE, wintypes.LPCVOID, wintypes.LPVOID, ctypes.c_size_t,
+                         POINTER(ctypes.c_size_t)]
+        read.restype = wintypes.BOOL
+        query = ctypes.windll.ntdll.NtQueryInformationProcess
+        query.argtypes = [wintypes.HANDLE, wintypes.DWORD, wintypes.LPVOID, wintypes.DWORD, POINTER(wintypes.DWORD)]
+        query.restype = wintypes.LONG
+        _read_process_memory = (read, query)
+    return _read_process_memory
+
+def read_image_header(pid, size=4096):
+    """Read the first bytes of a process's main image from its memory.
+    
+    The image base is PEB.ImageBaseAddress, found through
+    NtQueryInformationProcess(ProcessBasicInformation).
+    
+    Returns:
+        bytes (possibly fewer than size), or None if the memory cannot be read
+    """
+    process_handle = open_process(pid, PROCESS_QUERY_INFORMATION | PROCESS_VM_READ)
+    if not process_handle:
+        return None
+    
+    try:
+        read, query = _get_read_process_memory()
+        pbi = PROCESS_BASIC_INFORMATION()
+        if query(process_handle, 0, byref(pbi), sizeof(pbi), None) != STATUS_SUCCESS or not pbi.PebBaseAddress:
+            return None
         
-    except Exception as e:
-        pass
+        # PEB.ImageBaseAddress is at offset 0x10 in a 64-bit PEB, 0x08 in a 32-bit one
+        image_base = c_void_p()
+        done = ctypes.c_size_t(0)
+        peb_offset = 0x10 if sizeof(c_void_p) == 8 else 0x08
+        if not read(process_handle, pbi.PebBaseAddress + peb_offset, byref(image_base), sizeof(image_base),
+                    byref(done)) or not image_base.value:
+            return None
         
+        buffer = ctypes.create_string_buffer(size)
+        if not read(process_handle, image_base.value, buffer, size, byref(done)):
+            return None
+        return buffer.raw[:done.value]
+    except Exception:
+        return None
+    finally:
+        close_handle(process_handle)
+
+def get_process_memory_info(pid, admin=False, regions=None):
+    """Get suspicious image memory regions for a process
+    
+    Args:
+        pid: Process ID
+        admin: Whether admin rights are available
+        regions: MemoryRegionTable from walk_process_memory (walked here if omitted)
+    
+    Returns:
+        List of region dictionaries for RWX MEM_IMAGE regions
+    """
+    if regions is None:
+        regions = walk_process_memory(pid, admin)
+    
+    memory_regions = []
+    for index in regions.rwx_indices(MEM_IMAGE):
+        region_info = regions.region_info(index)
+        region_info["Suspicious"] = True
+        region_info["Reason"] = "Executable and writable memory (PAGE_EXECUTE_READWRITE)"
+        memory_regions.append(region_info)
+    
     return memory_regions
 
-def check_mapped_files(pid, admin=False):
-    """Check for mapped files that might be suspicious"""
+def get_memory_region_counts(pid, admin=False, regions=None):
+    """Count committed memory regions and RWX regions of a process.
+    
+    Returns:
+        Tuple (region_count, rwx_region_count); (0, 0) without admin rights
+    """
+    if regions is None:
+        regions = walk_process_memory(pid, admin)
+    return len(regions), len(regions.rwx_indices())
+
+def get_memory_maps(pid):
+    """Return the memory-mapped files of a process, or an empty list if unavailable."""
+    try:
+        return psutil.Process(pid).memory_maps()
+    except Exception:
+        # Memory maps might not be available without admin rights
+        return []
+
+def check_mapped_files(pid, admin=False, maps=None, path_cache=None):
+    """Check for mapped files that might be suspicious
+    
+    Args:
+        pid: Process ID
+        admin: Whether admin rights are available
+        maps: Result of get_memory_maps (read here if omitted)
+        path_cache: PathStatusCache shared across processes (plain os.path.exists if omitted)
+    """
     suspicious_mappings = []
     
     try:
-        process = psutil.Process(pid)
+        if maps is None:
+            maps = get_memory_maps(pid)
         
-        # Get memory maps if available
-        try:
-            maps = process.memory_maps()
-            for m in maps:
-                mapping = {
+        # Stat each distinct path once for the whole batch of mappings
+        candidates = [m.path for m in maps if m.path and m.path != "[anon]"]
+        if path_cache is not None:
+            path_exists = path_cache.prefetch(candidates)
+        else:
+            path_exists = {path: os.path.exists(path) for path in set(candidates)}
+        
+        for m in maps:
+            # Check for deleted files (often indicator of doppelgänging)
+            if "(deleted)" in m.path or "pagefile.sys" in m.path.lower():
+                suspicious_mappings.append({
                     "path": m.path,
                     "rss": m.rss,
-                    "suspicious": False
-                }
-                
-                # Check for deleted files (often indicator of doppelgänging)
-                if "(deleted)" in m.path or "pagefile.sys" in m.path.lower():
-                    mapping["suspicious"] = True
-                    mapping["reason"] = "Mapped from deleted file or pagefile"
-                    suspicious_mappings.append(mapping)
-                
-                # Check for non-existing paths that are still mapped
-                if m.path and m.path != "[anon]" and not os.path.exists(m.path):
-                    mapping["suspicious"] = True
-                    mapping["reason"] = "Mapped file does not exist on disk"
-                    suspicious_mappings.append(mapping)
-        except:
-            # Memory maps might not be available without admin rights
-            pass
+                    "suspicious": True,
+                    "reason": "Mapped from deleted file or pagefile"
+                })
+            
+            # Check for non-existing paths that are still mapped
+            if m.path and m.path != "[anon]" and not path_exists[m.path]:
+                suspicious_mappings.append({
+                    "path": m.path,
+                    "rss": m.rss,
+                    "suspicious": True,
+                    "reason": "Mapped file does not exist on disk"
+                })
     except:
         pass
         
     return suspicious_mappings
 
-def get_process_handles(pid, admin=False):
+def get_process_handles(pid, admin=False, regions=None, handle_snapshot=None):
     """Get open handles of a process that might indicate transactional NTFS usage
     Uses native Windows API instead of relying on handle.exe
+    
+    Args:
+        regions: MemoryRegionTable from walk_process_memory, so the address
+                 space is not walked a second time
+        handle_snapshot: HandleSnapshot of the system handle table for this scan cycle
     """
     handles = []
     
@@ -192,22 +352,15 @@ def get_process_handles(pid, admin=False):
         return handles
     
     try:
-        # Get the process handle with necessary access
-        process_handle = open_process(pid, PROCESS_QUERY_INFORMATION)
-        if not process_handle:
-            return handles
-        
-        # Since this is a simplified version without direct handle enumeration,
-        # we'll use other indicators to infer transaction usage
+        # Transaction (TmTx) handles come straight from the system handle table
+        if handle_snapshot is not None:
+            for handle, access in handle_snapshot.handles_for(pid, "TmTx"):
+                handles.append(f"TmTx handle 0x{handle:x} (access 0x{access:x})")
         
-        # Check if the process has unusual section objects (inferred)
-        memory_regions = get_process_memory_info(pid, admin)
-        for region in memory_regions:
-            if region.get("Type", "") == "Image" and region.get("Suspicious", False):
-                handles.append(f"Section object at {region.get('BaseAddress', 'unknown')} - {region.get('Reason', 'unknown')}")
-        
-        # Close the handle
-        close_handle(process_handle)
+        # Section objects without a backing file are inferred from RWX image regions;
+        # the handle table alone cannot tell file-backed sections apart
+        for region in get_process_memory_info(pid, admin, regions):
+            handles.append(f"Section object at {region.get('BaseAddress', 'unknown')} - {region.get('Reason', 'unknown')}")
         
     except Exception as e:
         pass
@@ -226,100 +379,24 @@ def save_to_json(data, filepath):
 def calculate_suspicion_level(indicators):
     """Calculate a suspicion level (LOW, MEDIUM, HIGH) based on the indicators found
     Takes into account whether the process is whitelisted and applies different thresholds
-    """
-    score = 0
-    is_whitelisted = indicators.get("is_whitelisted", False)
-    process_name = indicators.get("process_name", "unknown")
-    
-    # Immediate HIGH for unnamed processes - strong indicator of Process Doppelgänging
-    if indicators.get("unnamed_process", False):
-        return "HIGH", 100, "Unnamed process - Strong Process Doppelgänging indicator"
     
-    # Assign weights to different indicators
-    reasons = []
+    The weights and thresholds live in scoring.DEFAULT_RULES; this scores with
+    DEFAULT_ENGINE so the per-process and batch paths can never disagree.
     
-    if indicators.get("has_suspicious_memory", False):
-        if is_whitelisted:
-            score += 5
-        else:
-            score += 10
-            reasons.append("Suspicious memory regions")
-    
-    if indicators.get("has_deleted_file_mapping", False):
-        # Check number of suspicious mappings
-        mappings = indicators.get("details", {}).get("suspicious_mappings", [])
-        if len(mappings) > 0:
-            # Edge WebView and some browsers commonly have deleted mappings, so reduce score
-            if is_whitelisted and process_name in ["msedgewebview2.exe", "chrome.exe", "firefox.exe", "msedge.exe"]:
-                score += 20
-            else:
-                score += 40
-                reasons.append("Deleted file mappings detected")
-    
-    if indicators.get("has_transaction_handles", False):
-        # Transaction handles are very strong indicators
-        score += 30
-        reasons.append("Transaction handles detected - strong Process Doppelgänging indicator")
-    
-    if indicators.get("has_section_without_file", False):
-        if is_whitelisted:
-            score += 20
-        else:
-            score += 30
-            reasons.append("Section handles without backing files detected")
-    
-    if indicators.get("created_with_section", False):
-        score += 20
-        reasons.append("Process created with section object")
-    
-    if indicators.get("suspicious_parent", False):
-        parent_info = indicators.get("details", {}).get("parent_info", {})
-        if parent_info.get("high_confidence", False):
-            score += 15
-            reasons.append(f"Highly suspicious parent process: {parent_info.get('name', 'unknown')}")
-        else:
-            score += 10
-            reasons.append(f"Suspicious parent process: {parent_info.get('name', 'unknown')}")
-    
-    # Multiple indicators together make a stronger case
-    indicator_count = sum(1 for ind in ["has_suspicious_memory", "has_deleted_file_mapping", 
-                                      "has_transaction_handles", "has_section_without_file", 
-                                      "created_with_section", "suspicious_parent"] 
-                          if indicators.get(ind, False))
-    
-    if indicator_count >= 3:
-        score += 20
-        reasons.append("Multiple suspicious indicators detected")
-    
-    # For whitelisted processes, require a higher threshold of suspicion
-    if is_whitelisted and score < 50:
-        # Apply reduction factor to whitelisted processes with low scores
-        score = int(score * 0.5)
-    
-    # Cap score at 100
-    score = min(score, 100)
-    
-    # Convert score to threat level
-    if score >= 60:
-        level = "HIGH"
-    elif score >= 30:
-        level = "MEDIUM"
-    else:
-        level = "LOW"
-    
-    # Create a combined reason string
-    reason = "; ".join(reasons) if reasons else "Low confidence indicators detected"
-    
-    return level, score, reason
+    Returns:
+        (level, score, reason) tuple
+    """
+    return DEFAULT_ENGINE.score(indicators)
 
 
-def register_startup(executable_path):
+def register_startup(executable_path, extra_args=()):
     """
     Register the application to run at Windows startup.
     Uses registry method (HKCU\Software\Microsoft\Windows\CurrentVersion\Run).
     
     Args:
         executable_path: Full path to the executable that should run at startup
+        extra_args: Additional command line arguments (e.g. log file and rotation options)
         
     Returns:
         True if successful, False otherwise
@@ -331,6 +408,8 @@ def register_startup(executable_path):
         # Set the value - use the executable name as the value name
         exe_name = os.path.basename(executable_path)
         reg_value = f'"{executable_path}" --monitor --stealth -s --min-threat-level MEDIUM'
+        if extra_args:
+            reg_value += " " + subprocess.list2cmdline([str(arg) for arg in extra_args])
         
         winreg.SetValueEx(key, "ProcessGuard", 0, winreg.REG_SZ, reg_value)
         winreg.CloseKey(key)
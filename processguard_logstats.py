@@ -0,0 +1,17 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+processguard-logstats
+---------------------
+Summarize Process Doppelgänging Detector logs: per-image detection counts,
+threat level distribution, event rate over time and top reasons.
+"""
+import sys
+import multiprocessing
+
+from modules.logstats import main
+
+if __name__ == "__main__":
+    # Worker processes of a frozen (PyInstaller) executable start through here
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Proc backend tests
+------------------
+parse_proc_maps and ProcFsBackend checks on sample /proc/<pid>/maps text
+and a fake proc root, so they run without touching real processes.
+
+Usage:
+    python -m pytest tests/test_backend.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.backend import parse_proc_maps, ProcFsBackend
+from modules.utils import (
+    PAGE_EXECUTE_READ,
+    PAGE_EXECUTE_READWRITE,
+    PAGE_READONLY,
+    PAGE_READWRITE,
+    MEM_IMAGE,
+    MEM_MAPPED,
+    MEM_PRIVATE
+)
+
+SAMPLE_MAPS = b"""\
+55d0c0a00000-55d0c0a21000 r--p 00000000 08:01 1234                       /opt/My App/bin/my app
+55d0c0a21000-55d0c0a80000 r-xp 00021000 08:01 1234                       /opt/My App/bin/my app
+55d0c1000000-55d0c1021000 rw-p 00000000 00:00 0                          [heap]
+7f1c2a000000-7f1c2a010000 rwxp 00000000 00:00 0 
+7f1c2b000000-7f1c2b004000 r-xp 00000000 00:01 77                         /memfd:payload (deleted)
+7f1c2c000000-7f1c2c010000 r-xp 00000000 08:01 99                         /usr/lib/libgone.so (deleted)
+7f1c2d000000-7f1c2d001000 r--p 00000000 08:01 100                        /usr/share/locale/data
+7ffc00000000-7ffc00021000 rw-p 00000000 00:00 0                          [stack]
+"""
+
+
+def make_proc_root(tmp_path, pid, exe, maps=SAMPLE_MAPS):
+    """Create <tmp>/<pid>/maps and an exe symlink pointing at exe."""
+    proc_dir = tmp_path / str(pid)
+    proc_dir.mkdir()
+    (proc_dir / "maps").write_bytes(maps)
+    os.symlink(exe, proc_dir / "exe")
+    return str(tmp_path)
+
+
+def make_indicators():
+    return {"has_section_without_file": False, "has_deleted_file_mapping": False, "details": {}}
+
+
+def test_parse_proc_maps_regions():
+    table = parse_proc_maps(SAMPLE_MAPS)
+    assert len(table) == 8
+    assert list(table.base[:2]) == [0x55d0c0a00000, 0x55d0c0a21000]
+    assert table.size[0] == 0x21000
+
+    assert table.path(0) == table.path(1) == "/opt/My App/bin/my app"
+    assert (table.protect[0], table.type[0]) == (PAGE_READONLY, MEM_MAPPED)
+    assert (table.protect[1], table.type[1]) == (PAGE_EXECUTE_READ, MEM_IMAGE)
+    assert table.path(4) == "/memfd:payload (deleted)"
+    assert table.type[4] == MEM_IMAGE
+
+
+def test_parse_proc_maps_anonymous_regions():
+    table = parse_proc_maps(SAMPLE_MAPS)
+    assert table.paths[2] == b"[heap]" and table.type[2] == MEM_PRIVATE
+    assert table.paths[3] == b"" and table.type[3] == MEM_PRIVATE
+    assert table.protect[3] == PAGE_EXECUTE_READWRITE
+    assert (table.protect[7], table.type[7]) == (PAGE_READWRITE, MEM_PRIVATE)
+    assert list(table.rwx_indices(MEM_PRIVATE)) == [3]
+    assert table.region_info(3)["Path"] == "[anon]"
+
+
+def test_parse_proc_maps_skips_short_and_blank_lines():
+    table = parse_proc_maps(b"\n00400000-00401000 r-xp\n00400000-00401000 r-xp 00000000 08:01 5\n")
+    assert len(table) == 1
+    assert table.paths[0] == b""
+
+
+def test_parse_proc_maps_appends_to_table():
+    table = parse_proc_maps(b"\n".join(SAMPLE_MAPS.split(b"\n")[:2]))
+    assert len(table) == 2
+    assert parse_proc_maps(SAMPLE_MAPS, table) is table
+    assert len(table) == 10
+
+
+def test_suspicious_memory_and_deleted_mappings(tmp_path):
+    backend = ProcFsBackend(make_proc_root(tmp_path, 42, "/usr/bin/true"))
+    regions = backend.walk_memory(42)
+    memory = backend.suspicious_memory(42, regions=regions)
+    assert [region["Path"] for region in memory] == ["[anon]"]
+
+    mappings = backend.check_mapped_files(42, maps=regions)
+    assert [mapping["path"] for mapping in mappings] == ["/memfd:payload (deleted)",
+                                                        "/usr/lib/libgone.so (deleted)"]
+
+
+def test_check_executable_memfd(tmp_path):
+    backend = ProcFsBackend(make_proc_root(tmp_path, 42, "/memfd:payload (deleted)"))
+    indicators = make_indicators()
+    backend.check_executable(42, indicators)
+    assert indicators["has_section_without_file"]
+    assert not indicators["has_deleted_file_mapping"]
+    assert "memfd" in indicators["details"]["section_without_file"][0]
+
+
+def test_check_executable_deleted_file(tmp_path):
+    exe = "/opt/My App/bin/my app (deleted)"
+    backend = ProcFsBackend(make_proc_root(tmp_path, 42, exe))
+    indicators = make_indicators()
+    indicators["details"]["suspicious_mappings"] = [{"path": exe}]
+    backend.check_executable(42, indicators)
+    assert indicators["has_deleted_file_mapping"]
+    # The mapping already reported for this path is not repeated
+    assert len(indicators["details"]["suspicious_mappings"]) == 1
+
+
+def test_check_executable_clean_and_missing(tmp_path):
+    backend = ProcFsBackend(make_proc_root(tmp_path, 42, "/opt/My App/bin/my app"))
+    indicators = make_indicators()
+    backend.check_executable(42, indicators)
+    backend.check_executable(43, indicators)
+    assert indicators == make_indicators()
+    assert backend.walk_memory(43).paths == []
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Cache tests
+-----------
+ParentVerdictCache keeps a pid -> keys index so invalidating one PID does
+not scan the cache; the index must follow every way an entry can leave.
+
+Usage:
+    python -m pytest tests/test_cache.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.cache import ParentVerdictCache
+
+
+def test_invalidate_pid_drops_every_creation_time():
+    cache = ParentVerdictCache(max_entries=16, ttl=None)
+    cache.put((10, 1.0), "old")
+    cache.put((10, 2.0), "new")
+    cache.put((11, 1.0), "other")
+
+    assert cache.invalidate_pid(10) == 2
+    assert cache.get((10, 1.0)) is None
+    assert cache.get((10, 2.0)) is None
+    assert cache.get((11, 1.0)) == "other"
+    assert cache.invalidate_pid(10) == 0
+
+
+def test_index_follows_eviction_and_discard():
+    cache = ParentVerdictCache(max_entries=2, ttl=None)
+    cache.put((1, 0.0), "a")
+    cache.put((2, 0.0), "b")
+    cache.put((3, 0.0), "c")  # evicts (1, 0.0)
+    cache.discard((2, 0.0))
+
+    assert cache._keys_by_pid == {3: {(3, 0.0)}}
+    assert cache.invalidate_pid(1) == 0
+
+
+def test_index_follows_expiry_and_retain():
+    cache = ParentVerdictCache(max_entries=16, ttl=-1.0)
+    cache.put((1, 0.0), "expired")
+    assert cache.get((1, 0.0)) is None
+    assert cache._keys_by_pid == {}
+
+    cache = ParentVerdictCache(max_entries=16, ttl=None)
+    cache.put((1, 0.0), "gone")
+    cache.put((2, 0.0), "live")
+    assert cache.retain({(2, 0.0)}) == 1
+    assert cache._keys_by_pid == {2: {(2, 0.0)}}
+    cache.clear()
+    assert cache._keys_by_pid == {}
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Proc connector parser tests
+---------------------------
+parse_proc_connector against netlink datagrams packed with struct in the
+nlmsghdr / cn_msg / proc_event layout of linux/connector.h and
+linux/cn_proc.h.
+
+Usage:
+    python -m pytest tests/test_events.py
+"""
+import os
+import sys
+import struct
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.events import (parse_proc_connector, CN_IDX_PROC, CN_VAL_PROC, NLMSG_DONE,
+                            PROC_EVENT_FORK, PROC_EVENT_EXEC, PROC_EVENT_EXIT)
+
+PROC_EVENT_UID = 0x00000004
+
+
+def proc_message(what, ids, timestamp_ns=123456789, idx=CN_IDX_PROC, val=CN_VAL_PROC):
+    """Pack one netlink message carrying a proc_event with the given id fields."""
+    event = struct.pack("=IIQ", what, 0, timestamp_ns) + struct.pack(f"={len(ids)}I", *ids)
+    cn_msg = struct.pack("=IIIIHH", idx, val, 0, 0, len(event), 0) + event
+    size = 16 + len(cn_msg)
+    message = struct.pack("=IHHII", size, NLMSG_DONE, 0, 0, 0) + cn_msg
+    # Messages are padded to 4 bytes
+    return message + b"\0" * (-len(message) % 4)
+
+
+def parse(data):
+    buffer = bytearray(data) + bytearray(64)  # the receive buffer is larger than the datagram
+    return list(parse_proc_connector(buffer, len(data)))
+
+
+def test_exec_and_exit_events():
+    data = proc_message(PROC_EVENT_EXEC, (500, 500)) + proc_message(PROC_EVENT_EXIT, (501, 501, 0, 9))
+    assert parse(data) == [(PROC_EVENT_EXEC, 500, 500, 123456789), (PROC_EVENT_EXIT, 501, 501, 123456789)]
+
+
+def test_fork_reports_the_child():
+    data = proc_message(PROC_EVENT_FORK, (10, 10, 600, 600), timestamp_ns=5)
+    assert parse(data) == [(PROC_EVENT_FORK, 600, 600, 5)]
+
+
+def test_thread_ids_are_passed_through():
+    # New threads have pid != tgid; the event source filters them
+    data = proc_message(PROC_EVENT_FORK, (10, 10, 701, 700))
+    assert parse(data) == [(PROC_EVENT_FORK, 701, 700, 123456789)]
+
+
+def test_other_events_and_connectors_are_skipped():
+    data = (proc_message(PROC_EVENT_UID, (800, 800, 0, 0))
+            + proc_message(PROC_EVENT_EXEC, (801, 801), idx=CN_IDX_PROC + 1)
+            + proc_message(PROC_EVENT_EXEC, (802, 802)))
+    assert parse(data) == [(PROC_EVENT_EXEC, 802, 802, 123456789)]
+
+
+def test_truncated_datagram_stops_parsing():
+    data = proc_message(PROC_EVENT_EXEC, (900, 900)) + proc_message(PROC_EVENT_EXEC, (901, 901))
+    assert parse(data[:-6]) == [(PROC_EVENT_EXEC, 900, 900, 123456789)]
+
+
+def test_fork_without_child_ids_is_skipped():
+    # A fork event cut short after the parent ids
+    assert parse(proc_message(PROC_EVENT_FORK, (10, 10))) == []
+
+
+def test_empty_datagram():
+    assert parse(b"") == []
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Handle table parser tests
+-------------------------
+iter_handle_entries and parse_handle_buffer against synthetic
+SYSTEM_HANDLE_INFORMATION_EX buffers packed with struct, for both the
+64-bit and the 32-bit layout.
+
+Usage:
+    python -m pytest tests/test_handles.py
+"""
+import os
+import sys
+import struct
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.handles import iter_handle_entries, parse_handle_buffer, TRANSACTION_TYPE, SECTION_TYPE
+
+# Header and entry formats per pointer size, as documented in modules/handles.py
+FORMATS = {8: ("<QQ", "<QQQIHHII"), 4: ("<II", "<IIIIHHII")}
+
+TYPE_NAMES = {40: TRANSACTION_TYPE, 42: SECTION_TYPE}
+
+# (pid, handle_value, type_index, granted_access)
+ENTRIES = [
+    (100, 0x4, 40, 0x1F003F),
+    (100, 0x8, 42, 0x000F001F),
+    (100, 0xC, 7, 0x1),   # unknown type
+    (200, 0x10, 42, 0x4),
+    (300, 0x14, 9, 0x2),  # unknown type
+]
+
+
+def pack_buffer(entries, pointer_size, count=None):
+    """Pack a handle table with the given entries; count overrides NumberOfHandles."""
+    header, entry = FORMATS[pointer_size]
+    data = struct.pack(header, len(entries) if count is None else count, 0)
+    for object_address, (pid, handle, type_index, access) in enumerate(entries, start=0x1000):
+        data += struct.pack(entry, object_address, pid, handle, access, 0, type_index, 0, 0)
+    return data
+
+
+@pytest.mark.parametrize("pointer_size", [8, 4])
+def test_iter_handle_entries_layout(pointer_size):
+    buffer = pack_buffer(ENTRIES, pointer_size)
+    assert struct.calcsize(FORMATS[pointer_size][1]) == (28 if pointer_size == 4 else 40)
+    assert list(iter_handle_entries(buffer, pointer_size)) == ENTRIES
+
+
+@pytest.mark.parametrize("pointer_size", [8, 4])
+def test_count_larger_than_buffer_is_truncated(pointer_size):
+    buffer = pack_buffer(ENTRIES, pointer_size, count=1000)
+    # Cut the last entry in half as well
+    buffer = buffer[:-5]
+    assert list(iter_handle_entries(buffer, pointer_size)) == ENTRIES[:-1]
+
+
+def test_buffer_shorter_than_header():
+    assert list(iter_handle_entries(b"\x01\x00", 8)) == []
+    assert list(iter_handle_entries(memoryview(b""), 4)) == []
+
+
+@pytest.mark.parametrize("pointer_size", [8, 4])
+def test_parse_handle_buffer_keeps_known_types_only(pointer_size):
+    index = parse_handle_buffer(pack_buffer(ENTRIES, pointer_size), TYPE_NAMES, pointer_size)
+    assert index == {
+        100: {TRANSACTION_TYPE: [(0x4, 0x1F003F)], SECTION_TYPE: [(0x8, 0x000F001F)]},
+        200: {SECTION_TYPE: [(0x10, 0x4)]},
+    }
+
+
+def test_parse_handle_buffer_without_types():
+    assert parse_handle_buffer(pack_buffer(ENTRIES, 8), {}) == {}
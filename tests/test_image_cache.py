@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Image header tests
+------------------
+header_digest on synthetic PE and ELF headers, ImageHeaderCache lookups by
+file identity, and the in-memory image comparison on a simulated machine.
+
+Usage:
+    python -m pytest tests/test_image_cache.py
+"""
+import os
+import sys
+import struct
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.logger import setup_logger
+from modules.image_cache import header_digest, ImageHeaderCache, IMAGE_HEADER_SIZE
+from modules.scanner import ProcessScanner
+from modules.simulation import SimulatedSystem, SimulatedBackend, TRANSACTED, UNNAMED
+
+setup_logger(log_file=os.devnull, log_level=logging.ERROR)
+
+PE_OFFSET = 0x80
+OPTIONAL = PE_OFFSET + 24
+
+
+def make_pe(magic=0x20b, image_base=0x140000000, size_of_headers=0x400, fill=0x11):
+    """Return 4 KiB starting with PE headers, followed by "section" bytes."""
+    data = bytearray([fill]) * IMAGE_HEADER_SIZE
+    data[0:2] = b"MZ"
+    struct.pack_into("<I", data, 0x3C, PE_OFFSET)
+    data[PE_OFFSET:PE_OFFSET + 4] = b"PE\0\0"
+    struct.pack_into("<H", data, OPTIONAL, magic)
+    if magic == 0x20b:
+        struct.pack_into("<Q", data, OPTIONAL + 24, image_base)
+    else:
+        struct.pack_into("<I", data, OPTIONAL + 28, image_base)
+    struct.pack_into("<I", data, OPTIONAL + 60, size_of_headers)
+    return data
+
+
+def make_elf64(phnum=11):
+    data = bytearray(IMAGE_HEADER_SIZE)
+    data[0:6] = b"\x7fELF\x02\x01"
+    struct.pack_into("<QQIHHH", data, 0x20, 64, 0, 0, 64, 56, phnum)
+    data[64:64 + 56 * phnum] = b"\x22" * (56 * phnum)
+    return data
+
+
+def test_pe_digest_ignores_image_base_and_section_data():
+    file_header = make_pe()
+    mapped = make_pe(image_base=0x7FF612340000)
+    mapped[0x400:] = bytes(IMAGE_HEADER_SIZE - 0x400)
+    assert header_digest(file_header) == header_digest(mapped)
+    assert header_digest(file_header)[0] == 0x400
+
+    pe32 = make_pe(magic=0x10b, image_base=0x400000)
+    assert header_digest(pe32) == header_digest(make_pe(magic=0x10b, image_base=0x1000000))
+
+
+def test_pe_digest_detects_changed_headers():
+    payload = make_pe()
+    struct.pack_into("<I", payload, PE_OFFSET + 8, 0x5F000000)  # TimeDateStamp
+    assert header_digest(payload) != header_digest(make_pe())
+    assert header_digest(make_pe(size_of_headers=0x600)) != header_digest(make_pe())
+
+
+def test_elf_digest_covers_program_headers():
+    elf = make_elf64()
+    length, _ = header_digest(elf)
+    assert length == 64 + 56 * 11
+    changed = bytearray(elf)
+    changed[64 + 56 * 10] ^= 1
+    assert header_digest(changed) != header_digest(elf)
+    changed = bytearray(elf)
+    changed[length] ^= 1
+    assert header_digest(changed) == header_digest(elf)
+
+
+def test_non_images_and_truncated_headers():
+    assert header_digest(b"") is None
+    assert header_digest(b"#!/bin/sh\necho hi\n") is None
+    assert header_digest(make_pe()[:0x90]) is None
+    assert header_digest(b"\x7fELF\x02\x01" + bytes(40)) is None
+    wrong_magic = make_pe()
+    struct.pack_into("<H", wrong_magic, OPTIONAL, 0x107)
+    assert header_digest(wrong_magic) is None
+
+
+class FakeFiles:
+    """identity/read_header pair over an in-memory file table, counting reads."""
+
+    def __init__(self, files):
+        self.files = files
+        self.versions = {path: 1 for path in files}
+        self.reads = 0
+
+    def identity(self, path):
+        if path not in self.files:
+            raise FileNotFoundError(path)
+        return f"{path}:{self.versions[path]}"
+
+    def read_header(self, path, size):
+        self.reads += 1
+        return bytes(self.files[path][:size])
+
+
+def test_cache_reads_each_file_identity_once():
+    files = FakeFiles({"a.exe": make_pe(), "b.txt": b"text"})
+    cache = ImageHeaderCache(identity=files.identity, read_header=files.read_header)
+
+    for _ in range(5):
+        assert cache.reference("a.exe") == header_digest(make_pe())
+        assert cache.reference("b.txt") is None
+    assert cache.reference("missing.exe") is None
+    assert files.reads == 2
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["errors"], stats["entries"]) == (8, 2, 1, 2)
+
+    # A new identity (file replaced) is read again
+    files.files["a.exe"] = make_pe(fill=0x33)
+    files.versions["a.exe"] += 1
+    assert cache.reference("a.exe") == header_digest(make_pe(fill=0x33))
+    assert files.reads == 3
+
+
+def test_cache_persists_entries(tmp_path):
+    path = str(tmp_path / "image_cache.json")
+    files = FakeFiles({"a.exe": make_pe()})
+    cache = ImageHeaderCache(path, identity=files.identity, read_header=files.read_header)
+    cache.reference("a.exe")
+    assert cache.save()
+
+    reloaded = ImageHeaderCache(path, identity=files.identity, read_header=files.read_header)
+    assert reloaded.reference("a.exe") == header_digest(make_pe())
+    assert files.reads == 1
+
+    with open(path, "w") as f:
+        f.write('{"version": 1, "identities": {}, "verdicts": {}}')
+    assert len(ImageHeaderCache(path)) == 0
+
+
+def test_cache_with_real_files(tmp_path):
+    exe = tmp_path / "tool.exe"
+    exe.write_bytes(bytes(make_pe()))
+    cache = ImageHeaderCache()
+    assert cache.reference(str(exe)) == header_digest(make_pe())
+    assert cache.reference(str(exe)) == header_digest(make_pe())
+    assert cache.stats()["hits"] == 1
+
+
+def test_simulated_scan_flags_only_transacted_images():
+    system = SimulatedSystem(400, seed=3, malicious_rate=0.2)
+    scanner = ProcessScanner(admin_rights=True, results_file=os.devnull, backend=SimulatedBackend(system))
+    scanner.scan_all_processes()
+    assert TRANSACTED in system.profile_counts()
+
+    for pid, process in system.processes.items():
+        if process.profile == UNNAMED:
+            continue
+        indicators = scanner.check_process_for_doppelganging(pid)
+        assert indicators.get("image_mismatch", False) == (process.profile == TRANSACTED), process.exe
+
+    stats = scanner.image_cache.stats()
+    assert stats["misses"] <= len(system.files)
+    assert stats["hits"] > 10 * stats["misses"]
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Log handler tests
+-----------------
+Age-based rotation of RotatingLogFileHandler across restarts.
+
+Usage:
+    python -m pytest tests/test_log_handlers.py
+"""
+import os
+import sys
+import time
+import types
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.log_handlers import RotatingLogFileHandler
+
+
+def make_handler(path, max_age=3600):
+    handler = RotatingLogFileHandler(str(path), max_age=max_age, compression="none")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    return handler
+
+
+def emit(handler, message):
+    handler.emit(logging.LogRecord("test", logging.INFO, __file__, 0, message, None, None))
+
+
+def test_new_file_starts_its_age_now(tmp_path):
+    before = time.time()
+    handler = make_handler(tmp_path / "detector.log")
+    try:
+        assert before <= handler.opened_at <= time.time()
+        assert not handler.should_rotate()
+    finally:
+        handler.close()
+
+
+def fake_stat(monkeypatch, path, **fields):
+    """Make os.stat of the log file return only the given fields."""
+    real_stat = os.stat
+
+    def stat(target, *args, **kwargs):
+        if os.fspath(target) == str(path):
+            return types.SimpleNamespace(st_size=100, st_ctime=fields.get("st_mtime"), **fields)
+        return real_stat(target, *args, **kwargs)
+    monkeypatch.setattr(os, "stat", stat)
+
+
+def test_existing_file_keeps_its_age_across_restarts(tmp_path, monkeypatch):
+    path = tmp_path / "detector.log"
+    path.write_text("earlier run\n")
+    two_hours_ago = time.time() - 7200
+    fake_stat(monkeypatch, path, st_mtime=two_hours_ago)
+
+    handler = make_handler(path)
+    monkeypatch.undo()
+    try:
+        assert handler.opened_at == two_hours_ago
+        assert handler.should_rotate()
+        emit(handler, "after restart")
+        assert handler.rotations == 1
+        assert path.read_text() == "after restart\n"
+        assert handler.opened_at > time.time() - 60
+    finally:
+        handler.close()
+
+
+def test_birth_time_is_preferred(tmp_path, monkeypatch):
+    path = tmp_path / "detector.log"
+    path.write_text("earlier run\n")
+    now = time.time()
+    fake_stat(monkeypatch, path, st_mtime=now - 10, st_birthtime=now - 5000)
+
+    handler = make_handler(path)
+    monkeypatch.undo()
+    try:
+        assert handler.opened_at == now - 5000
+    finally:
+        handler.close()
+
+
+def test_empty_existing_file_starts_its_age_now(tmp_path):
+    path = tmp_path / "detector.log"
+    path.touch()
+    two_hours_ago = time.time() - 7200
+    os.utime(path, (two_hours_ago, two_hours_ago))
+
+    handler = make_handler(path)
+    try:
+        assert handler.opened_at > time.time() - 60
+        assert not handler.should_rotate()
+    finally:
+        handler.close()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Aho-Corasick matcher tests
+--------------------------
+AhoCorasick replaces ``[p for p in patterns if p in text]`` scans, so every
+case below is checked against that substring semantics.
+
+Usage:
+    python -m pytest tests/test_patterns.py
+"""
+import os
+import sys
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.patterns import AhoCorasick
+
+
+def naive(patterns, text):
+    return [pattern for pattern in patterns if pattern in text]
+
+
+def test_overlapping_matches():
+    patterns = ["he", "she", "his", "hers"]
+    matcher = AhoCorasick(patterns).build()
+    assert matcher.find_all("ushers") == ["he", "she", "hers"] == naive(patterns, "ushers")
+    assert matcher.find_all("ahishers") == naive(patterns, "ahishers")
+
+
+def test_pattern_that_is_a_suffix_of_another():
+    patterns = ["-executionpolicy bypass", "bypass", "pass"]
+    matcher = AhoCorasick(patterns).build()
+    assert matcher.find_all("powershell -executionpolicy bypass") == patterns
+    assert matcher.find_all("bypass") == ["bypass", "pass"]
+    assert matcher.find_all("password") == ["pass"]
+
+
+def test_find_all_keeps_insertion_order_and_values():
+    matcher = AhoCorasick()
+    matcher.add("-nop", ("medium", "-nop"))
+    matcher.add("-enc", ("high", "-enc"))
+    matcher.add("-w hidden", ("medium", "-w hidden"))
+    # Matches appear in the text in a different order than they were added
+    assert matcher.find_all("-w hidden -enc abc -nop") == [
+        ("medium", "-nop"), ("high", "-enc"), ("medium", "-w hidden")]
+
+
+def test_repeated_match_is_reported_once():
+    matcher = AhoCorasick(["aa"]).build()
+    assert matcher.find_all("aaaa") == ["aa"]
+
+
+def test_empty_pattern_set():
+    matcher = AhoCorasick().build()
+    assert len(matcher) == 0
+    assert not matcher.search("anything")
+    assert matcher.find_all("anything") == []
+
+
+def test_empty_pattern_is_ignored():
+    matcher = AhoCorasick(["", "abc"]).build()
+    assert len(matcher) == 1
+    assert matcher.find_all("xabcx") == ["abc"]
+
+
+def test_add_after_build_rebuilds():
+    matcher = AhoCorasick(["abc"]).build()
+    assert not matcher.search("xyz")
+    matcher.add("yz")
+    assert matcher.search("xyz")
+    assert matcher.find_all("abcxyz") == ["abc", "yz"]
+
+
+def test_matches_naive_substring_scan():
+    rng = random.Random(7)
+    for _ in range(200):
+        patterns = list(dict.fromkeys("".join(rng.choice("abc") for _ in range(rng.randint(1, 4)))
+                                      for _ in range(rng.randint(1, 8))))
+        text = "".join(rng.choice("abcd") for _ in range(rng.randint(0, 30)))
+        matcher = AhoCorasick(patterns).build()
+        assert matcher.find_all(text) == naive(patterns, text), (patterns, text)
+        assert matcher.search(text) == bool(naive(patterns, text))
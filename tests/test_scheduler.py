@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Scan scheduler tests
+--------------------
+ScanScheduler driven from the test thread with run_pending() and an
+injected clock, so no timing is involved.
+
+Usage:
+    python -m pytest tests/test_scheduler.py
+"""
+import os
+import sys
+import logging
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.logger import setup_logger
+from modules.scheduler import ScanScheduler, parse_offsets
+
+setup_logger(log_file=os.devnull, log_level=logging.ERROR)
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_scheduler(offsets=(0.1, 1.0, 10.0)):
+    fired = []
+    clock = FakeClock()
+    scheduler = ScanScheduler(lambda *timer: fired.append(timer), offsets, clock=clock)
+    return scheduler, clock, fired
+
+
+def test_offsets_fire_in_order_and_last_is_flagged():
+    scheduler, clock, fired = make_scheduler()
+    scheduler.schedule(7, 1000.0, "a.exe")
+
+    assert scheduler.run_pending() == 0
+    clock.now = 1000.1
+    assert scheduler.run_pending() == 1
+    clock.now = 1011.0
+    assert scheduler.run_pending() == 2
+
+    assert fired == [(7, 1000.0, "a.exe", 0, False), (7, 1000.0, "a.exe", 1, False),
+                     (7, 1000.0, "a.exe", 2, True)]
+    assert len(scheduler) == 0
+    assert scheduler.stats()["processes"] == 0
+
+
+def test_timers_of_several_processes_fire_by_due_time():
+    scheduler, clock, fired = make_scheduler(offsets=(1.0,))
+    scheduler.schedule(2, 1000.5, "late")
+    scheduler.schedule(1, 1000.0, "early")
+    clock.now = 1002.0
+    scheduler.run_pending()
+    assert [timer[0] for timer in fired] == [1, 2]
+
+
+def test_cancelled_timers_are_skipped_lazily():
+    scheduler, clock, fired = make_scheduler()
+    scheduler.schedule(1, 1000.0, "gone")
+    scheduler.schedule(2, 1000.0, "kept")
+
+    assert scheduler.cancel(1)
+    assert not scheduler.cancel(1)
+    # The cancelled timers stay in the heap until they come due
+    assert len(scheduler._heap) == 6
+    assert len(scheduler) == 3
+
+    clock.now = 1020.0
+    assert scheduler.run_pending() == 3
+    assert {timer[0] for timer in fired} == {2}
+    assert scheduler._heap == []
+    assert scheduler.stats()["cancelled"] == 1
+
+
+def test_reused_pid_replaces_old_timers():
+    scheduler, clock, fired = make_scheduler(offsets=(1.0,))
+    scheduler.schedule(5, 1000.0, "old")
+    scheduler.schedule(5, 1000.5, "new")
+    # A duplicate event for the live process is ignored
+    scheduler.schedule(5, 1000.5, "new")
+    clock.now = 1005.0
+    scheduler.run_pending()
+    assert fired == [(5, 1000.5, "new", 0, True)]
+
+
+def test_heap_is_compacted_when_mostly_stale():
+    scheduler, clock, fired = make_scheduler()
+    for pid in range(10):
+        scheduler.schedule(pid, 1000.0)
+    for pid in range(6):
+        scheduler.cancel(pid)
+    assert len(scheduler._heap) == len(scheduler) == 12
+
+
+def test_default_create_time_uses_clock():
+    scheduler, clock, fired = make_scheduler(offsets=(0.0,))
+    scheduler.schedule(3)
+    scheduler.run_pending()
+    assert fired == [(3, 1000.0, None, 0, True)]
+
+
+def test_parse_offsets():
+    assert parse_offsets("10, 0.1,1") == (0.1, 1.0, 10.0)
+    assert parse_offsets("0") == (0.0,)
+    for value in ("", " , ", "-1,2", "1,abc"):
+        with pytest.raises(ValueError):
+            parse_offsets(value)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Scoring parity tests
+--------------------
+ScoringEngine must give exactly the same (level, score, reason) as the
+rules that were hardcoded in utils.calculate_suspicion_level before it
+delegated to DEFAULT_ENGINE (plus the image comparison rule), for every
+combination of indicators, on the single-record path, the batch path and
+the packed feature code path.
+
+Usage:
+    python -m pytest tests/test_scoring.py
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.utils import calculate_suspicion_level
+from modules.scoring import DEFAULT_ENGINE, ScoringEngine, LEVELS, np
+from benchmarks.bench_scoring import all_combinations
+
+requires_numpy = pytest.mark.skipif(np is None, reason="NumPy is not installed")
+
+
+def reference_suspicion_level(indicators):
+    """The original hardcoded calculate_suspicion_level, kept as the expected scores."""
+    score = 0
+    is_whitelisted = indicators.get("is_whitelisted", False)
+    process_name = indicators.get("process_name", "unknown")
+
+    if indicators.get("unnamed_process", False):
+        return "HIGH", 100, "Unnamed process - Strong Process Doppelgänging indicator"
+
+    reasons = []
+    if indicators.get("has_suspicious_memory", False):
+        if is_whitelisted:
+            score += 5
+        else:
+            score += 10
+            reasons.append("Suspicious memory regions")
+    if indicators.get("has_deleted_file_mapping", False):
+        if indicators.get("details", {}).get("suspicious_mappings", []):
+            if is_whitelisted and process_name in ["msedgewebview2.exe", "chrome.exe", "firefox.exe", "msedge.exe"]:
+                score += 20
+            else:
+                score += 40
+                reasons.append("Deleted file mappings detected")
+    if indicators.get("has_transaction_handles", False):
+        score += 30
+        reasons.append("Transaction handles detected - strong Process Doppelgänging indicator")
+    if indicators.get("has_section_without_file", False):
+        if is_whitelisted:
+            score += 20
+        else:
+            score += 30
+            reasons.append("Section handles without backing files detected")
+    if indicators.get("created_with_section", False):
+        score += 20
+        reasons.append("Process created with section object")
+    if indicators.get("ioc_path_match", False):
+        score += 40
+        reasons.append("Executable path matches IOC list")
+    if indicators.get("image_mismatch", False):
+        score += 50
+        reasons.append("Mapped image differs from the executable on disk")
+    if indicators.get("suspicious_parent", False):
+        parent_info = indicators.get("details", {}).get("parent_info", {})
+        if parent_info.get("high_confidence", False):
+            score += 15
+            reasons.append(f"Highly suspicious parent process: {parent_info.get('name', 'unknown')}")
+        else:
+            score += 10
+            reasons.append(f"Suspicious parent process: {parent_info.get('name', 'unknown')}")
+
+    indicator_count = sum(1 for ind in ["has_suspicious_memory", "has_deleted_file_mapping",
+                                        "has_transaction_handles", "has_section_without_file",
+                                        "created_with_section", "suspicious_parent"]
+                          if indicators.get(ind, False))
+    if indicator_count >= 3:
+        score += 20
+        reasons.append("Multiple suspicious indicators detected")
+
+    if is_whitelisted and score < 50:
+        score = int(score * 0.5)
+    score = min(score, 100)
+    level = "HIGH" if score >= 60 else "MEDIUM" if score >= 30 else "LOW"
+    return level, score, "; ".join(reasons) if reasons else "Low confidence indicators detected"
+
+
+@pytest.fixture(scope="module")
+def cases():
+    records = list(all_combinations())
+    return records, [reference_suspicion_level(indicators) for indicators in records]
+
+
+def test_score_matches_reference(cases):
+    for indicators, expected in zip(*cases):
+        assert DEFAULT_ENGINE.score(indicators) == expected, indicators
+        assert calculate_suspicion_level(indicators) == expected, indicators
+
+
+@requires_numpy
+def test_score_batch_matches_reference(cases):
+    records, expected = cases
+    for indicators, want, got in zip(records, expected, DEFAULT_ENGINE.score_batch(records)):
+        assert got == want, indicators
+
+
+@requires_numpy
+def test_score_matrix_matches_scores_and_levels(cases):
+    records, expected = cases
+    codes, _ = DEFAULT_ENGINE.to_codes(records)
+    scores, level_codes = DEFAULT_ENGINE.score_matrix(ScoringEngine.codes_to_matrix(codes))
+    for indicators, (level, score, _), got_score, got_level in zip(records, expected, scores.tolist(),
+                                                                     level_codes.tolist()):
+        assert (LEVELS[got_level], got_score) == (level, score), indicators
+
+
+def test_feature_code_matches_features(cases):
+    for indicators in cases[0]:
+        row, parent = ScoringEngine.features(indicators)
+        code, code_parent = ScoringEngine.feature_code(indicators)
+        assert code == sum(1 << i for i, value in enumerate(row) if value), indicators
+        assert code_parent == parent
+
+
+def test_empty_batch():
+    assert DEFAULT_ENGINE.score_batch([]) == []